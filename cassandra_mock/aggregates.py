@@ -0,0 +1,126 @@
+# aggregates.py
+#
+# the aggregate functions of SELECT: count, sum, min, max and avg. They are folded over the
+# rows of each group while the rows are scanned, so that no list of rows is built. The scan
+# yields the rows in primary key order: the rows of a group, which share a primary key prefix,
+# come one after the other
+#
+
+
+class Count:
+    """ count(*) counts the rows, count(column) the rows where the column is not null """
+    
+    __slots__ = ('column', 'n')
+    
+    def __init__(self, column):
+        self.column = column
+        self.n = 0
+    
+    def add(self, row):
+        if self.column is None or row.get(self.column) is not None:
+            self.n += 1
+    
+    def result(self):
+        return self.n
+
+
+class Sum:
+    __slots__ = ('column', 'total')
+    
+    def __init__(self, column):
+        self.column = column
+        self.total = 0
+    
+    def add(self, row):
+        v = row.get(self.column)
+        if v is not None:
+            self.total += v
+    
+    def result(self):
+        return self.total
+
+
+class Min:
+    __slots__ = ('column', 'value')
+    
+    def __init__(self, column):
+        self.column = column
+        self.value = None
+    
+    def add(self, row):
+        v = row.get(self.column)
+        if v is not None and (self.value is None or v < self.value):
+            self.value = v
+    
+    def result(self):
+        return self.value
+
+
+class Max(Min):
+    __slots__ = ()
+    
+    def add(self, row):
+        v = row.get(self.column)
+        if v is not None and (self.value is None or v > self.value):
+            self.value = v
+
+
+class Avg:
+    """ as in cassandra, the average of integers is an integer, truncated, and the average of no rows is 0 """
+    
+    __slots__ = ('column', 'total', 'n')
+    
+    def __init__(self, column):
+        self.column = column
+        self.total = 0
+        self.n = 0
+    
+    def add(self, row):
+        v = row.get(self.column)
+        if v is not None:
+            self.total += v
+            self.n += 1
+    
+    def result(self):
+        if not self.n:
+            return 0
+        if isinstance(self.total, int):
+            q = abs(self.total) // self.n
+            return q if self.total >= 0 else -q
+        return self.total / self.n
+
+
+FUNCTIONS = dict(count=Count, sum=Sum, min=Min, max=Max, avg=Avg)
+
+
+def aggregate_column(function, column=None):
+    """ the name of the selected aggregate, as named by cassandra """
+    if column is None:
+        return function
+    return 'system.{}({})'.format(function, column)
+
+
+def aggregate(rows, functions, size, make_row):
+    """
+    lazily yields (primary key, row) with one row per group of rows, the rows which share their first size
+    primary key columns, or one row for all the rows when size is None. rows yields (primary key, row).
+    functions is a list of (name, function, column), make_row(first row, {name: result}) makes the row of
+    a group, the first row is None for the aggregates of no rows. The key of a group is the key of its last row
+    """
+    (group, first, last, state) = (None, None, None, None)
+    for key, row in rows:
+        if state is None or (size is not None and key[:size] != group):
+            if state is not None:
+                yield last, make_row(first, dict((name, f.result()) for name, f in state))
+            (group, first) = (key[:size] if size is not None else None, row)
+            state = [(name, FUNCTIONS[function](column)) for name, function, column in functions]
+        
+        for name, f in state:
+            f.add(row)
+        last = key
+    
+    if state is not None:
+        yield last, make_row(first, dict((name, f.result()) for name, f in state))
+    elif size is None:
+        # aggregates of no rows are still one row
+        yield (), make_row(None, dict((name, FUNCTIONS[function](column).result()) for name, function, column in functions))
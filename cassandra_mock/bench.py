@@ -0,0 +1,660 @@
+# bench.py
+#
+# plain benchmark runner for the mock, run all benchmarks or some by name:
+#
+#   python -m cassandra_mock.bench
+#   python -m cassandra_mock.bench scan_memory
+#
+# and replay of workloads, recorded by a workload.Recorder or synthetic, see workload.py:
+#
+#   python -m cassandra_mock.bench generate read_heavy /tmp/workload.log --operations 100000
+#   python -m cassandra_mock.bench replay /tmp/workload.log --workers 4 --mode thread --speed 1
+#
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from .cluster import Cluster, Session
+from .workload import PROFILES, replay, synthetic
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(f):
+    BENCHMARKS[f.__name__] = f
+    return f
+
+
+def report(name, n, seconds, unit='rows'):
+    print('{:<40} {:>12.0f} {}/s'.format(name, n / seconds if seconds else float('inf'), unit))
+
+
+def connect(keyspace='bench'):
+    """ returns a session on an empty keyspace """
+    cluster = Cluster([':memory:'], {'data': {keyspace: {}}, 'index': {keyspace: {}}})
+    return cluster.connect(keyspace)
+
+
+def events(session, partitions=100, rows=100000):
+    """ creates and loads a table of events, rows are spread over the partitions """
+    session.execute("create table events (source text, id int, kind text, value int, primary key ((source), id));")
+    session.bulk_load(None, 'events',
+                      (('s{}'.format(i % partitions), i, 'kind{}'.format(i % 7), i) for i in range(rows)),
+                      columns=['source', 'id', 'kind', 'value'])
+
+
+@benchmark
+def scan_memory(rows=100000, scans=5):
+    """ repeated full scans must not grow the heap: reads never write into the stored rows """
+    session = connect()
+    session.default_fetch_size = None
+    events(session, rows=rows)
+    
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(scans):
+        t0 = time.time()
+        n = 0
+        for row in session.execute("select * from events limit {};".format(rows)):
+            n += row['value'] is not None
+        report('full scan {}'.format(i + 1), n, time.time() - t0)
+        print('{:<40} {:>12} bytes'.format('heap growth after scan {}'.format(i + 1),
+                                           tracemalloc.get_traced_memory()[0] - base))
+    tracemalloc.stop()
+
+
+@benchmark
+def negative_lookups(rows=10000, queries=100000):
+    """ reads of missing partitions and rows must not grow the heap or the tables: reads never create nodes """
+    cluster = Cluster([':memory:'], {'data': {'bench': {}}, 'index': {'bench': {}}})
+    session = cluster.connect('bench')
+    events(session, rows=rows)
+    handle = session.table('events')
+    q = session.prepare("select * from events where source = ? and id = ?;")
+    before = cluster.stats()['bench']['events']
+    
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.time()
+    for i in range(queries):
+        session.execute(q, ('missing{}'.format(i), i)).one()
+        handle.get('s{}'.format(i % 100), rows + i)
+    report('missing partitions and rows', queries * 2, time.time() - t0, 'queries')
+    print('{:<40} {:>12} bytes'.format('heap growth', tracemalloc.get_traced_memory()[0] - base))
+    tracemalloc.stop()
+    
+    after = cluster.stats()['bench']['events']
+    for k in ('partitions', 'nodes', 'bytes'):
+        print('{:<40} {:>12}'.format('table {}, before and after'.format(k), '{} {}'.format(before[k], after[k])))
+
+
+@benchmark
+def row_memory(rows=100000):
+    """ bytes per row of a table created by CREATE TABLE, against the dict rows of a table without schema """
+    data = {'data': {'bench': {'events': {}}}, 'index': {'bench': {'events': [['source'], 'id']}}}
+    for name, session in (('dict rows, no schema', Cluster([':memory:'], data).connect('bench')),
+                          ('compact rows, typed schema', connect())):
+        if name.startswith('compact'):
+            session.execute("create table events (source text, id int, kind text, value int, ratio double, "
+                            "primary key ((source), id));")
+        
+        tracemalloc.start()
+        session.bulk_load(None, 'events', (('s{}'.format(i % 100), i, 'kind{}'.format(i % 7), i, i / 7) for i in range(rows)),
+                          columns=['source', 'id', 'kind', 'value', 'ratio'])
+        print('{:<40} {:>12.0f} bytes/row'.format(name, tracemalloc.get_traced_memory()[0] / rows))
+        tracemalloc.stop()
+
+
+@benchmark
+def range_slice(rows=100000, queries=1000):
+    """ range and reverse queries on a wide partition are slices of the sorted clustering level """
+    session = connect()
+    session.execute("create table series (source text, t int, value int, primary key ((source), t));")
+    session.bulk_load(None, 'series', (('s', t, t) for t in range(rows)), columns=['source', 't', 'value'])
+    
+    for name, query, params in (
+            ('range of 10 rows', "select * from series where source='s' and t > ? and t <= ?;", lambda i: (i, i + 10)),
+            ('last 10 rows', "select * from series where source='s' and t < ? order by t desc limit 10;", lambda i: (i,)),
+            ('partition scan', "select * from series where source='s' limit 10;", lambda i: ())):
+        q = session.prepare(query)
+        t0 = time.time()
+        for i in range(queries):
+            session.execute(q, params(i * (rows // queries))).all()
+        report(name, queries, time.time() - t0, 'queries')
+
+
+@benchmark
+def in_query(rows=100000, keys=1000, repeat=10):
+    """ the rows of 1000 keys: one SELECT per key, against one IN query which reads them in a single pass """
+    session = connect()
+    session.execute("create table users (id int, name text, primary key (id));")
+    session.bulk_load(None, 'users', ((i, 'user{}'.format(i)) for i in range(rows)), columns=['id', 'name'])
+    ids = [i * (rows // keys) for i in range(keys)]
+    
+    t0 = time.time()
+    for r in range(repeat):
+        for i in ids:
+            session.execute("select * from users where id = {};".format(i + r)).one()
+    report('single-key selects', keys * repeat, time.time() - t0)
+    
+    q = session.prepare("select * from users where id = ?;")
+    t0 = time.time()
+    for r in range(repeat):
+        for i in ids:
+            session.execute(q, (i + r,)).one()
+    report('single-key selects, prepared', keys * repeat, time.time() - t0)
+    
+    t0 = time.time()
+    for r in range(repeat):
+        query = "select * from users where id in ({}) limit {};".format(', '.join(str(i + r) for i in ids), keys)
+        n = len(session.execute(query).all())
+    report('IN query', n * repeat, time.time() - t0)
+    
+    q = session.prepare("select * from users where id in ? limit {};".format(keys))
+    t0 = time.time()
+    for r in range(repeat):
+        n = len(session.execute(q, ([i + r for i in ids],)).all())
+    report('IN query, prepared', n * repeat, time.time() - t0)
+
+
+@benchmark
+def secondary_index(rows=100000, queries=100):
+    """ lookups by a regular column: a full scan filtered by the client, the secondary index, the materialized view """
+    session = connect()
+    session.default_fetch_size = None
+    events(session, partitions=1000, rows=rows)
+    session.execute("create index on events (value);")
+    session.execute("create materialized view events_by_value as select * from events "
+                    "where value is not null and source is not null and id is not null primary key ((value), source, id);")
+    
+    t0 = time.time()
+    for i in range(queries // 10):
+        [row for row in session.execute("select * from events limit {};".format(rows)) if row['value'] == i]
+    report('full scan and filter', queries // 10, time.time() - t0, 'queries')
+    
+    for name, query in (('secondary index', "select * from events where value = ?;"),
+                        ('materialized view', "select * from events_by_value where value = ?;")):
+        q = session.prepare(query)
+        t0 = time.time()
+        for i in range(queries):
+            session.execute(q, (i * 7,)).all()
+        report(name, queries, time.time() - t0, 'queries')
+
+
+@benchmark
+def filtered_scan(rows=1000000):
+    """ a full scan filtered by the client, against ALLOW FILTERING with the conditions compiled by the plan """
+    session = connect()
+    session.default_fetch_size = None
+    events(session, partitions=1000, rows=rows)
+    
+    t0 = time.time()
+    n = sum(1 for row in session.execute("select * from events limit {};".format(rows))
+            if row['value'] >= rows // 2 and row['kind'] == 'kind3')
+    report('client side filter, {} matches'.format(n), rows, time.time() - t0)
+    
+    t0 = time.time()
+    n = len(session.execute("select * from events where value >= ? and kind = ? limit {} allow filtering;".format(rows),
+                            (rows // 2, 'kind3')).all())
+    report('allow filtering, {} matches'.format(n), rows, time.time() - t0)
+
+
+@benchmark
+def aggregates(rows=200000, queries=1000):
+    """ sums and counts by the client over the returned rows, against aggregates computed by the scan """
+    session = connect()
+    session.default_fetch_size = None
+    events(session, partitions=100, rows=rows)
+    
+    t0 = time.time()
+    totals = {}
+    for row in session.execute("select * from events limit {};".format(rows)):
+        totals[row['source']] = totals.get(row['source'], 0) + row['value']
+    report('client side sum by partition', rows, time.time() - t0)
+    
+    t0 = time.time()
+    session.execute("select source, sum(value) from events group by source;").all()
+    report('sum(value) group by partition', rows, time.time() - t0)
+    
+    q = session.prepare("select count(*) from events where source = ?;")
+    t0 = time.time()
+    for i in range(queries):
+        len(session.execute("select id from events where source = ? limit {};".format(rows), ('s{}'.format(i % 100),)).all())
+    report('client side count of a partition', queries, time.time() - t0, 'queries')
+    
+    t0 = time.time()
+    for i in range(queries):
+        session.execute(q, ('s{}'.format(i % 100),)).one()
+    report('count(*) of a partition', queries, time.time() - t0, 'queries')
+
+
+@benchmark
+def table_handle(rows=50000, queries=20000):
+    """ inserts, point reads, partition reads and scans by prepared statements, against a TableHandle """
+    session = connect()
+    session.default_fetch_size = None
+    create = "create table events (source text, id int, kind text, value int, primary key ((source), id));"
+    session.execute(create)
+    handle = session.table('events')
+    insert_cql = session.prepare("insert into events (source, id, kind, value) values (?, ?, ?, ?);")
+    get_cql = session.prepare("select * from events where source = ? and id = ?;")
+    partition = session.prepare("select * from events where source = ?;")
+    
+    for name, insert, get, scan in (
+            ('cql', lambda i: session.execute(insert_cql, ('s{}'.format(i % 100), i, 'kind', i)),
+             lambda i: session.execute(get_cql, ('s{}'.format(i % 100), i)).one(),
+             lambda i: session.execute(partition, ('s{}'.format(i % 100),)).all()),
+            ('handle', lambda i: handle.put({'source': 's{}'.format(i % 100), 'id': i, 'kind': 'kind', 'value': i}),
+             lambda i: handle.get('s{}'.format(i % 100), i),
+             lambda i: list(handle.scan('s{}'.format(i % 100))))):
+        # a new table, the handle follows it
+        session.execute(create)
+        
+        t0 = time.time()
+        for i in range(rows):
+            insert(i)
+        report('{} insert'.format(name), rows, time.time() - t0)
+        
+        t0 = time.time()
+        for i in range(queries):
+            get(i % rows)
+        report('{} point read'.format(name), queries, time.time() - t0, 'queries')
+        
+        t0 = time.time()
+        for i in range(queries // 100):
+            scan(i)
+        report('{} partition read, {} rows'.format(name, rows // 100), queries // 100, time.time() - t0, 'queries')
+        
+        t0 = time.time()
+        n = len(session.execute("select * from events limit {};".format(rows)).all() if name == 'cql' else
+                list(handle.scan()))
+        report('{} scan'.format(name), n, time.time() - t0)
+
+
+@benchmark
+def ttl_churn(seconds=5, ttl=1):
+    """
+    session rows inserted with a TTL for some seconds: the compactor purges the expired rows in the background,
+    the rows kept stay about the ones inserted during the last TTL, plus a compaction period
+    """
+    session = connect()
+    session.default_fetch_size = None
+    session.execute("create table sessions (id int, token text, primary key (id));")
+    insert = session.prepare("insert into sessions (id, token) values (?, ?) using ttl {};".format(ttl))
+    
+    (n, t0, kept) = (0, time.time(), [])
+    while time.time() - t0 < seconds:
+        for i in range(1000):
+            session.execute(insert, (n, 'token{}'.format(n)))
+            n += 1
+        kept.append(len(session.db['bench']['sessions']))
+    elapsed = time.time() - t0
+    report('insert using ttl {}'.format(ttl), n, elapsed)
+    
+    live = len(session.execute("select id from sessions limit {};".format(n)).all())
+    times = session.times['bench']['sessions']
+    print('{:<40} {:>12}'.format('rows inserted', n))
+    print('{:<40} {:>12}'.format('most rows kept', max(kept)))
+    print('{:<40} {:>12}'.format('rows kept, live at the end', '{}, {}'.format(kept[-1], live)))
+    print('{:<40} {:>12}'.format('expiry heap at the end', len(times.heap)))
+    session.compactor.stop()
+
+
+@benchmark
+def tracing(rows=10000, queries=20000):
+    """ point queries untraced, traced, and with the metrics of the cluster: untraced ones pay nothing """
+    session = connect()
+    events(session, partitions=100, rows=rows)
+    q = session.prepare("select * from events where source = ? and id = ?;")
+    for name, trace in (('untraced', False), ('traced', True)):
+        t0 = time.time()
+        for i in range(queries):
+            session.execute(q, ('s{}'.format(i % 100), i % rows), trace=trace).one()
+        report(name, queries, time.time() - t0, 'queries')
+    
+    Session.DEFAULTS['METRICS'] = True
+    try:
+        cluster = Cluster([':memory:'], {'data': {'bench': {}}, 'index': {'bench': {}}})
+    finally:
+        Session.DEFAULTS['METRICS'] = False
+    session = cluster.connect('bench')
+    events(session, partitions=100, rows=rows)
+    t0 = time.time()
+    for i in range(queries):
+        session.execute("select * from events where source = 's{0}' and id = {0};".format(i % 100)).one()
+    report('metrics, string statements', queries, time.time() - t0, 'queries')
+    
+    metrics = cluster.metrics()
+    latency = metrics['latency']['select']['bench.events']
+    print('{:<40} {:>12}'.format('select p50 / p99 (us)', '{} / {}'.format(latency['p50'], latency['p99'])))
+    print('{:<40} {:>12.2f}'.format('plan cache hit rate', metrics['plan_cache']['hit_rate']))
+
+
+def report_replay(name, result):
+    report(name, result['statements'], result['seconds'], 'statements')
+    latency = result['latency']
+    print('{:<40} {:>12}'.format('  p50 / p99 / p999 (us)', '{} / {} / {}'.format(latency['p50'], latency['p99'],
+                                                                              latency['p999'])))
+
+
+@benchmark
+def workload_replay(operations=20000, workers=4):
+    """ the synthetic workloads replayed at full speed by threads, processes and asyncio tasks """
+    path = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(path, 'workload.log')
+        for profile in PROFILES:
+            synthetic(filename, profile, operations)
+            for mode in ('thread', 'process', 'asyncio'):
+                report_replay('{}, {}'.format(profile, mode), replay(filename, workers=workers, mode=mode))
+    finally:
+        shutil.rmtree(path)
+
+
+@benchmark
+def parallel_scan(rows=200000, workers=4):
+    """ full scans walked serially, then by a pool of processes and of threads, started then reused """
+    session = connect()
+    session.default_fetch_size = None
+    events(session, partitions=1000, rows=rows)
+    
+    for name, n, pool in (('serial', 0, 'process'), ('process pool', workers, 'process'), ('thread pool', workers, 'thread')):
+        session.scan_workers = n
+        session.DEFAULTS['SCAN_POOL'] = pool
+        for run in ('', ' reused') if n else ('',):
+            t0 = time.time()
+            count = len(session.execute("select source, value from events limit {};".format(rows)).all())
+            report('{} scan{}, {} cpus'.format(name, run, os.cpu_count()), count, time.time() - t0)
+    session.DEFAULTS['SCAN_POOL'] = 'process'
+    session.scan_pool.shutdown()
+
+
+@benchmark
+def async_fanout(queries=10000):
+    """ point queries executed one by one, then fanned out with execute_async and with asyncio """
+    session = connect()
+    events(session, partitions=100, rows=10000)
+    q = session.prepare("select * from events where source = ? and id = ?;")
+    
+    t0 = time.time()
+    for i in range(queries):
+        session.execute(q, ('s{}'.format(i % 100), i % 10000)).one()
+    report('execute', queries, time.time() - t0, 'queries')
+    
+    t0 = time.time()
+    futures = [session.execute_async(q, ('s{}'.format(i % 100), i % 10000)) for i in range(queries)]
+    for f in futures:
+        f.result().one()
+    report('execute_async', queries, time.time() - t0, 'queries')
+    
+    async def fanout():
+        return await asyncio.gather(*[session.aexecute(q, ('s{}'.format(i % 100), i % 10000)) for i in range(queries)])
+    
+    t0 = time.time()
+    asyncio.run(fanout())
+    report('aexecute', queries, time.time() - t0, 'queries')
+    session.shutdown()
+
+
+@benchmark
+def concurrency(ops=20000, partitions=64):
+    """
+    threads inserting rows and reading partitions and whole tables at the same time,
+    throughput as the thread count grows. Every inserted row must be there at the end
+    """
+    for threads in (1, 2, 4, 8):
+        session = connect()
+        session.execute("create table events (source text, id int, kind text, value int, primary key ((source), id));")
+        insert = session.prepare("insert into events (source, id, kind, value) values (?, ?, ?, ?);")
+        select = session.prepare("select * from events where source = ? limit 10;")
+        count = session.prepare("select id from events where source = ?;")
+        errors = []
+        
+        def work(t):
+            try:
+                for i in range(t, ops, threads):
+                    source = 's{}'.format(i % partitions)
+                    if i % 100 == 0:
+                        len(session.execute("select * from events limit 1000;").all())
+                    elif i % 2:
+                        session.execute(select, (source,)).all()
+                    else:
+                        session.execute(insert, (source, i, 'kind', i))
+            except Exception as e:
+                errors.append(e)
+        
+        pool = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+        t0 = time.time()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        report('{} threads'.format(threads), ops, time.time() - t0, 'ops')
+        
+        rows = sum(len(session.execute(count, ('s{}'.format(p),)).all()) for p in range(partitions))
+        expected = len([i for i in range(ops) if i % 100 and not i % 2])
+        if errors or rows != expected:
+            print('ERROR: {} rows of {}, {}'.format(rows, expected, errors[:1]))
+
+
+@benchmark
+def lwt_contention(ops=4000):
+    """
+    threads incrementing hot rows by compare and set, retrying with the value returned by the failed attempts:
+    throughput and retries as the threads contend for fewer rows. No increment may be lost
+    """
+    for threads, rows in ((1, 1), (4, 64), (4, 4), (4, 1), (8, 1)):
+        session = connect()
+        session.execute("create table counters (name text, value int, primary key (name));")
+        for i in range(rows):
+            session.execute("insert into counters (name, value) values (?, 0);", ('c{}'.format(i),))
+        cas = session.prepare("update counters set value = ? where name = ? if value = ?;")
+        attempts = []
+        
+        def work(t):
+            n = 0
+            for i in range(t, ops, threads):
+                name = 'c{}'.format(i % rows)
+                value = session.execute("select value from counters where name = ?;", (name,)).one()['value']
+                while True:
+                    # the round trip of a client, other clients write meanwhile
+                    time.sleep(0)
+                    n += 1
+                    row = session.execute(cas, (value + 1, name, value)).one()
+                    if row['[applied]']:
+                        break
+                    value = row['value']
+            attempts.append(n)
+        
+        pool = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+        t0 = time.time()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.time() - t0
+        report('{} threads on {} rows'.format(threads, rows), ops, elapsed, 'increments')
+        print('{:<40} {:>12.2f}'.format('attempts per increment', sum(attempts) / ops))
+        
+        total = sum(row['value'] for row in session.execute("select value from counters;"))
+        if total != ops:
+            print('ERROR: {} increments of {}'.format(total, ops))
+
+
+@benchmark
+def counter_increments(ops=20000):
+    """
+    threads incrementing hot counters, against a read-modify-write of an int column by SELECT and INSERT,
+    which loses the increments of the threads running in between. No increment of the counters may be lost
+    """
+    for threads, rows in ((1, 1), (4, 64), (4, 1), (8, 1)):
+        session = connect()
+        session.execute("create table hits (name text, value counter, primary key (name));")
+        session.execute("create table plain (name text, value int, primary key (name));")
+        increment = session.prepare("update hits set value = value + 1 where name = ?;")
+        select = session.prepare("select value from plain where name = ?;")
+        insert = session.prepare("insert into plain (name, value) values (?, ?);")
+        
+        def work(t):
+            for i in range(t, ops, threads):
+                session.execute(increment, ('c{}'.format(i % rows),))
+        
+        def read_modify_write(t):
+            for i in range(t, ops, threads):
+                name = 'c{}'.format(i % rows)
+                row = session.execute(select, (name,)).one()
+                session.execute(insert, (name, (row['value'] if row else 0) + 1))
+        
+        for name, target, table in (('counter', work, 'hits'), ('read-modify-write', read_modify_write, 'plain')):
+            pool = [threading.Thread(target=target, args=(t,)) for t in range(threads)]
+            t0 = time.time()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            report('{}, {} threads on {} rows'.format(name, threads, rows), ops, time.time() - t0, 'increments')
+            
+            total = sum(row['value'] for row in session.execute("select value from {};".format(table)))
+            if total != ops:
+                print('{:<40} {:>12}'.format('lost increments', ops - total))
+                if table == 'hits':
+                    print('ERROR: {} increments of {}'.format(total, ops))
+
+
+@benchmark
+def collection_appends(rows=10, appends=20000):
+    """
+    event lists growing by one event per write: appended in place by UPDATE l = l + [...], against the client
+    reading the list and writing it back whole, which copies it
+    """
+    session = connect()
+    session.execute("create table timeline (id int, events list<text>, primary key (id));")
+    append = session.prepare("update timeline set events = events + ? where id = ?;")
+    select = session.prepare("select events from timeline where id = ?;")
+    insert = session.prepare("insert into timeline (id, events) values (?, ?);")
+    
+    t0 = time.time()
+    for i in range(appends):
+        session.execute(append, (['event{}'.format(i)], i % rows))
+    report('append in place', appends, time.time() - t0, 'appends')
+    
+    t0 = time.time()
+    for i in range(appends):
+        row = session.execute(select, (rows + i % rows,)).one()
+        session.execute(insert, (rows + i % rows, (row['events'] if row else []) + ['event{}'.format(i)]))
+    report('read and rewrite', appends, time.time() - t0, 'appends')
+
+
+@benchmark
+def durable_startup(rows=200000):
+    """ writes through the commit log, then restarts from the log and from a snapshot """
+    path = tempfile.mkdtemp()
+    try:
+        def start():
+            cluster = Cluster([':memory:'], {'data': {'bench': {}}, 'index': {'bench': {}}}, path=path)
+            return cluster, cluster.connect('bench')
+        
+        cluster, session = start()
+        t0 = time.time()
+        events(session, rows=rows)
+        report('bulk_load, logged', rows, time.time() - t0)
+        cluster.shutdown()
+        
+        t0 = time.time()
+        cluster, session = start()
+        report('restart, replaying the log', rows, time.time() - t0)
+        
+        t0 = time.time()
+        cluster.snapshot()
+        report('snapshot', rows, time.time() - t0)
+        cluster.shutdown()
+        
+        t0 = time.time()
+        cluster, session = start()
+        report('restart, loading the snapshot', rows, time.time() - t0)
+        cluster.shutdown()
+        
+        t0 = time.time()
+        events(connect(), rows=rows)
+        report('bulk_load, in memory', rows, time.time() - t0)
+    finally:
+        shutil.rmtree(path)
+
+
+@benchmark
+def frozen_startup(rows=200000, queries=10000):
+    """ starting from a frozen keyspace file, against building the tables from nested dicts """
+    session = connect()
+    events(session, partitions=1000, rows=rows)
+    data = {'data': {'bench': {'events': dict(session.db['bench']['events'])}},
+            'index': {'bench': dict(session.index['bench'])}}
+    
+    path = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(path, 'bench.sst')
+        t0 = time.time()
+        Cluster([':memory:'], data).freeze('bench', filename)
+        report('freeze', rows, time.time() - t0)
+        
+        t0 = time.time()
+        Cluster([':memory:'], data)
+        report('start from nested dicts', rows, time.time() - t0)
+        
+        t0 = time.time()
+        cluster = Cluster([':memory:'], None, sstables=[filename])
+        report('start from the sstable', rows, time.time() - t0)
+        
+        for name, session in (('point queries, in memory', connect()), ('point queries, sstable', cluster.connect())):
+            if name.endswith('memory'):
+                events(session, partitions=1000, rows=rows)
+            q = session.prepare("select * from bench.events where source = ? and id = ?;")
+            t0 = time.time()
+            for i in range(queries):
+                session.execute(q, ('s{}'.format(i % 1000), i % rows)).one()
+            report(name, queries, time.time() - t0, 'queries')
+    finally:
+        shutil.rmtree(path)
+
+
+def main(argv):
+    if argv[:1] == ['generate']:
+        parser = argparse.ArgumentParser(prog='python -m cassandra_mock.bench generate')
+        parser.add_argument('profile', choices=list(PROFILES))
+        parser.add_argument('filename')
+        parser.add_argument('--operations', type=int, default=100000)
+        parser.add_argument('--rate', type=float, default=10000, help='operations per second of the log')
+        parser.add_argument('--seed', type=int, default=0)
+        args = parser.parse_args(argv[1:])
+        synthetic(args.filename, args.profile, args.operations, args.rate, args.seed)
+        return
+    
+    if argv[:1] == ['replay']:
+        parser = argparse.ArgumentParser(prog='python -m cassandra_mock.bench replay')
+        parser.add_argument('filename')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--mode', choices=['thread', 'process', 'asyncio'], default='thread')
+        parser.add_argument('--speed', type=float, default=None,
+                            help='times the recorded rate, full speed without it')
+        args = parser.parse_args(argv[1:])
+        result = replay(args.filename, workers=args.workers, mode=args.mode, speed=args.speed)
+        report_replay('replay, {} {}'.format(args.workers, args.mode), result)
+        recorded = result['recorded_latency']
+        if recorded['count']:
+            print('{:<40} {:>12}'.format('  recorded p50 / p99 / p999 (us)', '{} / {} / {}'.format(
+                recorded['p50'], recorded['p99'], recorded['p999'])))
+        return
+    
+    for name in argv or BENCHMARKS:
+        print('# ' + name)
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,74 +1,434 @@
-from .tree import Tree
-from .parser import simpleSQL
+from .tree import Tree, SortedTree
+from .fastparser import parseString
+from .query import PreparedStatement, BoundStatement, BatchStatement
+from .ring import TokenRing, token
+from .scan import ScanPool, parallel_scan
+from .locks import Locks
+from .storage import Storage, Flusher
+from .sstable import SSTable, Overlay, write_sstable
+from .schema import TableMetadata
+from .index import SecondaryIndex, MaterializedView
+from .filtering import compile_filter
+from .aggregates import aggregate, aggregate_column, FUNCTIONS
+from .expiry import TableTimes, Compactor, micros
+from .counters import TableCounters, thread_stripe
+from .metrics import Metrics, QueryTrace
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice, dropwhile, product
+from collections.abc import Mapping
+import asyncio
+import operator
+import sys
+import threading
+import time
+import weakref
 import re
 
 
 # some lists and dicts logistics
 
-def merge_dicts(*dict_args):
+def walk(d, level, start=None, path=(), bounds=None, reverse=False):
     """
-    Given any number of dicts, shallow copy and merge into a new dict,
-    precedence goes to key value pairs in latter dicts.
+    d must be a dict, level is the amount of dict levels to walk down,
+    lazily yields (path, leaf) for all the leaves at that depth. If start is a path,
+    only the leaves after it are yielded. Sorted levels are walked in key order, or in
+    reverse order, bounds (lo, lo_inclusive, hi, hi_inclusive) slices the keys of the first level.
+    Other levels resume from the start key only while they have it: scans of whole tables go
+    through the partitions in token order instead, see Session._partitions()
     """
-    result = {}
-    for dictionary in dict_args:
-        result.update(dictionary)
-    return result
+    if level == 0:
+        if start is None:
+            yield path, d
+        return
+    
+    if isinstance(d, SortedTree):
+        (lo, lo_inclusive, hi, hi_inclusive) = bounds or (None, True, None, True)
+        
+        # resume from the start key
+        if start and reverse:
+            (hi, hi_inclusive) = (start[0], True)
+        elif start:
+            (lo, lo_inclusive) = (start[0], True)
+        
+        items = ((k, d[k]) for k in d.irange(lo, hi, (lo_inclusive, hi_inclusive), reverse))
+    else:
+        # iterate a copy of the keys, other threads may add or remove keys meanwhile
+        items = ((k, d.get(k)) for k in list(d))
+        if start:
+            # skip to the start key
+            items = dropwhile(lambda i: i[0] != start[0], items)
+    
+    for k, v in items:
+        if v is None:
+            continue
+        
+        # the subtree of the start key is walked after the rest of the start path
+        for i in walk(v, level - 1, start[1:] if start and k == start[0] else None, path + (k,), None, reverse):
+            yield i
 
 
-def add_index(k, v, l):
+def dive(d, keys, partition_levels, clustering_levels, depth=0, row=dict):
     """
-    takes a key, value and a list(dicts)),
-    returns a list of dicts with the extra key value added to the inner dicts
+    dives down the keys from a node at the given depth of a table, creating the missing nodes:
+    partition key levels are Trees, clustering key levels are SortedTrees and rows are dicts,
+    or the row class of the table schema
     """
-    out = []
-    for i in l:
-        i[k] = v
-        out.append(i)
-    return out
+    for k in keys:
+        depth += 1
+        # the keys of a frozen table are copied into its memtable before they are modified
+        child = d.cow(k) if isinstance(d, Overlay) else d.get(k)
+        if child is None:
+            if depth < partition_levels:
+                child = Tree()
+            elif depth < partition_levels + clustering_levels:
+                child = SortedTree()
+            else:
+                child = row()
+            d[k] = child
+        d = child
+    return d
 
 
-def flat_one(d, kn):
-    """ d must be a dict(k,list(dict)), returns a list(dict)"""
-    out = []
+def sort_levels(d, partition_levels, clustering_levels, depth=0):
+    """ returns a copy of the tree of a table, with the node types used by dive() """
+    if depth == partition_levels + clustering_levels:
+        return dict(d)
+    
+    out = SortedTree() if depth >= partition_levels else Tree()
     for k, v in d.items():
-        for i in add_index(kn, k, v):
-            out.append(i)
+        out[k] = sort_levels(v, partition_levels, clustering_levels, depth + 1)
     return out
 
 
-def flat(d, kk, level):
-    """ d must be a dict, kk is a list of key names , level is the amount of dict levels to flatten """
+def lookup(d, keys):
+    """ returns the node of d at the path keys, or None """
+    for k in keys:
+        d = d.get(k)
+        if d is None:
+            return None
+    return d
+
+
+def multi_get(d, prefixes, level, start=None, bounds=None, reverse=False):
+    """
+    lazily yields (path, leaf) for the leaves under each of the paths prefixes, in their order,
+    as walk() does under one path: the rows of an IN query. If start is a path, only the leaves
+    after it are yielded
+    """
+    if start:
+        # skip to the prefix of the start path
+        prefixes = dropwhile(lambda prefix: prefix != tuple(start[:len(prefix)]), prefixes)
+    
+    for prefix in prefixes:
+        node = lookup(d, prefix)
+        if node is None:
+            continue
+        
+        after = start[len(prefix):] if start and prefix == tuple(start[:len(prefix)]) else None
+        for i in walk(node, level, after, prefix, bounds, reverse):
+            yield i
+
+
+def count_rows(d, level):
+    """ the number of leaves of d at the given depth, the length of the last level is not walked """
     if level == 0:
-        out = [d]
-    else:
-        lc = [flat(v, kk[1:], level - 1) for v in d.values()]
-        dlc = dict(zip(d.keys(), lc))
-        out = flat_one(dlc, kk[0])
+        return 1
+    if level == 1:
+        return len(d)
+    return sum(count_rows(v, level - 1) for v in d.values() if v is not None)
+
+
+def measure(d, level, partition_level, sized=True):
+    """
+    [partitions, rows, nodes, bytes] of the subtree d, level key levels above its rows, with the partitions
+    partition_level levels down. nodes are the tree nodes above the rows, bytes an estimate of the memory of
+    the nodes, their keys, the rows and their cells. The subtrees of a frozen table which are still in its
+    file count in everything but bytes
+    """
+    out = [int(partition_level == 0), 0, 0, 0]
+    if level == 0:
+        out[1] = 1
+        if sized:
+            out[3] = sys.getsizeof(d) + sum(sys.getsizeof(v) for v in d.values())
+        return out
+    
+    out[2] = 1
+    if sized:
+        out[3] = sys.getsizeof(d)
+    frozen = isinstance(d, Overlay)
+    for k in list(d):
+        v = d.get(k)
+        if v is None:
+            continue
+        child = measure(v, level - 1, partition_level - 1, sized and (not frozen or dict.__contains__(d, k)))
+        if sized:
+            out[3] += sys.getsizeof(k)
+        for i in range(4):
+            out[i] += child[i]
     return out
 
 
+def remove(d, keys):
+    """ removes the subtree of d at the path keys, and the parent nodes left empty """
+    path = []
+    for k in keys[:-1]:
+        path.append((d, k))
+        d = d.cow(k) if isinstance(d, Overlay) else d.get(k)
+        if d is None:
+            return
+    
+    d.pop(keys[-1], None)
+    for parent, k in reversed(path):
+        if parent[k]:
+            break
+        del parent[k]
+
+
+OPERATORS = dict(eq='=', ne='!=', lt='<', le='<=', gt='>', ge='>=')
+COMPARE = {'=': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt,
+           '>=': operator.ge}
+
+
+def cast_value(s):
+    if not isinstance(s, str):
+        # the literal of a collection: ['[', values], ['{', values] or ['{', [key, value]...]
+        items = list(s[1:])
+        if s[0] == '[':
+            return [cast_value(i) for i in items]
+        if items and not isinstance(items[0], str):
+            return dict((cast_value(k), cast_value(v)) for k, v in items)
+        return set(cast_value(i) for i in items)
+    if re.search("^'.*'$", s):
+        return s[1:-1]
+    elif re.search('^[-+]?[0-9]+$', s):
+        return int(s)
+    else:
+        return float(s)
+
+
+def resolve(slots, values):
+    """
+    slots is a list of (bound, v), v is either a constant or the position of the bound value.
+    The slot of an IN is ('in', slots), or ('in', slot) of a bound list: its value is the list of values
+    """
+    return [v if b is False else values[v] if b is True else in_values(v, values) for b, v in slots]
+
+
+def in_values(slots, values):
+    return resolve(slots, values) if isinstance(slots, list) else list(resolve([slots], values)[0])
+
+
+def in_range(v, bounds):
+    """ bounds is (lo, lo_inclusive, hi, hi_inclusive), None is unbounded """
+    (lo, lo_inclusive, hi, hi_inclusive) = bounds
+    if lo is not None and (v < lo if lo_inclusive else v <= lo):
+        return False
+    if hi is not None and (v > hi if hi_inclusive else v >= hi):
+        return False
+    return True
+
+
+def holds(v, op, value):
+    """ whether the condition v op value of an IF clause holds, null is only equal to null """
+    if v is None or value is None:
+        if op in ('=', '!='):
+            return (v is None and value is None) == (op == '=')
+        return False
+    return COMPARE[op](v, value)
+
+
+def key_index(primary_key):
+    """ the index [[partition key columns], clustering key columns...] of a parsed PRIMARY KEY definition """
+    if len(primary_key) > 1:
+        return [list(primary_key[0])] + list(primary_key[2])
+    keys = list(primary_key[0])
+    return [keys[:1]] + keys[1:]
+
+
+def token_column(pkeys_keys):
+    """ the name of the selected token of the partition key, as named by cassandra """
+    return 'system.token({})'.format(', '.join(pkeys_keys))
+
+
+class Row(Mapping):
+    """
+    A read only view of a row: the values of the primary key plus the stored cells.
+    Nothing is copied, so the view reflects later updates of the row, dict(row) makes a copy.
+    """
+    
+    __slots__ = ('_layout', '_key', '_cells')
+    
+    def __init__(self, layout, key, cells):
+        # layout is shared by all rows of a query: (position of each key column,
+        # key columns listed before the cells, key columns listed after the cells)
+        self._layout = layout
+        self._key = key
+        self._cells = cells
+    
+    def __getitem__(self, k):
+        i = self._layout[0].get(k)
+        if i is None:
+            return self._cells[k]
+        return self._key[i]
+    
+    def __contains__(self, k):
+        return k in self._layout[0] or k in self._cells
+    
+    def __iter__(self):
+        (index, head, tail) = self._layout
+        for k in head:
+            yield k
+        for k in tuple(self._cells):
+            if k not in index:
+                yield k
+        for k in tail:
+            yield k
+    
+    def __len__(self):
+        index = self._layout[0]
+        return len(index) + sum(1 for k in tuple(self._cells) if k not in index)
+    
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class Session:
     DEFAULTS = dict()
     DEFAULTS['QUERY_LIMIT'] = 1000
+    DEFAULTS['PLAN_CACHE_SIZE'] = 512
+    DEFAULTS['PARSER'] = 'fast'  # or 'pyparsing'
+    DEFAULTS['FETCH_SIZE'] = 5000
+    DEFAULTS['SCAN_WORKERS'] = 0  # parallel full scans with more than 1 worker
+    DEFAULTS['SCAN_POOL'] = 'process'  # or 'thread'
+    DEFAULTS['SCAN_MIN_PARTITIONS'] = 1000  # smaller tables are scanned serially
+    DEFAULTS['EXECUTOR_THREADS'] = 4
+    DEFAULTS['MAX_IN_FLIGHT'] = 128
+    DEFAULTS['LOCK_STRIPES'] = 64
+    DEFAULTS['COUNTER_STRIPES'] = 16  # increments of counters from up to that many threads run concurrently
+    DEFAULTS['COMMITLOG_SYNC_BATCH'] = 1000  # records
+    DEFAULTS['COMMITLOG_SYNC_PERIOD'] = 1.0  # seconds
+    DEFAULTS['SNAPSHOT_PERIOD'] = 600  # seconds, None for no periodic snapshots
+    DEFAULTS['SNAPSHOT_LOG_SIZE'] = 256 * 1024 * 1024  # bytes of commit log which trigger a snapshot
+    DEFAULTS['SSTABLE_CACHE_SIZE'] = 4096  # unpickled subtrees of frozen keyspaces kept in memory
+    DEFAULTS['COMPACTION_PERIOD'] = 1.0  # seconds between the purges of expired cells
+    DEFAULTS['TOMBSTONE_GRACE'] = 60  # seconds tombstones are kept, to shadow older writes USING TIMESTAMP
+    DEFAULTS['METRICS'] = False  # clusters trace all statements and sum the traces, see Cluster.metrics()
     
-    def __init__(self, data, use_keyspace=None):
+    def __init__(self, data, use_keyspace=None, locks=None, commitlog=None, compactor=None):
         self.use_keyspace = use_keyspace
-        self.db = data['data']
-        self.index = data['index']
+        
+        # the state shared by the sessions of a cluster, its entries are kept below
+        self.data = data
+        self.db = data.setdefault('data', Tree())
+        self.index = data.setdefault('index', Tree())
+        
+        # the TableMetadata of the tables created by CREATE TABLE
+        self.schema = data.setdefault('schema', Tree())
+        
+        # the secondary indexes {keyspace: {table: {column: SecondaryIndex}}},
+        # and the materialized views {keyspace: {view: MaterializedView}}
+        self.indexes = data.setdefault('indexes', Tree())
+        self.views = data.setdefault('views', Tree())
+        
+        # partition keys of each table by token {keyspace: {table: SortedTree}}, the order of the scans
+        # of whole tables. Built by the first such scan of a table and kept by the writes from then on,
+        # or for every table when the cluster has a token ring
+        self.tokens = data.setdefault('tokens', {})
+        self.ring = data.get('ring')
+        
+        # row counts {(keyspace, table, partition key): rows} of the partitions counted by count(*),
+        # kept up to date by the writes from then on
+        self.counts = data.setdefault('counts', {})
+        
+        # bumped by each change of the schema, which invalidates the TableHandles
+        self.epoch = data.setdefault('epoch', [0])
+        
+        # write timestamps, TTLs and tombstones {keyspace: {table: TableTimes}}, purged by the compactor
+        self.times = data.setdefault('times', {})
+        self.compactor = compactor
+        
+        # bumped by each write to the tables, whose worker processes of parallel scans hold the tables as of
+        # one count, and the pool of those workers, shared by the sessions of the cluster, see scan.py.
+        # Writers holding different partition locks may lose some bumps, which is fine: the workers are
+        # forked while no other thread runs, so each write after a fork reads at least the count of the
+        # fork and stores a larger one, the count then differs from that of the workers whatever is lost
+        self.writes = data.setdefault('writes', [0])
+        self.scan_pool = data.setdefault('scan_pool', ScanPool())
+        
+        # the increments of the counter columns {keyspace: {table: TableCounters}}
+        self.counters = data.setdefault('counters', {})
+        
+        # the Metrics of the cluster, None when it does not collect them
+        self.metrics = data.get('metrics')
+        
+        # the Recorder logging the statements of the session, see workload.py
+        self.recorder = None
+        
+        # LRU cache of plans for plain string statements, of the schema epoch _plans_epoch
+        self._plans = OrderedDict()
+        self._plans_epoch = self.epoch[0]
+        
+        # rows per page of a ResultSet, None fetches all rows at once
+        self.default_fetch_size = self.DEFAULTS['FETCH_SIZE']
+        
+        # workers of the pool scanning whole tables in parallel
+        self.scan_workers = self.DEFAULTS['SCAN_WORKERS']
+        
+        # pool running the asynchronous requests, started by the first one,
+        # and the bound on the requests submitted and not yet completed
+        self._executor = None
+        self._in_flight = threading.BoundedSemaphore(self.DEFAULTS['MAX_IN_FLIGHT'])
+        self._async_slots = weakref.WeakKeyDictionary()
+        
+        # writes lock their partitions, the locks are shared by the sessions of a cluster
+        self.locks = locks if locks is not None else Locks(self.DEFAULTS['LOCK_STRIPES'],
+                                                                self.DEFAULTS['COUNTER_STRIPES'])
+        
+        # guards the plan cache and the worker pool
+        self._lock = threading.RLock()
+        
+        # in durable mode, writes are appended to the commit log before they are applied
+        self.commitlog = commitlog
     
     def set_keyspace(self, use_keyspace):
         self.use_keyspace = use_keyspace
     
+    def table(self, name):
+        """
+        a TableHandle of the table 'keyspace.table', or 'table' of the current keyspace,
+        which reads and writes rows directly, without CQL
+        """
+        from .handle import TableHandle
+        
+        (keyspace, table) = name.split('.', 1) if '.' in name else (self.use_keyspace, name)
+        return TableHandle(self, keyspace, table)
+    
     def _check_keyspace_table(self, keyspace, table=None):
         
-        if not self.db.get(keyspace):
+        if self.db.get(keyspace) is None:
             raise
         
         if table and (self.db[keyspace].get(table) is None):
             raise
     
     def _query(self, keyspace, table, sel=[], where_pkeys=[], where_ckeys=[], limit=DEFAULTS['QUERY_LIMIT']):
+        return [row for key, row in self._rows(keyspace, table, sel, where_pkeys, where_ckeys, limit)]
+    
+    def _rows(self, keyspace, table, sel=[], where_pkeys=[], where_ckeys=[], limit=DEFAULTS['QUERY_LIMIT'], start=(),
+              where_range=None, reverse=False, token_range=None, indexed=None, predicate=None, trace=None, where_in=None):
+        """
+        lazily yields (primary key, row) for the rows of a query, in clustering order, and stops at limit.
+        start is the primary key of a row, only the rows after it are yielded. where_range is
+        (lo, lo_inclusive, hi, hi_inclusive) on the clustering key after where_ckeys, reverse
+        walks the clustering keys in descending order. token_range restricts the token of the
+        partition key the same way, partitions are then scanned in token order. indexed is
+        (SecondaryIndex, value): only the rows with that value are read, from the index.
+        predicate(primary key, cells) filters the rows, before they count in the limit.
+        trace is the QueryTrace which counts the rows scanned, except those of parallel scans.
+        where_in replaces where_pkeys and where_ckeys in IN queries: it lazily yields the values of
+        primary key prefixes of the same length, in key order, whose rows are read one after the other
+        """
         
         # if no keyspace given use the default
         keyspace = keyspace if keyspace else self.use_keyspace
@@ -77,53 +437,337 @@ class Session:
         self._check_keyspace_table(keyspace, table)
         
         d = self.db[keyspace][table]
-        pkeys_keys = list(self.index[keyspace][table][0])
-        ckeys_keys = list(self.index[keyspace][table][1:]) if len(self.index[keyspace][table]) > 1 else []
+        pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+        keys = pkeys_keys + ckeys_keys
         
-        if where_pkeys:
+        prefix = []
+        if where_in is not None:
+            where_in = iter(where_in)
+            first = next(where_in, None)
+            if first is None:
+                return
+            
+            # the rows are the same views as those under a single prefix
+            prefix = list(first)
+            if len(prefix) < len(pkeys_keys) or len(prefix) > len(keys):
+                raise
+            where_in = chain([first], where_in)
+            if token_range:
+                where_in = (i for i in where_in if in_range(token(i[:len(pkeys_keys)]), token_range))
+        elif where_pkeys:
             # primary keys MUST be present or extract all table
             if len(pkeys_keys) != len(where_pkeys):
                 raise
             
-            where_pkeys_dict = dict(zip(pkeys_keys, where_pkeys))
-            
             # clustering keys MAY be present
-            clevels_all = len(ckeys_keys)
-            clevels_query = len(where_ckeys)
-            clevels_left = clevels_all - clevels_query
-            if clevels_left < 0:
+            prefix = list(where_pkeys) + list(where_ckeys)
+            if len(prefix) > len(keys):
                 raise
             
-            cl_idx = ckeys_keys[-clevels_left:] if clevels_left else []
-            where_ckeys_dict = dict(zip(ckeys_keys[0:clevels_query], where_ckeys))
+            if token_range and not in_range(token(where_pkeys), token_range):
+                return
             
-            for key in where_pkeys + where_ckeys:
-                if d.get(key):
-                    d = d[key]
-                else:
-                    d = None
-                    break
-            
-            # flatten the results as a list of dicts for the
-            # remaining clustering key clevels_all cassandra stores clustering trees
-            # as a single physical data structure, but display them as multiple rows
-            d = flat(d, cl_idx, clevels_left) if d is not None else []
+            for key in prefix:
+                d = d.get(key)
+                if d is None:
+                    return
+        
+        # cassandra stores clustering trees as a single physical data structure,
+        # but displays them as multiple rows: walk down the remaining key levels.
+        # rows are views on the key path and the stored cells, storage is never modified
+        levels = len(keys) - len(prefix)
+        layout = (dict((k, i) for i, k in enumerate(keys)), tuple(keys[:len(prefix)]), tuple(reversed(keys[len(prefix):])))
+        prefix = tuple(prefix)
+        
+        if limit < 1:
+            return
+        
+        n = 0
+        # the range restricts the next clustering key, only when the partition is given
+        bounds = where_range if prefix and levels else None
+        
+        # the token of the partition key is computed, only when selected
+        computed = token_column(pkeys_keys)
+        
+        def make_row(key, cells):
+            row = Row(layout, key, cells)
             
-            # add remaining keys (if any ouput)
-            d = [merge_dicts(where_pkeys_dict, where_ckeys_dict, v) for v in d]
+            # apply sel, conforming to cassandra if not in the struct return None
+            if sel:
+                row = dict((k, row[k]) if k in row else (k, token(key[:len(pkeys_keys)]) if k == computed else None)
+                           for k in sel)
+            return row
+        
+        # whole tables are scanned in token order, which pages resume from even when their last partition is gone
+        by_token = not prefix
+        
+        # the cells written with a TTL, which are skipped once expired
+        times = self.times.get(keyspace, {}).get(table)
+        expiring = times is not None and times.deadlines
+        
+        # the increments of counters, summed into the cells of each row
+        counters = self.counters.get(keyspace, {}).get(table)
         
+        # the (primary key, cells) of the rows, which the predicate filters before the rows are made
+        leaves = None
+        if indexed is not None:
+            leaves = self._indexed(d, prefix, indexed, len(pkeys_keys), bounds, token_range, start)
+        elif where_in is not None:
+            leaves = multi_get(d, where_in, levels, start, bounds, reverse)
+        elif by_token and not start and self.scan_workers > 1 and not expiring and counters is None and (
+                len(self._token_index(keyspace, table) or self._index_tokens(keyspace, table, len(pkeys_keys))) >=
+                self.DEFAULTS['SCAN_MIN_PARTITIONS']):
+            # full scan in chunks of partitions, walked by the pool of workers of the cluster when it can
+            size = len(pkeys_keys)
+            partitions = list(self._partitions(keyspace, table, size, token_range))
+            rows = parallel_scan(self.scan_pool, self.db, self.writes[0], keyspace, table, [i[0] for i in partitions],
+                                 levels, make_row, limit, reverse, self.scan_workers, self.DEFAULTS['SCAN_POOL'],
+                                 predicate)
+            if rows is None:
+                leaves = ((pkey + path, cells)
+                          for pkey, partition, pstart in partitions
+                          for path, cells in walk(partition, levels - size, pstart, (), None, reverse))
+        elif by_token:
+            # scan the partitions in token order, then the rows of each partition
+            size = len(pkeys_keys)
+            leaves = ((pkey + path, cells)
+                      for pkey, partition, pstart in self._partitions(keyspace, table, size, token_range, start)
+                      for path, cells in walk(partition, levels - size, pstart, (), None, reverse))
         else:
-            keys = pkeys_keys + ckeys_keys
-            d = flat(d, keys, len(keys))
+            leaves = ((prefix + path, cells)
+                      for path, cells in walk(d, levels, tuple(start[len(prefix):]) if start else None, (), bounds, reverse))
+        
+        if leaves is not None:
+            if trace is not None:
+                leaves = trace.scanned(leaves)
+            if counters is not None:
+                leaves = counters.merged_rows(leaves)
+            if expiring:
+                leaves = times.live_rows(leaves, time.time())
+            if predicate is not None:
+                leaves = ((key, cells) for key, cells in leaves if predicate(key, cells))
+            rows = ((key, make_row(key, cells)) for key, cells in leaves)
+        
+        for key, row in rows:
+            yield key, row
+            
+            # stop without looking for the next row
+            n += 1
+            if n == limit:
+                return
+    
+    def _count_groups(self, keyspace, table, sel, where_pkeys=(), grouped=False, start=None):
+        """
+        lazily yields (partition key, row) with the count(*) columns sel of a partition, or of the whole table,
+        or of each partition of the table in scan order, after the partition start, when grouped
+        """
+        size = len(self.index[keyspace][table][0])
+        if where_pkeys:
+            pkeys = [tuple(where_pkeys)] if not start else []
+        else:
+            # the start partition was returned by the previous page
+            pkeys = (pkey for pkey, partition, pstart in self._partitions(keyspace, table, size, None, start)
+                     if pstart is None)
+        counts = ((pkey, self._partition_count(keyspace, table, pkey)) for pkey in pkeys)
+        
+        if not grouped:
+            n = sum(n for pkey, n in counts)
+            yield (), dict((k, n) for k in sel)
+            return
+        
+        for pkey, n in counts:
+            if n:
+                yield pkey, dict((k, n) for k in sel)
+    
+    def _partitions(self, keyspace, table, levels, token_range=None, start=None):
+        """
+        lazily yields (partition key, partition, start) in token order for the partitions with a token
+        in token_range. With a start key, the scan resumes from its partition, which gets the rest of
+        the start key to pass to walk(), or from the next token when the partition was deleted since
+        """
+        d = self.db[keyspace][table]
+        
+        tokens = self._token_index(keyspace, table)
+        if tokens is None:
+            tokens = self._index_tokens(keyspace, table, levels)
+        
+        (lo, lo_inclusive, hi, hi_inclusive) = token_range or (None, True, None, True)
+        spkey = None
+        if start:
+            # the start partition is in the range, as it was returned by a previous page
+            spkey = tuple(start[:levels])
+            (lo, lo_inclusive) = (token(spkey), True)
         
-        # apply sel, conforming to cassandra if not in the struct return None
-        if sel:
-            d = [dict((k, v[k]) if k in v else (k, None) for k in sel) for v in d]
+        for t in tokens.irange(lo, hi, (lo_inclusive, hi_inclusive)):
+            pkeys = tuple(tokens.get(t, ()))
+            if spkey is not None and t == lo and spkey in pkeys:
+                # skip the partitions before the start one, with the same token
+                pkeys = pkeys[pkeys.index(spkey):]
+            
+            for pkey in pkeys:
+                partition = lookup(d, pkey)
+                if partition is not None:
+                    yield pkey, partition, tuple(start[levels:]) if pkey == spkey else None
+            spkey = None
+    
+    def _token_index(self, keyspace, table):
+        """ the token index of a table, None when it has none yet """
+        return self.tokens.get(keyspace, {}).get(table)
+    
+    def _index_tokens(self, keyspace, table, levels):
+        """ builds the token index of a table from its partitions, writes wait meanwhile """
+        with self.locks.all():
+            tokens = self._token_index(keyspace, table)
+            if tokens is None:
+                tokens = SortedTree()
+                for pkey, partition in walk(self.db[keyspace][table], levels):
+                    tokens.setdefault(token(pkey), []).append(pkey)
+                self.tokens.setdefault(keyspace, {})[table] = tokens
+        return tokens
+    
+    def _indexed(self, d, prefix, indexed, size, bounds=None, token_range=None, start=None):
+        """
+        lazily yields (primary key, cells) for the rows of the index entry of a value, below the node d
+        of the key prefix, in token order of their partitions and then in clustering order. With a start key,
+        only the rows after it are yielded. Reads the matching rows only
+        """
+        (index, value) = indexed
+        keys = [key for key in index.keys(value) if key[:len(prefix)] == prefix]
+        if bounds is not None:
+            keys = [key for key in keys if in_range(key[len(prefix)], bounds)]
+        
+        keys = [((token(key[:size]), key), key) for key in keys]
+        if token_range is not None:
+            keys = [(order, key) for order, key in keys if in_range(order[0], token_range)]
+        keys.sort()
+        
+        if start:
+            start = (token(tuple(start[:size])), tuple(start))
+            keys = dropwhile(lambda i: i[0] <= start, keys)
+        
+        for order, key in keys:
+            cells = lookup(d, key[len(prefix):])
+            if cells is not None:
+                yield key, cells
+    
+    def _partition_count(self, keyspace, table, pkey):
+        """ the number of rows of a partition: counted once, then kept by the writes """
+        key = (keyspace, table, tuple(pkey))
+        n = self.counts.get(key)
+        if n is None:
+            # counted under the locks of its writers, views are written under the shared lock
+            with self.locks.partition(keyspace, table, pkey), self.locks.shared:
+                node = lookup(self.db[keyspace][table], pkey)
+                n = count_rows(node, len(self.index[keyspace][table]) - 1) if node is not None else 0
+                if n:
+                    self.counts[key] = n
+        return n
+    
+    def _count_key(self, keyspace, table, pkey):
+        """ the key of a partition in counts, None when its rows are not counted """
+        if self.counts:
+            key = (keyspace, table, tuple(pkey))
+            if key in self.counts:
+                return key
+        return None
+    
+    def _uncount(self, keyspace, table, d, key):
+        """ takes the rows under the key path, about to be removed from the table d, out of the count of their partition """
+        size = len(self.index[keyspace][table][0])
+        count_key = self._count_key(keyspace, table, key[:size])
+        if count_key is not None:
+            node = lookup(d, key)
+            if node is not None:
+                n = self.counts[count_key] - count_rows(node, sum(len(i) for i in self._key_names(keyspace, table)) - len(key))
+                if n > 0:
+                    self.counts[count_key] = n
+                else:
+                    del self.counts[count_key]
+    
+    def _derived(self, keyspace, table):
+        """ the secondary indexes and the materialized views of a table, None when it has neither """
+        indexes = list(self.indexes.get(keyspace, {}).get(table, {}).values())
+        views = [view for view in self.views.get(keyspace, {}).values() if view.base == table]
+        return (indexes, views) if indexes or views else None
+    
+    def _check_writable(self, keyspace, table):
+        if table in self.views.get(keyspace, {}):
+            raise ValueError('cannot directly modify the materialized view {}.{}'.format(keyspace, table))
+    
+    def _maintain(self, keyspace, table, key, old, new, derived):
+        """
+        updates the secondary indexes and the materialized views of a table for the write of the row key,
+        old and new are copies of its cells before and after, None when the row does not exist
+        """
+        (indexes, views) = derived
+        with self.locks.shared:
+            for index in indexes:
+                a = old.get(index.column) if old is not None else None
+                b = new.get(index.column) if new is not None else None
+                if a != b:
+                    if a is not None:
+                        index.discard(a, key)
+                    if b is not None:
+                        index.add(b, key)
+            
+            if views:
+                # views are keyed by any of the columns: the full rows
+                pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+                rows = []
+                for cells in (old, new):
+                    row = None
+                    if cells is not None:
+                        row = dict(zip(pkeys_keys + ckeys_keys, key))
+                        row.update(cells)
+                    rows.append(row)
+                
+                for view in views:
+                    self._maintain_view(keyspace, view, *rows)
+    
+    def _maintain_view(self, keyspace, view, old, new):
+        """ moves the view row of a base row, old and new are the full base row before and after, or None """
+        d = self.db[keyspace][view.name]
+        size = len(view.index[0])
+        meta = self._metadata(keyspace, view.name)
+        old_key = view.key(old) if old is not None else None
+        new_key = view.key(new) if new is not None else None
         
-        # apply limit
-        d = d[0:limit]
+        if old_key is not None and old_key != new_key:
+            self._uncount(keyspace, view.name, d, old_key)
+            remove(d, list(old_key))
+            if self._token_index(keyspace, view.name) is not None and lookup(d, old_key[:size]) is None:
+                self._index_partition(keyspace, view.name, old_key[:size], False)
         
-        return d
+        if new_key is not None:
+            if self._token_index(keyspace, view.name) is not None and lookup(d, new_key[:size]) is None:
+                self._index_partition(keyspace, view.name, new_key[:size], True)
+            
+            cells = view.cells(new)
+            count_key = self._count_key(keyspace, view.name, new_key[:size])
+            if count_key is not None and lookup(d, new_key) is None:
+                self.counts[count_key] += 1
+            row = dive(d, list(new_key), size, len(view.index) - 1, row=meta.row_class if meta is not None else dict)
+            for k in [k for k in row if k not in cells]:
+                del row[k]
+            row.update(cells)
+    
+    def _index_partition(self, keyspace, table, where_pkeys, created):
+        """ adds a created partition to the token index of the table, or removes a deleted one """
+        pkey = tuple(where_pkeys)
+        t = token(pkey)
+        with self.locks.shared:
+            tokens = self._token_index(keyspace, table)
+            if tokens is None:
+                return
+            pkeys = tokens.get(t)
+            if created and pkeys is None:
+                tokens[t] = [pkey]
+            elif created and pkey not in pkeys:
+                pkeys.append(pkey)
+            elif not created and pkeys and pkey in pkeys:
+                pkeys.remove(pkey)
+                if not pkeys:
+                    del tokens[t]
     
     def _insert(self, keyspace, table, update_dict={}, where_pkeys=[], where_ckeys=[], limit=1000):
         
@@ -132,57 +776,1019 @@ class Session:
         
         # check keyspace, table
         self._check_keyspace_table(keyspace, table)
+        self._check_writable(keyspace, table)
         
-        d = self.db[keyspace][table]
         pkeys_keys = self.index[keyspace][table][0]
         ckeys_keys = self.index[keyspace][table][1:] if len(self.index[keyspace][table]) > 1 else []
         
         # both partition and clustering keys must be available
-        if len(pkeys_keys) != len(where_pkeys) and len(ckeys_keys) != len(where_ckeys):
+        if len(pkeys_keys) != len(where_pkeys) or len(ckeys_keys) != len(where_ckeys):
             raise
         
-        # update the record
-        for i in where_pkeys + where_ckeys:
-            d = d[i]  # create and dive
-
+        # typed values, checked before anything is written
+        meta = self._metadata(keyspace, table)
+        if meta is not None:
+            (where_pkeys, where_ckeys) = (meta.key(where_pkeys), meta.key(where_ckeys, len(where_pkeys)))
+            update_dict = meta.cells(update_dict)
+        
+        return self._put(keyspace, table, where_pkeys, where_ckeys, update_dict, meta)
+    
+    def _put(self, keyspace, table, where_pkeys, where_ckeys, update_dict, meta):
+        """ writes the cells of a row, the values are checked and typed, the full primary key is given """
+        d = self.db[keyspace][table]
+        
+        # writes checked against timestamps, TTLs or newer tombstones
+        times = self.times.get(keyspace, {}).get(table)
+        if times is not None and times.tracked(micros(time.time())):
+            return self._apply([(keyspace, table, where_pkeys, where_ckeys, update_dict, None)])
+        
+        derived = self._derived(keyspace, table)
+        with self.locks.partition(keyspace, table, where_pkeys):
+            self.writes[0] += 1
+            if self.commitlog is not None:
+                self.commitlog.append(('m', [(keyspace, table, list(where_pkeys), list(where_ckeys), dict(update_dict),
+                                              None)]))
+            if times is not None:
+                times.watermark = max(times.watermark, micros(time.time()))
+            
+            # new partitions are added to the token index
+            if self._token_index(keyspace, table) is not None and lookup(d, where_pkeys) is None:
+                self._index_partition(keyspace, table, where_pkeys, True)
+            
+            # the previous cells, for the indexes and views
+            key = tuple(where_pkeys) + tuple(where_ckeys)
+            if derived is not None:
+                old = lookup(d, key)
+                old = dict(old) if old is not None else None
+            
+            # a new row counts in its partition
+            count_key = self._count_key(keyspace, table, where_pkeys)
+            if count_key is not None and lookup(d, key) is None:
+                self.counts[count_key] += 1
+            
+            # update the record
+            d = dive(d, list(key), len(where_pkeys), len(where_ckeys), row=meta.row_class if meta is not None else dict)
+            
+            # update/create the record
+            for k, v in update_dict.items():
+                d[k] = v
+            
+            if derived is not None:
+                self._maintain(keyspace, table, key, old, dict(d), derived)
+    
+    def _delete(self, keyspace, table, where_pkeys=[], where_ckeys=[]):
+        return self._apply([(keyspace, table, where_pkeys, where_ckeys, None, None)])
+    
+    def _mutate(self, statements):
+        """
+        applies the mutations of a list of (plan, values) of INSERT, UPDATE and DELETE statements,
+        as a lightweight transaction when any of them has an IF clause
+        """
+        mutations = [plan.mutation(values) for plan, values in statements]
+        conditions = [(m, plan.condition(values)) for (plan, values), m in zip(statements, mutations)
+                      if plan.condition is not None]
+        if conditions:
+            return self._cas(mutations, conditions)
+        return self._apply(mutations)
+    
+    def _cas(self, mutations, conditions):
+        """
+        compare and set: applies the mutations only if all the conditions hold. conditions is a list of
+        (mutation, condition), condition is 'exists', 'not exists' or a list of (column, operator, value)
+        on the row of the mutation. The mutations must all write the same partition, which stays locked
+        from the check to the writes. Returns a ResultSet of one row {'[applied]': True}, or of a row
+        {'[applied]': False, ...} per failed condition, with the current cells it was checked against when the
+        row exists
+        """
+        partitions = set()
+        for keyspace, table, where_pkeys, where_ckeys, update_dict, options in mutations:
+            keyspace = keyspace if keyspace else self.use_keyspace
+            self._check_keyspace_table(keyspace, table)
+            self._check_writable(keyspace, table)
+            meta = self._metadata(keyspace, table)
+            partitions.add((keyspace, table, tuple(meta.key(where_pkeys) if meta is not None else where_pkeys)))
+        if len(partitions) > 1:
+            raise ValueError('a batch with conditions cannot span multiple partitions or tables')
+        
+        checks = []
+        for (keyspace, table, where_pkeys, where_ckeys, update_dict, options), condition in conditions:
+            keyspace = keyspace if keyspace else self.use_keyspace
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            if len(pkeys_keys) != len(where_pkeys) or len(ckeys_keys) != len(where_ckeys):
+                raise ValueError('conditional statements must restrict the whole primary key of {}.{}'.format(
+                    keyspace, table))
+            
+            key = tuple(where_pkeys) + tuple(where_ckeys)
+            meta = self._metadata(keyspace, table)
+            if meta is not None:
+                key = tuple(meta.key(key))
+                if not isinstance(condition, str):
+                    condition = [(k, op, meta.cast(k, v) if v is not None else None) for k, op, v in condition]
+            checks.append((keyspace, table, key, pkeys_keys + ckeys_keys, condition))
         
-        # update/create the record
-        for k, v in update_dict.items():
-            d[k] = v
+        now = time.time()
+        with self.locks.partitions(partitions):
+            failed = []
+            for keyspace, table, key, names, condition in checks:
+                cells = lookup(self.db[keyspace][table], key)
+                times = self.times.get(keyspace, {}).get(table)
+                if cells is not None and times is not None and key in times.deadlines:
+                    cells = times.live(key, cells, now)
+                
+                row = {'[applied]': False}
+                if condition == 'exists':
+                    applied = cells is not None
+                elif condition == 'not exists':
+                    applied = cells is None
+                    if not applied:
+                        row.update(zip(names, key))
+                        row.update(cells)
+                else:
+                    current = cells or {}
+                    applied = all(holds(current.get(k), op, v) for k, op, v in condition)
+                    
+                    # the values checked are returned when the row exists, as by cassandra
+                    if cells is not None:
+                        row.update((k, current.get(k)) for k, op, v in condition)
+                
+                if not applied:
+                    failed.append((key, row))
+            
+            if failed:
+                return ResultSet(iter(failed))
+            self._apply(mutations)
+        return ResultSet(iter([((), {'[applied]': True})]))
     
-    def execute(self, s):
+    def _apply(self, mutations):
+        """
+        applies a list of mutations (keyspace, table, where_pkeys, where_ckeys, update_dict, options),
+        an update_dict of None deletes the row, or all the rows under the given keys. options is None
+        or a dict with the timestamp and ttl of USING, insert for INSERT, and for deletes the range
+        on the next clustering key or the columns to delete, and for writes the updates of collections
+        in place, 'collections': [(column, op, value)] as in TableMetadata.modified(). The options of the
+        increments of counters are {'add': {column: n}}, they go to _increment().
+        All mutations are checked before any is applied, and the mutations of the same partition
+        are grouped so that each partition is looked up once
+        """
         
-        def cast_value(s):
-            if re.search("^'.*'$", s):
-                return s[1:-1]
-            elif re.search('^[-+]?[0-9]+$', s):
-                return int(s)
+        increments = [m for m in mutations if m[5] is not None and 'add' in m[5]]
+        if increments:
+            if len(increments) != len(mutations):
+                raise ValueError('a batch cannot mix counter and non counter mutations')
+            for keyspace, table, where_pkeys, where_ckeys, update_dict, options in increments:
+                self._increment(keyspace, table, where_pkeys, where_ckeys, options['add'])
+            return
+        
+        now = time.time()
+        partitions = OrderedDict()
+        indexed = False
+        for keyspace, table, where_pkeys, where_ckeys, update_dict, options in mutations:
+            
+            # if no keyspace given use the default
+            keyspace = keyspace if keyspace else self.use_keyspace
+            
+            # check keyspace, table
+            self._check_keyspace_table(keyspace, table)
+            self._check_writable(keyspace, table)
+            
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            
+            # writes need the full primary key, deletes may leave out trailing clustering keys
+            if len(pkeys_keys) != len(where_pkeys) or len(ckeys_keys) < len(where_ckeys):
+                raise ValueError('wrong number of key values for {}.{}'.format(keyspace, table))
+            if update_dict is not None and len(ckeys_keys) != len(where_ckeys):
+                raise ValueError('missing clustering key values for {}.{}'.format(keyspace, table))
+            
+            meta = self._metadata(keyspace, table)
+            if meta is not None:
+                (where_pkeys, where_ckeys) = (meta.key(where_pkeys), meta.key(where_ckeys, len(where_pkeys)))
+                update_dict = meta.cells(update_dict) if update_dict is not None else None
+                if options is not None and options.get('range') is not None:
+                    (lo, lo_inclusive, hi, hi_inclusive) = options['range']
+                    k = ckeys_keys[len(where_ckeys)]
+                    options = dict(options, range=(meta.cast(k, lo), lo_inclusive, meta.cast(k, hi), hi_inclusive))
+                if options is not None and options.get('collections'):
+                    options = dict(options, collections=[(k, op, meta.operand(k, op, v))
+                                                         for k, op, v in options['collections']])
+                    indexed = indexed or any(op == '[]' for k, op, v in options['collections'])
+            elif options is not None and options.get('collections'):
+                raise ValueError('collection updates need the schema of {}.{}'.format(keyspace, table))
+            
+            # the time of the write is logged with it, so that a replay expires the cells at the same time
+            if options is not None or update_dict is None:
+                options = dict(options or {})
+                options.setdefault('time', now)
+            
+            key = (keyspace, table, tuple(where_pkeys))
+            partitions.setdefault(key, []).append((list(where_ckeys), update_dict, options))
+        
+        # the partitions of a batch are all locked while it is applied
+        with self.locks.partitions(partitions):
+            self.writes[0] += 1
+            if indexed:
+                # the elements of lists set by index must be there, checked before anything is logged or written
+                for (keyspace, table, where_pkeys), rows in partitions.items():
+                    meta = self._metadata(keyspace, table)
+                    for where_ckeys, update_dict, options in rows:
+                        cells = lookup(self.db[keyspace][table], tuple(where_pkeys) + tuple(where_ckeys))
+                        for k, op, v in (options or {}).get('collections', ()):
+                            error = meta.index_error(k, cells.get(k) if cells is not None else None, op, v)
+                            if error is not None:
+                                raise error
+            
+            if self.commitlog is not None:
+                self.commitlog.append(('m', [(keyspace, table, list(where_pkeys), where_ckeys, update_dict, options)
+                                             for (keyspace, table, where_pkeys), rows in partitions.items()
+                                             for where_ckeys, update_dict, options in rows]))
+            
+            for (keyspace, table, where_pkeys), rows in partitions.items():
+                levels = [len(i) for i in self._key_names(keyspace, table)]
+                meta = self._metadata(keyspace, table)
+                row = meta.row_class if meta is not None else dict
+                derived = self._derived(keyspace, table)
+                tokens = self._token_index(keyspace, table)
+                existed = tokens is not None and lookup(self.db[keyspace][table], where_pkeys) is not None
+                
+                # dive to the parent of the partition once
+                d = dive(self.db[keyspace][table], where_pkeys[:-1], *levels)
+                
+                for where_ckeys, update_dict, options in rows:
+                    key = tuple(where_pkeys) + tuple(where_ckeys)
+                    
+                    # deletes leave tombstones, USING needs the timestamps of the table
+                    times = self.times.get(keyspace, {}).get(table)
+                    if times is None and options is not None and (update_dict is None or 'ttl' in options or
+                                                                   'timestamp' in options):
+                        times = self._table_times(keyspace, table, options['time'])
+                    
+                    if update_dict is None:
+                        self._remove(keyspace, table, key, options, times, derived)
+                        continue
+                    
+                    node = lookup(d, key[len(where_pkeys) - 1:])
+                    if times is not None:
+                        options = options or {}
+                        ttl = options.get('ttl')
+                        update_dict = times.write(key, levels[0], update_dict, node, options.get('timestamp'),
+                                                  options['time'] + ttl if ttl else None, options.get('time', now),
+                                                  options.get('insert', False))
+                        if update_dict is None:
+                            # shadowed by a tombstone
+                            continue
+                    
+                    old = None
+                    if derived is not None:
+                        old = dict(node) if node is not None else None
+                    
+                    count_key = self._count_key(keyspace, table, where_pkeys)
+                    if count_key is not None and node is None:
+                        self.counts[count_key] += 1
+                    
+                    # update/create the record
+                    cells = dive(d, list(where_pkeys[-1:]) + where_ckeys, *levels, depth=len(where_pkeys) - 1, row=row)
+                    cells.update(update_dict)
+                    
+                    # collections are updated in place, or in a copy when the indexes and views need the old value
+                    for k, op, v in (options or {}).get('collections', ()):
+                        current = cells.get(k)
+                        if derived is not None and current is not None:
+                            current = type(current)(current)
+                        current = meta.modified(k, current, op, v)
+                        if current is not None:
+                            cells[k] = current
+                        elif k in cells:
+                            del cells[k]
+                    
+                    if derived is not None:
+                        self._maintain(keyspace, table, key, old, dict(cells), derived)
+                
+                # keep the token index in step with the partitions created or deleted
+                if tokens is not None:
+                    exists = lookup(self.db[keyspace][table], where_pkeys) is not None
+                    if exists != existed:
+                        self._index_partition(keyspace, table, where_pkeys, exists)
+    
+    def _remove(self, keyspace, table, key, options=None, times=None, derived=None):
+        """
+        deletes the rows under the key path, or those within options['range'] on the next clustering key,
+        or the cells options['columns'] of the row key. With options['timestamp'], the cells written after
+        it are kept. The caller holds the lock of the partition
+        """
+        d = self.db[keyspace][table]
+        options = options or {}
+        (bounds, columns, timestamp) = (options.get('range'), options.get('columns'), options.get('timestamp'))
+        size = len(self.index[keyspace][table][0])
+        levels = sum(len(i) for i in self._key_names(keyspace, table))
+        
+        counters = self.counters.get(keyspace, {}).get(table)
+        if counters is not None:
+            for i in list(counters.stripes):
+                with self.locks.counters[i % len(self.locks.counters)]:
+                    counters.drop(i, key, levels, bounds, columns)
+        
+        # a delete without USING TIMESTAMP still shadows the older writes USING TIMESTAMP that follow it
+        if times is not None and columns is None:
+            times.delete(key, size, levels, bounds, timestamp if timestamp is not None else micros(options['time']),
+                         options['time'])
+        
+        if times is None and bounds is None and columns is None and derived is None:
+            # the whole subtree goes at once
+            self._uncount(keyspace, table, d, key)
+            remove(d, list(key))
+            return
+        
+        if isinstance(d, Overlay):
+            # the cells of a frozen table are deleted in the memtable
+            d.cow(key[0])
+        node = lookup(d, key)
+        if node is None:
+            return
+        rows = [(key + path, cells) for path, cells in walk(node, levels - len(key), None, (), bounds)]
+        
+        for k, cells in rows:
+            dropped = [c for c in (columns if columns is not None else cells) if c in cells]
+            if times is not None and timestamp is not None:
+                dropped = [c for c in dropped if not times.newer(k, c, timestamp)]
+            
+            old = dict(cells) if derived is not None else None
+            gone = columns is None and len(dropped) == len(cells)
+            if gone:
+                self._uncount(keyspace, table, d, k)
+                remove(d, list(k))
             else:
-                return float(s)
+                for c in dropped:
+                    del cells[c]
+            
+            if times is not None:
+                times.discard(k, None if gone else dropped)
+            if derived is not None:
+                self._maintain(keyspace, table, k, old, None if gone else dict(cells), derived)
+    
+    def _increment(self, keyspace, table, where_pkeys, where_ckeys, deltas):
+        """
+        adds deltas {column: n} to the counter columns of a row, see counters.py. The row is written
+        as any other the first time, its increments only lock the counter stripe of the thread
+        """
         
-        p = simpleSQL.parseString(s)
+        # if no keyspace given use the default
+        keyspace = keyspace if keyspace else self.use_keyspace
         
-        if p[0] == 'use':
-            self.set_keyspace(p[1])
+        # check keyspace, table
+        self._check_keyspace_table(keyspace, table)
+        self._check_writable(keyspace, table)
+        
+        pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+        if len(pkeys_keys) != len(where_pkeys) or len(ckeys_keys) != len(where_ckeys):
+            raise ValueError('wrong number of key values for {}.{}'.format(keyspace, table))
+        
+        meta = self._metadata(keyspace, table)
+        if meta is not None:
+            (where_pkeys, where_ckeys) = (meta.key(where_pkeys), meta.key(where_ckeys, len(where_pkeys)))
+            for k in deltas:
+                if k not in meta.counters:
+                    raise ValueError('cannot increment {}, not a counter column of {}.{}'.format(k, keyspace, table))
+            deltas = dict((k, meta.cast(k, n)) for k, n in deltas.items())
+        
+        key = tuple(where_pkeys) + tuple(where_ckeys)
+        if lookup(self.db[keyspace][table], key) is None:
+            self._put(keyspace, table, where_pkeys, where_ckeys, {}, meta)
+        
+        counters = self.counters.get(keyspace, {}).get(table)
+        if counters is None:
+            with self.locks.shared:
+                counters = self.counters.setdefault(keyspace, {}).setdefault(table, TableCounters())
+        
+        i = thread_stripe(len(self.locks.counters))
+        with self.locks.counters[i]:
+            if self.commitlog is not None:
+                self.commitlog.append(('c', keyspace, table, key, deltas))
+            counters.add(i, key, deltas)
+    
+    def _table_times(self, keyspace, table, now):
+        """ the TableTimes of a table, created on the first use, which starts the compactor """
+        times = self.times.setdefault(keyspace, {}).setdefault(table, TableTimes(now))
+        if self.compactor is not None:
+            self.compactor.ensure_started()
+        return times
+    
+    def _compact(self, now, grace=None):
+        """ purges the expired cells and rows of all tables, and the tombstones older than grace seconds """
+        for keyspace, tables in list(self.times.items()):
+            for table, times in list(tables.items()):
+                for key in times.due(now):
+                    self._expire(keyspace, table, key, now)
+                if grace is not None:
+                    times.gc(now - grace)
+    
+    def _expire(self, keyspace, table, key, now):
+        """ removes the expired cells of a row, and the row if it expired """
+        index = self.index.get(keyspace, {}).get(table)
+        if index is None:
             return
+        size = len(index[0])
+        derived = self._derived(keyspace, table)
+        with self.locks.partition(keyspace, table, key[:size]):
+            self.writes[0] += 1
+            times = self.times.get(keyspace, {}).get(table)
+            d = self.db.get(keyspace, {}).get(table)
+            if isinstance(d, Overlay):
+                # the row of a frozen table is modified in the memtable
+                d.cow(key[0])
+            cells = lookup(d, key) if d is not None and times is not None else None
+            if cells is None:
+                return
+            
+            live = times.live(key, cells, now)
+            old = dict(cells) if derived is not None else None
+            if live is None:
+                self._uncount(keyspace, table, d, key)
+                remove(d, list(key))
+                times.discard(key)
+                if self._token_index(keyspace, table) is not None and lookup(d, key[:size]) is None:
+                    self._index_partition(keyspace, table, key[:size], False)
+            else:
+                for c in [c for c in cells if c not in live]:
+                    del cells[c]
+                times.expired(key, now)
+            
+            if derived is not None:
+                self._maintain(keyspace, table, key, old, None if live is None else dict(cells), derived)
+    
+    def bulk_load(self, keyspace, table, rows, columns=None):
+        """
+        loads rows straight into the table, bypassing CQL. Rows are dicts, or tuples
+        with values in the order of columns. Consecutive rows of the same partition
+        share the partition lookup. Returns the number of rows loaded
+        """
+        
+        # if no keyspace given use the default
+        keyspace = keyspace if keyspace else self.use_keyspace
+        
+        # check keyspace, table
+        self._check_keyspace_table(keyspace, table)
+        self._check_writable(keyspace, table)
+        
+        pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+        keys = set(pkeys_keys + ckeys_keys)
+        meta = self._metadata(keyspace, table)
+        derived = self._derived(keyspace, table)
+        times = self.times.get(keyspace, {}).get(table)
+        
+        n = 0
+        last, partition, lock = None, None, None
+        try:
+            for row in rows:
+                if not isinstance(row, dict):
+                    if columns is None:
+                        raise ValueError('columns must be given to load rows as tuples')
+                    row = dict(zip(columns, row))
+                
+                where_pkeys = tuple(row[k] for k in pkeys_keys)
+                if meta is not None:
+                    where_pkeys = tuple(meta.key(where_pkeys))
+                if where_pkeys != last:
+                    # the partition stays locked while its consecutive rows are loaded
+                    if lock is not None:
+                        lock.release()
+                    lock = self.locks.partition(keyspace, table, where_pkeys)
+                    lock.acquire()
+                    self.writes[0] += 1
+                    
+                    if self._token_index(keyspace, table) is not None and lookup(self.db[keyspace][table],
+                                                                                  where_pkeys) is None:
+                        self._index_partition(keyspace, table, where_pkeys, True)
+                    # without clustering columns, the partition is the row
+                    partition = dive(self.db[keyspace][table], where_pkeys, len(pkeys_keys), len(ckeys_keys),
+                                     row=meta.row_class if meta is not None else dict)
+                    last = where_pkeys
+                
+                where_ckeys = [row[k] for k in ckeys_keys]
+                cells = dict((k, v) for k, v in row.items() if k not in keys)
+                if meta is not None:
+                    (where_ckeys, cells) = (meta.key(where_ckeys, len(pkeys_keys)), meta.cells(cells))
+                if self.commitlog is not None:
+                    self.commitlog.append(('m', [(keyspace, table, list(where_pkeys), where_ckeys, cells, None)]))
+                
+                old = None
+                if derived is not None or times is not None:
+                    old = lookup(partition, where_ckeys)
+                if times is not None:
+                    cells = times.write(where_pkeys + tuple(where_ckeys), len(pkeys_keys), cells, old)
+                    if cells is None:
+                        continue
+                if derived is not None:
+                    old = dict(old) if old is not None else None
+                
+                count_key = self._count_key(keyspace, table, where_pkeys)
+                if count_key is not None and lookup(partition, where_ckeys) is None:
+                    self.counts[count_key] += 1
+                
+                row = dive(partition, where_ckeys, len(pkeys_keys), len(ckeys_keys), len(pkeys_keys),
+                           meta.row_class if meta is not None else dict)
+                row.update(cells)
+                if derived is not None:
+                    self._maintain(keyspace, table, where_pkeys + tuple(where_ckeys), old, dict(row), derived)
+                n += 1
+        finally:
+            if lock is not None:
+                lock.release()
+        
+        return n
+    
+    def _create_table(self, keyspace, table, index, schema=None, if_not_exists=False):
+        with self.locks.shared:
+            if if_not_exists and self.db[keyspace].get(table) is not None:
+                return
+            if self.commitlog is not None:
+                self.commitlog.append(('t', keyspace, table, index, schema))
+            self._new_table(keyspace, table, index, schema)
+    
+    def _new_table(self, keyspace, table, index, schema):
+        """
+        creates an empty table, the indexes, views, row counts, timestamps and counter increments of the
+        previous table of that name are dropped
+        """
+        self.epoch[0] += 1
+        self.writes[0] += 1
+        self.index.setdefault(keyspace, Tree())[table] = index
+        if schema is not None:
+            self.schema.setdefault(keyspace, Tree())[table] = schema
+        else:
+            self.schema.get(keyspace, {}).pop(table, None)
+        
+        # create an empty tree in db
+        self.db.setdefault(keyspace, Tree())[table] = Tree()
+        # with a token ring every table is indexed, else the first scan of the whole table indexes it
+        if self.ring is not None:
+            self.tokens.setdefault(keyspace, {})[table] = SortedTree()
+        else:
+            self.tokens.get(keyspace, {}).pop(table, None)
+        
+        self.indexes.get(keyspace, {}).pop(table, None)
+        dropped = {table}
+        for view in list(self.views.get(keyspace, {}).values()):
+            if view.name == table or view.base == table:
+                del self.views[keyspace][view.name]
+            if view.base == table:
+                dropped.add(view.name)
+                for d in (self.db, self.index, self.schema, self.tokens):
+                    d.get(keyspace, {}).pop(view.name, None)
+        
+        for key in [key for key in self.counts if key[0] == keyspace and key[1] in dropped]:
+            del self.counts[key]
+        for name in dropped:
+            self.times.get(keyspace, {}).pop(name, None)
+            self.counters.get(keyspace, {}).pop(name, None)
+    
+    def _create_index(self, keyspace, table, column, name):
+        # writes wait while the index is built from the rows of the table
+        with self.locks.all():
+            if self.commitlog is not None:
+                self.commitlog.append(('i', keyspace, table, column, name))
+            
+            index = SecondaryIndex(name, keyspace, table, column)
+            for key, cells in walk(self.db[keyspace][table], sum(len(i) for i in self._key_names(keyspace, table))):
+                v = cells.get(column)
+                if v is not None:
+                    index.add(v, key)
+            self.indexes.setdefault(keyspace, Tree()).setdefault(table, Tree())[column] = index
+            self.epoch[0] += 1
+    
+    def _create_view(self, keyspace, name, base, columns, index):
+        # writes wait while the view is built from the rows of the base table
+        with self.locks.all():
+            if self.commitlog is not None:
+                self.commitlog.append(('v', keyspace, name, base, columns, index))
+            
+            view = MaterializedView(keyspace, name, base, columns, index, self.index[keyspace][base])
+            
+            # the schema of the view has the types of the base table
+            schema = None
+            meta = self._metadata(keyspace, base)
+            if meta is not None:
+                schema = TableMetadata(keyspace, name, [(k, t) for k, t in meta.columns.items()
+                                                        if view.columns is None or k in view.keys or k in view.columns],
+                                       index[0], index[1:])
+            self._new_table(keyspace, name, index, schema)
+            self.views.setdefault(keyspace, Tree())[name] = view
+            
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, base)
+            for key, cells in walk(self.db[keyspace][base], len(pkeys_keys) + len(ckeys_keys)):
+                row = dict(zip(pkeys_keys + ckeys_keys, key))
+                row.update(cells)
+                self._maintain_view(keyspace, view, None, row)
+    
+    def _replay(self, record):
+        """ applies a record of the commit log """
+        if record[0] == 't':
+            self._create_table(*record[1:])
+        elif record[0] == 'i':
+            self._create_index(*record[1:])
+        elif record[0] == 'v':
+            self._create_view(*record[1:])
+        elif record[0] == 'c':
+            (keyspace, table, key, deltas) = record[1:]
+            size = len(self._key_names(keyspace, table)[0])
+            self._increment(keyspace, table, key[:size], key[size:], deltas)
+        else:
+            # the mutations of older logs have no options
+            self._apply([tuple(m) + (None,) * (6 - len(m)) for m in record[1]])
+    
+    def _parse(self, s):
+        if self.DEFAULTS['PARSER'] == 'pyparsing':
+            # the pyparsing grammar is only imported when selected
+            from .parser import simpleSQL
+            return simpleSQL.parseString(s)
+        return parseString(s)
+    
+    def prepare(self, query):
+        """
+        parse and plan the query once, returns a PreparedStatement
+        which can be executed with values for its ? or :name bind markers
+        """
+        epoch = self.epoch[0]
+        return PreparedStatement(query, self.use_keyspace, self._plan(self._parse(query)), epoch)
+    
+    def _prepared_plan(self, prepared):
+        """
+        the plan of a PreparedStatement, made again from its query string when the schema changed
+        since it was planned, in the keyspace it was prepared in
+        """
+        epoch = self.epoch[0]
+        if prepared.epoch != epoch:
+            session = self
+            if prepared.keyspace != self.use_keyspace:
+                session = Session(self.data, prepared.keyspace, self.locks, self.commitlog, self.compactor)
+            
+            # the plan goes first: a thread seeing the new epoch also sees the new plan
+            prepared.plan = session._plan(session._parse(prepared.query_string))
+            prepared.epoch = epoch
+        return prepared.plan
+    
+    def _cached_plan(self, s, trace=None):
+        # plans depend on the current keyspace for unqualified table names
+        key = (self.use_keyspace, s)
+        with self._lock:
+            # a change of the schema by any session of the cluster drops the plans made before
+            epoch = self.epoch[0]
+            if self._plans_epoch != epoch:
+                self._plans.clear()
+                self._plans_epoch = epoch
+            plan = self._plans.pop(key, None)
+        
+        if trace is not None:
+            trace.cached(plan is not None)
+            if plan is None:
+                plan = trace.timed('plan', self._plan, trace.timed('parse', self._parse, s))
+        
+        if plan is None:
+            plan = self._plan(self._parse(s))
+        
+        # most recently used plans go last, unless the schema changed meanwhile
+        with self._lock:
+            if self._plans_epoch != epoch or self.epoch[0] != epoch:
+                return plan
+            if key not in self._plans and len(self._plans) >= self.DEFAULTS['PLAN_CACHE_SIZE']:
+                self._plans.popitem(last=False)
+            self._plans[key] = plan
+        return plan
+    
+    def execute(self, query, parameters=None, paging_state=None, trace=False):
+        """
+        executes a statement: a string, a prepared, bound or batch statement.
+        SELECT returns a ResultSet, fetched fetch_size rows at a time, to continue
+        a query pass the paging_state of the previous page. With trace, the result
+        is a ResultSet whose get_query_trace() has the timings of the statement
+        """
+        
+        if trace or self.metrics is not None or self.recorder is not None:
+            return self._traced(query, parameters, paging_state, trace)
+        
+        fetch_size = getattr(query, 'fetch_size', None) or self.default_fetch_size
+        
+        if isinstance(query, BoundStatement):
+            plan = self._prepared_plan(query.prepared_statement)
+            parameters = query.values
+        elif isinstance(query, PreparedStatement):
+            plan = self._prepared_plan(query)
+        elif isinstance(query, BatchStatement):
+            return self._mutate(self._batch(query))
+        else:
+            plan = self._cached_plan(query)
+        
+        values = plan.bind(parameters)
+        if plan.rows is None:
+            return plan.run(values)
+        
+        if paging_state:
+            (start, returned) = paging_state
+            return ResultSet(plan.rows(values, start, returned), fetch_size, returned)
+        
+        return ResultSet(plan.rows(values), fetch_size)
+    
+    def _traced(self, query, parameters, paging_state, trace):
+        """
+        execute() in a QueryTrace, added to the metrics of the cluster, logged by the recorder
+        of the session and kept by the result with trace
+        """
+        statement = query
+        tracer = QueryTrace(query, self.metrics)
+        fetch_size = getattr(query, 'fetch_size', None) or self.default_fetch_size
+        
+        if isinstance(query, BatchStatement):
+            tracer.statement = 'batch'
+            result = tracer.timed('execute', self._mutate, self._batch(query, tracer))
+        else:
+            if isinstance(query, BoundStatement):
+                plan = self._prepared_plan(query.prepared_statement)
+                parameters = query.values
+            elif isinstance(query, PreparedStatement):
+                plan = self._prepared_plan(query)
+            else:
+                plan = self._cached_plan(query, tracer)
+            (tracer.statement, tracer.keyspace, tracer.table) = plan.statement
+            
+            values = tracer.timed('bind', plan.bind, parameters)
+            if plan.rows is None:
+                result = tracer.timed('execute', plan.run, values)
+            else:
+                (start, returned) = paging_state or ((), 0)
+                result = ResultSet(tracer.fetched(plan.rows(values, start, returned, tracer)), fetch_size, returned)
+        
+        tracer.finish()
+        if self.recorder is not None:
+            self.recorder.record(statement, parameters, self.use_keyspace, tracer)
+        if not trace:
+            return result
+        
+        # writes return no rows, their trace is kept by an empty result
+        if result is None:
+            result = ResultSet(iter(()))
+        result._trace = tracer
+        return result
+    
+    def execute_async(self, query, parameters=None, paging_state=None, trace=False):
+        """
+        executes a statement on the worker pool of the session, returns a ResponseFuture.
+        Blocks while MAX_IN_FLIGHT requests are running
+        """
+        self._in_flight.acquire()
+        return ResponseFuture(self._submit(query, parameters, paging_state, trace))
+    
+    async def aexecute(self, query, parameters=None, paging_state=None, trace=False):
+        """ awaitable execute, runs the statement on the worker pool without blocking the event loop """
+        
+        # coroutines queue on the loop, at most MAX_IN_FLIGHT of them go for a slot of the pool
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.DEFAULTS['MAX_IN_FLIGHT'])
+        
+        async with slots:
+            if not self._in_flight.acquire(blocking=False):
+                # the slots are taken by execute_async, wait for one in a thread of the loop
+                waiter = loop.run_in_executor(None, self._in_flight.acquire)
+                try:
+                    await asyncio.shield(waiter)
+                except asyncio.CancelledError:
+                    waiter.add_done_callback(lambda f: self._in_flight.release())
+                    raise
+            return await asyncio.wrap_future(self._submit(query, parameters, paging_state, trace))
+    
+    def _submit(self, query, parameters, paging_state, trace=False):
+        # the caller holds a slot of _in_flight, released when the request completes
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.DEFAULTS['EXECUTOR_THREADS'], 'cassandra_mock')
+            future = self._executor.submit(self.execute, query, parameters, paging_state, trace)
+        except:
+            self._in_flight.release()
+            raise
+        
+        future.add_done_callback(lambda f: self._in_flight.release())
+        return future
+    
+    def shutdown(self):
+        """ waits for the asynchronous requests and stops the worker pool """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+    
+    def _batch(self, batch, trace=None):
+        """ returns the plans and bound values of the statements in a batch """
+        out = []
+        for query, parameters in batch.statements:
+            if isinstance(query, BoundStatement):
+                plan = self._prepared_plan(query.prepared_statement)
+                parameters = query.values
+            elif isinstance(query, PreparedStatement):
+                plan = self._prepared_plan(query)
+            else:
+                plan = self._cached_plan(query, trace)
+            
+            if plan.mutation is None:
+                raise ValueError('only INSERT, UPDATE and DELETE statements are allowed in a batch')
+            out.append((plan, plan.bind(parameters)))
+        return out
+    
+    def _table_name(self, b):
+        return (b[0], b[2]) if len(b) > 1 else (self.use_keyspace, b[0])
+    
+    def _metadata(self, keyspace, table):
+        """ the TableMetadata of a table, None for the tables of the initial data which have no schema """
+        return self.schema.get(keyspace, {}).get(table)
+    
+    def _key_names(self, keyspace, table):
+        pkeys_keys = list(self.index[keyspace][table][0])
+        ckeys_keys = list(self.index[keyspace][table][1:]) if len(self.index[keyspace][table]) > 1 else []
+        return pkeys_keys, ckeys_keys
+    
+    def _plan(self, p, markers=None):
+        """
+        turns a parsed statement into a Plan: tables and key positions are resolved
+        and literals are cast here, once, so that running the plan skips the grammar
+        """
+        plan = self._plan_statement(p, markers)
+        
+        # the statement and the table the traces of the plan are reported under
+        name = p.get('view') or p.get('table')
+        (keyspace, table) = self._table_name(name) if name else (None, None)
+        kind = ' '.join(p[:2]) if p[0] == 'create' else p[0]
+        plan.statement = (kind, keyspace, table)
+        return plan
+    
+    def _plan_statement(self, p, markers=None):
+        
+        # statements in a batch share the bind markers of the batch
+        markers = [] if markers is None else markers
+        
+        def slot(s):
+            # a slot is either a constant or the position of a bound value
+            if s == '?':
+                markers.append(None)
+                return True, len(markers) - 1
+            elif s[0] == ':':
+                markers.append(s[1:])
+                return True, len(markers) - 1
+            else:
+                return False, cast_value(s)
+        
+        def where_keys(b, pkeys_keys, ckeys_keys, filtering=False, multi=False):
+            """
+            slots of the key restrictions of a where clause: equalities on the partition key,
+            equalities on a prefix of the clustering key, a range on the next clustering key,
+            and a range on the token of the partition key, plus the conditions left to filter the
+            rows with: those on the regular columns, and with filtering, the key conditions
+            which do not select a slice of the table. With multi, the equalities can be INs
+            """
+            conditions = []
+            token_slots = None
+            if b:
+                for i in range(len(b)):
+                    if not (i % 2):
+                        continue;
+                    (k, op, v) = (b[i][0], OPERATORS.get(b[i][1], b[i][1]), b[i][2])
+                    if op == 'in':
+                        # a list of values, or the bind marker of a list
+                        v = ('in', slot(v) if isinstance(v, str) else [slot(s) for s in v])
+                        if not multi:
+                            raise ValueError('IN is only supported in SELECT')
+                    else:
+                        v = slot(v)
+                    if isinstance(k, str):
+                        conditions.append((k, op, v))
+                        continue
+                    
+                    # token(partition key columns), as (lo, lo_inclusive, hi, hi_inclusive)
+                    if list(k[1]) != pkeys_keys or op not in ('=', '<', '<=', '>', '>='):
+                        raise ValueError('token() must be restricted by =, <, <=, > or >= '
+                                         'on the partition key columns {}'.format(', '.join(pkeys_keys)))
+                    token_slots = token_slots or [(False, None), True, (False, None), True]
+                    if op[0] in '>=':
+                        token_slots[0:2] = [v, op != '>']
+                    if op[0] in '<=':
+                        token_slots[2:4] = [v, op != '<']
+            
+            where_kv = dict((k, v) for k, op, v in conditions if op in ('=', 'in'))
+            others = [(k, op, v) for k, op, v in conditions if k not in pkeys_keys + ckeys_keys]
+            pkeys_slots = [where_kv[k] for k in pkeys_keys if k in where_kv]
+            
+            if filtering and (len(pkeys_slots) != len(pkeys_keys) or
+                              any(k in pkeys_keys and op not in ('=', 'in') for k, op, v in conditions)):
+                # without the partition, the table is scanned and all the conditions filter its rows
+                return [], [], None, token_slots, conditions
+            
+            ckeys_slots = []
+            for k in ckeys_keys:
+                if k not in where_kv:
+                    break
+                ckeys_slots.append(where_kv[k])
+            
+            range_slots = None
+            for k, op, v in conditions:
+                if k in pkeys_keys and op not in ('=', 'in'):
+                    raise ValueError('only = and IN are supported on the partition key column {}'.format(k))
+                if k not in ckeys_keys or k in ckeys_keys[:len(ckeys_slots)]:
+                    continue
+                if filtering and (op not in ('<', '<=', '>', '>=') or k != ckeys_keys[len(ckeys_slots)]):
+                    others.append((k, op, v))
+                    continue
+                if op not in ('<', '<=', '>', '>=') or k != ckeys_keys[len(ckeys_slots)]:
+                    raise ValueError('clustering key column {} must be restricted by = on the previous '
+                                     'clustering columns, and may be restricted by a range on the next one'.format(k))
+                
+                # (lo, lo_inclusive, hi, hi_inclusive)
+                range_slots = range_slots or [(False, None), True, (False, None), True]
+                if op[0] == '>':
+                    range_slots[0:2] = [v, op == '>=']
+                else:
+                    range_slots[2:4] = [v, op == '<=']
+            
+            return pkeys_slots, ckeys_slots, range_slots, token_slots, others
+        
+        def using(b, insert=False):
+            """ the function of the bound values which returns the options of the mutations of USING """
+            slots = [(i[0], slot(i[1])) for i in (b[1:] if b else []) if not isinstance(i, str)]
+            
+            def options(values):
+                out = {'insert': True} if insert else None
+                for k, v in zip([k for k, s in slots], resolve([s for k, s in slots], values)):
+                    if isinstance(v, bool) or not isinstance(v, int) or v < 0:
+                        raise ValueError('{} must be a non negative integer, not {!r}'.format(k.upper(), v))
+                    if k == 'ttl' and not v:
+                        # TTL 0 is no TTL
+                        continue
+                    out = out or {}
+                    out[k] = v
+                return out
+            
+            return options
+        
+        def conditions(b, keyspace, table):
+            """
+            the function of the bound values which returns the condition of IF: 'exists', 'not exists',
+            or a list of (column, operator, value) on the regular columns of the row. None without IF
+            """
+            if not b:
+                return None
+            meta = self._metadata(keyspace, table)
+            if meta is not None and meta.counters:
+                raise ValueError('conditional statements are not supported on counter tables')
+            if 'using' in p and any(not isinstance(i, str) and i[0] == 'timestamp' for i in p['using'][1:]):
+                raise ValueError('cannot provide a custom timestamp for conditional updates')
+            
+            if isinstance(b[1], str):
+                condition = ' '.join(b[1:])
+                if condition == 'not exists' and p[0] != 'insert':
+                    raise ValueError('IF NOT EXISTS is only supported by INSERT')
+                return lambda values: condition
+            
+            keys = sum(self._key_names(keyspace, table), [])
+            slots = []
+            for i in b[1:]:
+                if isinstance(i, str):
+                    continue
+                (k, op) = (i[0], OPERATORS.get(i[1], i[1]))
+                if not isinstance(k, str) or k in keys:
+                    raise ValueError('IF conditions must be on regular columns, not on the primary key')
+                if meta is not None and k not in meta.columns:
+                    raise ValueError('undefined column name {}'.format(k))
+                slots.append((k, op, slot(i[2])))
+            
+            def condition(values):
+                return list(zip([k for k, op, v in slots], [op for k, op, v in slots],
+                                resolve([v for k, op, v in slots], values)))
+            
+            return condition
+        
+        if p[0] == 'use':
+            keyspace = p[1]
+            
+            def run(values):
+                self.set_keyspace(keyspace)
+            
+            return Plan(run, markers)
         
         if p[0] == 'insert':
-            b = p['table']
-            (keyspace, table) = (b[0], b[2]) if len(b) > 1 else (self.use_keyspace, b[0])
+            (keyspace, table) = self._table_name(p['table'])
             
             # check keyspace, table
             self._check_keyspace_table(keyspace, table)
+            meta = self._metadata(keyspace, table)
+            if meta is not None and meta.counters:
+                raise ValueError('INSERT is not supported on the counter table {}, use UPDATE'.format(table))
             
-            col_names = p['columns']['list']
-            col_values = [cast_value(i) for i in p['values']['list']]
-            cols_kv = dict(zip(col_names, col_values))
+            col_names = list(p['columns']['list'])
+            col_slots = [slot(i) for i in p['values']['list']]
+            cols_kv = dict(zip(col_names, col_slots))
             
-            pkeys_keys = list(self.index[keyspace][table][0])
-            ckeys_keys = list(self.index[keyspace][table][1:]) if len(self.index[keyspace][table]) > 1 else []
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
             
             try:
-                where_pkeys = [cols_kv[k] for k in pkeys_keys]
-                where_ckeys = [cols_kv[k] for k in ckeys_keys]
+                pkeys_slots = [cols_kv[k] for k in pkeys_keys]
+                ckeys_slots = [cols_kv[k] for k in ckeys_keys]
             except:
                 # missing primary key
                 raise
@@ -190,103 +1796,799 @@ class Session:
             # remove keys from items to store
             for k in pkeys_keys + ckeys_keys:
                 del cols_kv[k]
+            cols_slots = list(cols_kv.items())
             
-            return self._insert(keyspace, table, cols_kv, where_pkeys, where_ckeys)
+            condition = conditions(p.get('if'), keyspace, table)
+            options = using(p.get('using'), True)
+            
+            def mutation(values):
+                return (keyspace, table,
+                        resolve(pkeys_slots, values),
+                        resolve(ckeys_slots, values),
+                        dict((k, values[v] if b else v) for k, (b, v) in cols_slots),
+                        options(values))
+            
+            def run(values):
+                if condition is not None:
+                    m = mutation(values)
+                    return self._cas([m], [(m, condition(values))])
+                (keyspace, table, where_pkeys, where_ckeys, update_dict, options) = mutation(values)
+                if len(options) > 1:
+                    return self._apply([(keyspace, table, where_pkeys, where_ckeys, update_dict, options)])
+                return self._insert(keyspace, table, update_dict, where_pkeys, where_ckeys)
+            
+            return Plan(run, markers, mutation, condition=condition)
         
         if p[0] == 'update':
-            b = p['table']
-            (keyspace, table) = (b[0], b[2]) if len(b) > 1 else (self.use_keyspace, b[0])
+            (keyspace, table) = self._table_name(p['table'])
             
             # check keyspace, table
             self._check_keyspace_table(keyspace, table)
             
-            cols_kv = {}
+            # slots in the order of the statement: USING comes before SET
+            options = using(p.get('using'))
+            
+            meta = self._metadata(keyspace, table)
+            collections = meta.collections if meta is not None else {}
+            
+            cols_slots = []
+            increments = []
+            modifications = []
             b = p.get('set')
             if b:
                 for i in range(len(b)):
                     if (i % 2):
                         continue;
-                    cols_kv[b[i][0]] = cast_value(b[i][2])
+                    k = b[i][0]
+                    if len(b[i]) == 6:
+                        # col[key] = value
+                        modifications.append((k, '[]', [slot(b[i][2]), slot(b[i][5])]))
+                    elif len(b[i]) == 5:
+                        # col = col + n, col = col - n, col = [...] + col
+                        prepend = not isinstance(b[i][2], str)
+                        (other, op, v) = (b[i][4], 'prepend', b[i][2]) if prepend else (b[i][2], b[i][3], b[i][4])
+                        if k in collections or prepend:
+                            if other != k:
+                                raise ValueError('a collection can only be updated from itself, '
+                                                 '{0} = {0} + value'.format(k))
+                            modifications.append((k, op, [slot(v)]))
+                            continue
+                        if other != k:
+                            raise ValueError('a counter can only be incremented by a value, {0} = {0} + 1'.format(k))
+                        increments.append((k, -1 if op == '-' else 1, slot(v)))
+                    else:
+                        cols_slots.append((k, slot(b[i][2])))
             
-            where_pkeys = []
-            where_ckeys = []
-            b = p.get('where')
-            if b:
-                pkeys_keys = list(self.index[keyspace][table][0])
-                ckeys_keys = list(self.index[keyspace][table][1:]) \
-                    if len(self.index[keyspace][table]) > 1 else []
-                
-                where_kv = dict()
-                for i in range(len(b)):
-                    if not (i % 2):
-                        continue;
-                    where_kv[b[i][0]] = cast_value(b[i][2])
-                
-                where_pkeys = [where_kv[k] for k in pkeys_keys if where_kv.get(k) is not None]
-                where_ckeys = [where_kv[k] for k in ckeys_keys if where_kv.get(k) is not None]
+            if modifications:
+                unknown = [k for k, op, slots in modifications if k not in collections]
+                if unknown:
+                    raise ValueError('cannot update the elements of {}, not a collection column of {}'.format(
+                        ', '.join(unknown), table))
+                if p.get('using'):
+                    raise ValueError('collection updates do not support USING TTL or TIMESTAMP')
+            if increments:
+                unknown = [k for k, sign, s in increments if meta is not None and k not in meta.counters]
+                if unknown:
+                    raise ValueError('cannot increment {}, not a counter column of {}'.format(', '.join(unknown), table))
+                if cols_slots:
+                    raise ValueError('cannot mix counter and non counter updates')
+                if p.get('using'):
+                    raise ValueError('counters do not support USING TTL or TIMESTAMP')
+            
+            def added(values):
+                # the increments {column: n} of the bound values
+                out = {}
+                for (k, sign, s), v in zip(increments, resolve([s for k, sign, s in increments], values)):
+                    if isinstance(v, bool) or not isinstance(v, int):
+                        raise ValueError('invalid increment {!r} of counter column {}'.format(v, k))
+                    out[k] = out.get(k, 0) + sign * v
+                return out
+            
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            pkeys_slots, ckeys_slots, range_slots, token_slots, others = where_keys(p.get('where'), pkeys_keys,
+                                                                                   ckeys_keys)
+            if range_slots or token_slots:
+                raise ValueError('{} supports only = restrictions on the primary key'.format(p[0].upper()))
+            condition = conditions(p.get('if'), keyspace, table)
+            
+            def mutation(values):
+                if increments:
+                    return (keyspace, table, resolve(pkeys_slots, values), resolve(ckeys_slots, values), {},
+                            {'add': added(values)})
+                update = options(values)
+                if modifications:
+                    update = dict(update or {}, collections=[
+                        (k, op, tuple(resolve(slots, values)) if op == '[]' else resolve(slots, values)[0])
+                        for k, op, slots in modifications])
+                return (keyspace, table,
+                        resolve(pkeys_slots, values),
+                        resolve(ckeys_slots, values),
+                        dict((k, values[v] if b else v) for k, (b, v) in cols_slots),
+                        update)
             
-            return self._insert(keyspace, table, cols_kv, where_pkeys, where_ckeys)
+            def run(values):
+                if increments:
+                    m = mutation(values)
+                    return self._increment(m[0], m[1], m[2], m[3], m[5]['add'])
+                if condition is not None:
+                    m = mutation(values)
+                    return self._cas([m], [(m, condition(values))])
+                (keyspace, table, where_pkeys, where_ckeys, update_dict, options) = mutation(values)
+                if options is not None:
+                    return self._apply([(keyspace, table, where_pkeys, where_ckeys, update_dict, options)])
+                return self._insert(keyspace, table, update_dict, where_pkeys, where_ckeys)
+            
+            return Plan(run, markers, mutation, condition=condition)
+        
+        if p[0] == 'delete':
+            (keyspace, table) = self._table_name(p['table'])
+            
+            # check keyspace, table
+            self._check_keyspace_table(keyspace, table)
+            
+            # USING comes before WHERE
+            options = using(p.get('using'))
+            
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            pkeys_slots, ckeys_slots, range_slots, token_slots, others = where_keys(p.get('where'), pkeys_keys,
+                                                                                   ckeys_keys)
+            if token_slots or others:
+                raise ValueError('DELETE supports only = restrictions on the partition key, and a range '
+                                 'on a clustering key')
+            if len(pkeys_slots) != len(pkeys_keys):
+                raise ValueError('DELETE must restrict all the partition key columns {}'.format(', '.join(pkeys_keys)))
+            
+            # the cells of some columns of a row, or the rows of a partition, of a clustering prefix or range
+            columns = list(p['columns']) if 'columns' in p else None
+            if columns is not None:
+                if range_slots or len(ckeys_slots) != len(ckeys_keys):
+                    raise ValueError('DELETE of columns must restrict the whole primary key')
+                if [k for k in columns if k in pkeys_keys + ckeys_keys]:
+                    raise ValueError('primary key columns cannot be deleted')
+            condition = conditions(p.get('if'), keyspace, table)
+            if condition is not None and (range_slots or len(ckeys_slots) != len(ckeys_keys)):
+                raise ValueError('DELETE with IF must restrict the whole primary key')
+            
+            def mutation(values):
+                delete = options(values)
+                if columns is not None:
+                    delete = dict(delete or {}, columns=columns)
+                if range_slots:
+                    (lo, hi) = resolve([range_slots[0], range_slots[2]], values)
+                    delete = dict(delete or {}, range=(lo, range_slots[1], hi, range_slots[3]))
+                return (keyspace, table,
+                        resolve(pkeys_slots, values),
+                        resolve(ckeys_slots, values),
+                        None, delete)
+            
+            def run(values):
+                if condition is not None:
+                    m = mutation(values)
+                    return self._cas([m], [(m, condition(values))])
+                return self._apply([mutation(values)])
+            
+            return Plan(run, markers, mutation, condition=condition)
+        
+        if p[0] == 'begin':
+            plans = [self._plan(i, markers) for i in p['statements']]
+            
+            def run(values):
+                return self._mutate([(plan, values) for plan in plans])
+            
+            return Plan(run, markers)
         
         if p[0] == 'select':
-            b = p['table']
-            (keyspace, table) = (b[0], b[2]) if len(b) > 1 else (self.use_keyspace, b[0])
+            (keyspace, table) = self._table_name(p['table'])
             
             # check keyspace, table
             self._check_keyspace_table(keyspace, table)
             
+            # elements of collections, by key or index, named as selected: their bind markers come first
             cols_sel = p.get('columns')
-            cols_sel = [] if '*' in cols_sel else cols_sel
+            cols_sel = [] if '*' in cols_sel else list(cols_sel)
+            elements = OrderedDict()
+            for i, k in enumerate(cols_sel):
+                if not isinstance(k, str) and len(k) == 4:
+                    cols_sel[i] = '{}[{}]'.format(k[0], k[2])
+                    elements[cols_sel[i]] = (k[0], slot(k[2]))
             
-            where_pkeys = []
-            where_ckeys = []
-            b = p.get('where')
-            if b:
-                pkeys_keys = list(self.index[keyspace][table][0])
-                ckeys_keys = list(self.index[keyspace][table][1:]) \
-                    if len(self.index[keyspace][table]) > 1 else []
-                
-                where_kv = dict()
-                for i in range(len(b)):
-                    if not (i % 2):
-                        continue;
-                    where_kv[b[i][0]] = cast_value(b[i][2])
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            filtering = 'allow' in p
+            pkeys_slots, ckeys_slots, range_slots, token_slots, others = where_keys(p.get('where'), pkeys_keys,
+                                                                                   ckeys_keys, filtering, True)
+            
+            # IN on key columns: the rows of each combination of their values, read in one pass
+            in_keys = [s[0] == 'in' for s in pkeys_slots + ckeys_slots]
+            if not any(in_keys):
+                in_keys = None
+            
+            meta = self._metadata(keyspace, table)
+            unknown = [column for column, s in elements.values() if meta is None or column not in meta.collections]
+            if unknown:
+                raise ValueError('cannot select elements of {}, not a collection column of {}'.format(
+                    ', '.join(unknown), table))
+            functions = []
+            for i, k in enumerate(cols_sel):
+                if isinstance(k, str):
+                    continue
+                if k[0] in FUNCTIONS:
+                    # aggregate of a column, count(*) of the rows
+                    column = None if k[1] == '*' else k[1]
+                    if column is None and k[0] != 'count':
+                        raise ValueError('{}(*) is not supported, only count(*)'.format(k[0]))
+                    if column is not None and meta is not None and column not in meta.columns:
+                        raise ValueError('undefined column name {}'.format(column))
+                    cols_sel[i] = aggregate_column(k[0], column)
+                    functions.append((cols_sel[i], k[0], column))
+                    continue
                 
-                where_pkeys = [where_kv[k] for k in pkeys_keys if where_kv.get(k) is not None]
-                where_ckeys = [where_kv[k] for k in ckeys_keys if where_kv.get(k) is not None]
+                # token(partition key columns)
+                if list(k[1]) != pkeys_keys:
+                    raise ValueError('token() takes the partition key columns {}'.format(', '.join(pkeys_keys)))
+                cols_sel[i] = token_column(pkeys_keys)
+            
+            # groups of rows by a prefix of the primary key, which includes the partition key
+            group = None
+            b = p.get('group')
+            if b:
+                group = list(b[2])
+                if group != (pkeys_keys + ckeys_keys)[:len(group)] or len(group) < len(pkeys_keys):
+                    raise ValueError('GROUP BY must list the partition key columns, then clustering key columns, '
+                                     'in the order of the primary key')
+            
+            # order by the clustering columns, ascending or descending
+            reverse = False
+            b = p.get('order')
+            if b:
+                order = [(i[0], i[1] if len(i) > 1 else 'asc') for i in b[2:]]
+                if [k for k, o in order] != ckeys_keys[:len(order)] or len(set(o for k, o in order)) > 1:
+                    raise ValueError('ORDER BY must list the clustering key columns in order, in one direction')
+                reverse = order[0][1] == 'desc'
+            
+            # an equality on an indexed column is answered from the index
+            index_slot = None
+            indexes = self.indexes.get(keyspace, {}).get(table, {})
+            for condition in others:
+                (k, op, v) = condition
+                if op == '=' and k in indexes and in_keys is None:
+                    index_slot = (indexes[k], v)
+                    others = [i for i in others if i is not condition]
+                    break
+            if index_slot is not None and reverse:
+                raise ValueError('ORDER BY is not supported with secondary indexes')
+            
+            # the other conditions filter the rows, compiled once here
+            if others and not filtering:
+                raise ValueError('Cannot execute this query as it might involve data filtering and thus may have '
+                                 'unpredictable performance. If you want to execute this query despite the '
+                                 'performance unpredictability, use ALLOW FILTERING')
+            bind_filter = compile_filter([(k, op) for k, op, v in others], pkeys_keys + ckeys_keys) if others else None
             
             limit = self.DEFAULTS['QUERY_LIMIT']
             b = p.get('limit')
             if b:
-                limit = b[1]
+                limit = int(b[1])
+            
+            # count(*) of whole partitions, grouped by partition or not, reads the row counts of the partitions
+            counted = (functions and all(function == 'count' and column is None for name, function, column in functions)
+                       and len(functions) == len(cols_sel) and not others and index_slot is None and not ckeys_slots
+                       and not range_slots and not token_slots and group in (None, pkeys_keys) and in_keys is None)
+            computed = token_column(pkeys_keys)
+            if elements and (functions or group is not None):
+                raise ValueError('elements of collections cannot be selected with aggregates or GROUP BY')
+            
+            # the rows have the whole collections, which the elements are then looked up in
+            rows_sel = [elements[k][0] if k in elements else k for k in cols_sel]
+            
+            def make_group(row, results):
+                # the columns which are not aggregated take their value in the first row of the group
+                if not cols_sel:
+                    return dict(row)
+                return dict((k, results[k]) if k in results else
+                            (k, row[k]) if row is not None and k in row else
+                            (k, token(tuple(row[i] for i in pkeys_keys))) if row is not None and k == computed else
+                            (k, None) for k in cols_sel)
+            
+            def rows(values, start=(), returned=0, trace=None):
+                where_range = None
+                if range_slots:
+                    (lo, hi) = resolve([range_slots[0], range_slots[2]], values)
+                    where_range = (lo, range_slots[1], hi, range_slots[3])
+                
+                token_range = None
+                if token_slots:
+                    (lo, hi) = resolve([token_slots[0], token_slots[2]], values)
+                    token_range = (lo, token_slots[1], hi, token_slots[3])
+                
+                indexed = None
+                if index_slot is not None:
+                    indexed = (index_slot[0], resolve([index_slot[1]], values)[0])
+                
+                where_pkeys, where_ckeys, where_in = resolve(pkeys_slots, values), resolve(ckeys_slots, values), None
+                if in_keys is not None:
+                    # the distinct values of each column, in the order of the scan, and their lazy product
+                    columns = [sorted(set(v), reverse=reverse and i >= len(pkeys_slots)) if multi else [v]
+                               for i, (multi, v) in enumerate(zip(in_keys, resolve(pkeys_slots + ckeys_slots, values)))]
+                    where_in = product(*columns)
+                    where_pkeys, where_ckeys = [], []
+                
+                predicate = None
+                if bind_filter is not None:
+                    operands = resolve([v for k, op, v in others], values)
+                    if meta is not None:
+                        operands = [[meta.cast(k, i) for i in v] if op == 'in' else meta.cast(k, v)
+                                    for (k, op, s), v in zip(others, operands)]
+                    predicate = bind_filter(*operands)
+                
+                # row counts include the expired rows not purged yet
+                times = self.times.get(keyspace, {}).get(table)
+                if counted and (times is None or not times.deadlines):
+                    return islice(self._count_groups(keyspace, table, cols_sel, resolve(pkeys_slots, values),
+                                                     group is not None, start), max(limit - returned, 0))
+                
+                if elements:
+                    keys = dict((name, meta.element_key(column, v)) for (name, (column, s)), v in
+                                zip(elements.items(), resolve([s for column, s in elements.values()], values)))
+                    rows = self._rows(keyspace, table, rows_sel, where_pkeys, where_ckeys, limit - returned, start,
+                                      where_range, reverse, token_range, indexed, predicate, trace, where_in)
+                    return ((key, dict((k, meta.element(elements[k][0], row[elements[k][0]], keys[k])) if k in elements
+                                       else (k, row[k]) for k in cols_sel)) for key, row in rows)
+                
+                if not functions and group is None:
+                    return self._rows(keyspace, table, cols_sel, where_pkeys, where_ckeys, limit - returned, start,
+                                      where_range, reverse, token_range, indexed, predicate, trace, where_in)
+                
+                # the limit counts the groups, the aggregates are computed over all the rows
+                rows = self._rows(keyspace, table, [], where_pkeys, where_ckeys, float('inf'), start,
+                                  where_range, reverse, token_range, indexed, predicate, trace, where_in)
+                return islice(aggregate(rows, functions, len(group) if group else None, make_group),
+                              max(limit - returned, 0))
+            
+            def run(values):
+                return ResultSet(rows(values), self.default_fetch_size)
             
-            return self._query(keyspace, table, cols_sel, where_pkeys, where_ckeys, limit)
+            return Plan(run, markers, rows=rows)
         
         if p[0] == 'create' and p[1] == 'table':
-            b = p['table']
-            (keyspace, table) = (b[0], b[2]) if len(b) > 1 else (self.use_keyspace, b[0])
+            (keyspace, table) = self._table_name(p['table'])
             
             # check keyspace
             self._check_keyspace_table(keyspace)
             
-            primary_key = p['columns_def']['columns']['column']['primary_key'][2]
-            if len(primary_key) > 1:
-                self.index[keyspace][table] = [list(primary_key[0])] + list(primary_key[2])
-            else:
-                keys = list(primary_key[0])
-                self.index[keyspace][table] = [keys[0]] + keys[0][1:]
+            # column definitions, and the primary key, defined inline or after the columns
+            columns, index = [], None
+            for b in p['columns_def']['columns']:
+                if isinstance(b, str):
+                    continue
+                if not isinstance(b[0], str):
+                    index = key_index(b[0][2])
+                    continue
+                
+                columns.append((b[0], b[1]))
+                if len(b) > 2:
+                    index = [[b[0]]]
+            
+            if index is None:
+                raise ValueError('{}.{} has no primary key'.format(keyspace, table))
+            schema = TableMetadata(keyspace, table, columns, index[0], index[1:])
+            if_not_exists = 'if' in p
+            
+            def run(values):
+                self._create_table(keyspace, table, index, schema, if_not_exists)
             
-            #create an empty tree in db
-            self.db[keyspace][table] = Tree()
+            return Plan(run, markers)
+        
+        if p[0] == 'create' and p[1] == 'index':
+            (keyspace, table) = self._table_name(p['table'])
+            
+            # check keyspace, table
+            self._check_keyspace_table(keyspace, table)
+            
+            column = p['column']
+            pkeys_keys, ckeys_keys = self._key_names(keyspace, table)
+            if column in pkeys_keys + ckeys_keys:
+                raise ValueError('only regular columns can be indexed, {} is in the primary key of {}.{}'.format(
+                    column, keyspace, table))
+            meta = self._metadata(keyspace, table)
+            if meta is not None and column not in meta.columns:
+                raise ValueError('undefined column name {}'.format(column))
+            if meta is not None and column in meta.counters:
+                raise ValueError('counter column {} cannot be indexed'.format(column))
+            if meta is not None and column in meta.collections:
+                raise ValueError('collection column {} cannot be indexed'.format(column))
+            
+            name = p.get('name') or '{}_{}_idx'.format(table, column)
+            if_not_exists = 'if' in p
+            
+            def run(values):
+                names = [i.name for indexes in self.indexes.get(keyspace, {}).values() for i in indexes.values()]
+                if column in self.indexes.get(keyspace, {}).get(table, {}) or name in names:
+                    if if_not_exists:
+                        return
+                    raise ValueError('index {} already exists'.format(name))
+                self._create_index(keyspace, table, column, name)
+            
+            return Plan(run, markers)
+        
+        if p[0] == 'create' and p[1] == 'materialized':
+            (keyspace, name) = self._table_name(p['view'])
+            (base_keyspace, base) = self._table_name(p['table'])
+            if base_keyspace != keyspace:
+                raise ValueError('view {} must be in the keyspace of its table {}'.format(name, base))
+            
+            # check keyspace, table
+            self._check_keyspace_table(keyspace, base)
+            if base in self.views.get(keyspace, {}):
+                raise ValueError('cannot create a view of the view {}'.format(base))
+            
+            columns = None if isinstance(p['columns'], str) else list(p['columns'])
+            index = key_index(p['primary_key'][2])
+            
+            # check the definition before the view is created
+            view = MaterializedView(keyspace, name, base, columns, index, self.index[keyspace][base])
+            not_null = [b[0] for b in p['where'][1:] if not isinstance(b, str)]
+            missing = [k for k in view.keys if k not in not_null]
+            if missing:
+                raise ValueError('the primary key columns of view {} must be restricted by IS NOT NULL: {}'.format(
+                    name, ', '.join(missing)))
+            meta = self._metadata(keyspace, base)
+            unknown = [k for k in (columns or []) + view.keys if meta is not None and k not in meta.columns]
+            if unknown:
+                raise ValueError('undefined column name {}'.format(', '.join(unknown)))
+            if meta is not None and meta.counters:
+                raise ValueError('cannot create a view of the counter table {}'.format(base))
+            if_not_exists = 'if' in p
+            
+            def run(values):
+                if self.db[keyspace].get(name) is not None:
+                    if if_not_exists:
+                        return
+                    raise ValueError('{}.{} already exists'.format(keyspace, name))
+                self._create_view(keyspace, name, base, columns, index)
+            
+            return Plan(run, markers)
+        
+        # statements which are parsed but not executed
+        return Plan(lambda values: None, markers)
+
+
+class ResultSet:
+    """
+    The rows of a SELECT, produced lazily one page of fetch_size rows at a time.
+    Iterating goes through all the pages, current_rows is the page fetched last
+    """
+    
+    def __init__(self, rows, fetch_size=None, returned=0):
+        # rows yields (primary key, row)
+        self._rows = rows
+        self._next = None
+        self._returned = returned
+        
+        self.fetch_size = fetch_size
+        self.current_rows = []
+        self.paging_state = None
+        self._trace = None
+        self.fetch_next_page()
+    
+    @property
+    def has_more_pages(self):
+        return self.paging_state is not None
+    
+    def fetch_next_page(self):
+        page = [self._next] if self._next else []
+        page.extend(islice(self._rows, self.fetch_size + 1 - len(page) if self.fetch_size else None))
+        
+        # one row more than the page tells whether there is a next page
+        self._next = page.pop() if self.fetch_size and len(page) > self.fetch_size else None
+        
+        self.current_rows = [row for key, row in page]
+        self._returned += len(page)
+        
+        self.paging_state = None
+        if self._next:
+            self.paging_state = (page[-1][0], self._returned)
+    
+    def _fetch_all(self):
+        rows = self.current_rows
+        while self.has_more_pages:
+            self.fetch_next_page()
+            rows.extend(self.current_rows)
+        self.current_rows = rows
+    
+    def __iter__(self):
+        while True:
+            for row in self.current_rows:
+                yield row
+            if not self.has_more_pages:
+                return
+            self.fetch_next_page()
+    
+    def one(self):
+        return self.current_rows[0] if self.current_rows else None
+    
+    @property
+    def was_applied(self):
+        """ for the result of a statement with an IF clause, whether its writes were applied """
+        row = self.one()
+        if row is None or '[applied]' not in row:
+            raise ValueError('not the result of a conditional statement')
+        return row['[applied]']
+    
+    def all(self):
+        return list(self)
+    
+    def get_query_trace(self):
+        """ the QueryTrace of a statement executed with trace=True, None otherwise """
+        return self._trace
+    
+    def __bool__(self):
+        return bool(self.current_rows)
+    
+    __nonzero__ = __bool__
+    
+    # indexing, len and comparing fetch all the remaining pages
+    def __getitem__(self, i):
+        self._fetch_all()
+        return self.current_rows[i]
+    
+    def __len__(self):
+        self._fetch_all()
+        return len(self.current_rows)
+    
+    def __eq__(self, other):
+        self._fetch_all()
+        return self.current_rows == list(other)
+    
+    def __repr__(self):
+        return '<ResultSet rows={}, has_more_pages={}>'.format(self.current_rows, self.has_more_pages)
+
+
+class ResponseFuture:
+    """
+    The result of Session.execute_async(): result() waits for the ResultSet, or raises the error.
+    Callbacks get the rows of the first page, errbacks the exception, they are called by the
+    worker thread, or right away when the request is already complete
+    """
+    
+    def __init__(self, future):
+        self._future = future
+    
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+    
+    def done(self):
+        return self._future.done()
+    
+    @property
+    def has_more_pages(self):
+        return self._future.result().has_more_pages
+    
+    def add_callback(self, fn, *args, **kwargs):
+        def done(f):
+            if not f.cancelled() and f.exception() is None:
+                result = f.result()
+                fn(result.current_rows if isinstance(result, ResultSet) else result, *args, **kwargs)
+        
+        self._future.add_done_callback(done)
+        return self
+    
+    def add_errback(self, fn, *args, **kwargs):
+        def done(f):
+            if not f.cancelled() and f.exception() is not None:
+                fn(f.exception(), *args, **kwargs)
+        
+        self._future.add_done_callback(done)
+        return self
+    
+    def add_callbacks(self, callback, errback, callback_args=(), callback_kwargs=None, errback_args=(),
+                      errback_kwargs=None):
+        self.add_callback(callback, *callback_args, **(callback_kwargs or {}))
+        self.add_errback(errback, *errback_args, **(errback_kwargs or {}))
+        return self
+    
+    def __repr__(self):
+        return '<ResponseFuture done={}>'.format(self.done())
+
+
+class Plan:
+    """the precomputed execution of a statement, run() takes the bound values"""
+    
+    def __init__(self, run, markers, mutation=None, rows=None, condition=None):
+        self.run = run
+        self.markers = markers
+        
+        # for INSERT, UPDATE and DELETE, the mutation to apply for the bound values,
+        # and with an IF clause, the condition on the row written for the bound values
+        self.mutation = mutation
+        self.condition = condition
+        
+        # for SELECT, the generator of rows for the bound values after a start key,
+        # returned is the number of rows of the previous pages, counted in the limit
+        self.rows = rows
+        
+        # (statement, keyspace, table) of the traces, set by Session._plan()
+        self.statement = (None, None, None)
+    
+    def bind(self, parameters):
+        
+        if not self.markers:
+            return ()
+        
+        if parameters is None:
+            raise ValueError('statement has {} bind markers, but no values were given'.format(len(self.markers)))
+        
+        # named values are matched to the marker names, positional values by order
+        if isinstance(parameters, dict):
+            return [parameters[k] for k in self.markers]
+        
+        if len(parameters) != len(self.markers):
+            raise ValueError('statement has {} bind markers, {} values were given'.format(
+                len(self.markers), len(parameters)))
+        
+        return parameters
+
 
 class Cluster:
-    def __init__(self, seed, data):
+    def __init__(self, seed, data=None, nodes=None, path=None, sstables=()):
+        """
+        with nodes, the token range is split across that many in-process virtual nodes
+        and the partitions of each table are indexed by their Murmur3 token, so that token
+        range scans and full scans go in token order, as in cassandra.
+        With path, the cluster is durable: it starts from the snapshot and the commit log
+        in that directory, data is only loaded when there is no snapshot.
+        sstables are files of frozen keyspaces, see freeze(), which are queried in place
+        """
         # must clearly state :memory: in the list of seed
         if ':memory:' not in seed:
             raise
         
-        self.data = Tree(data)
         self.session = None
+        self.locks = Locks(Session.DEFAULTS['LOCK_STRIPES'], Session.DEFAULTS['COUNTER_STRIPES'])
+        
+        self.storage = None
+        snapshot, segment = None, 0
+        if path is not None:
+            self.storage = Storage(path, Session.DEFAULTS['COMMITLOG_SYNC_BATCH'])
+            snapshot, segment = self.storage.load()
+        
+        if snapshot is not None:
+            # the snapshot has the node types used by dive(), it is used as is
+            self.data = Tree()
+            self.data['data'] = snapshot['data']
+            self.data['index'] = snapshot['index']
+            self.data['schema'] = snapshot.get('schema', Tree())
+            self.data['indexes'] = snapshot.get('indexes', Tree())
+            self.data['views'] = snapshot.get('views', Tree())
+            self.data['times'] = snapshot.get('times', {})
+            self.data['counters'] = snapshot.get('counters', {})
+        else:
+            self.data = Tree(data or {})
+            for k in ('data', 'index', 'schema', 'indexes', 'views'):
+                self.data.setdefault(k, Tree())
+            
+            # clustering levels of the initial data are kept sorted
+            for keyspace, tables in self.data['index'].items():
+                for table, index in tables.items():
+                    d = self.data['data'].get(keyspace, {}).get(table)
+                    if d is not None:
+                        self.data['data'][keyspace][table] = sort_levels(d, len(index[0]), len(index) - 1)
+        
+        # frozen keyspaces are mounted with an empty memtable over each table
+        for filename in sstables:
+            sstable = SSTable(filename, Session.DEFAULTS['SSTABLE_CACHE_SIZE'])
+            self.data['index'][sstable.keyspace] = Tree(sstable.index)
+            self.data['schema'][sstable.keyspace] = Tree(sstable.schema)
+            self.data['indexes'][sstable.keyspace] = Tree(sstable.indexes)
+            self.data['views'][sstable.keyspace] = Tree(sstable.views)
+            self.data.setdefault('times', {})[sstable.keyspace] = dict(sstable.times)
+            self.data['data'][sstable.keyspace] = Tree()
+            for table in sstable.tables:
+                self.data['data'][sstable.keyspace][table] = Overlay(sstable, table)
+        
+        # the latencies, rows and plan cache hits of the statements of all the sessions
+        if Session.DEFAULTS['METRICS']:
+            self.data['metrics'] = Metrics()
+        
+        self.ring = None
+        self.data['tokens'] = {}
+        if nodes:
+            self.ring = self.data['ring'] = TokenRing(nodes)
+        
+        if nodes:
+            # index the partitions of the initial data
+            session = Session(self.data, locks=self.locks)
+            for keyspace, tables in self.data['index'].items():
+                for table, index in tables.items():
+                    self.data['tokens'].setdefault(keyspace, {})[table] = SortedTree()
+                    for pkey, partition in walk(self.data['data'].get(keyspace, {}).get(table, {}), len(index[0])):
+                        session._index_partition(keyspace, table, pkey, True)
+        
+        # purges the expired cells, started by the first TTL, timestamp or delete
+        self.compactor = Compactor(Session(self.data, locks=self.locks), Session.DEFAULTS['COMPACTION_PERIOD'],
+                                   Session.DEFAULTS['TOMBSTONE_GRACE'])
+        
+        self.flusher = None
+        if self.storage is not None:
+            # crash recovery: replay the writes logged after the snapshot
+            session = Session(self.data, locks=self.locks, compactor=self.compactor)
+            for record in self.storage.records(segment):
+                session._replay(record)
+            
+            self.storage.open()
+            self.flusher = Flusher(self, Session.DEFAULTS['COMMITLOG_SYNC_PERIOD'], Session.DEFAULTS['SNAPSHOT_PERIOD'],
+                                   Session.DEFAULTS['SNAPSHOT_LOG_SIZE'])
+            self.flusher.start()
     
     def connect(self, use_keyspace=None):
-        self.session = Session(self.data, use_keyspace)
+        self.session = Session(self.data, use_keyspace, self.locks, self.storage.log if self.storage else None,
+                               self.compactor)
+        if self.session.times:
+            self.compactor.ensure_started()
         return self.session
+    
+    def stats(self):
+        """
+        the size of each table, {keyspace: {table: {...}}}, to spot leaks and size fixtures: partitions, rows,
+        nodes and bytes as measured by measure(), the entries of its secondary indexes, its cells written
+        with a TTL and its tombstones. Reads the whole tables, without locks
+        """
+        out = {}
+        for keyspace, tables in list(self.data['data'].items()):
+            for table, d in list(tables.items()):
+                index = self.data['index'].get(keyspace, {}).get(table)
+                if index is None:
+                    continue
+                
+                (partitions, rows, nodes, size) = measure(d, len(index[0]) + len(index) - 1, len(index[0]))
+                indexes = self.data['indexes'].get(keyspace, {}).get(table, {})
+                times = self.data.get('times', {}).get(keyspace, {}).get(table)
+                out.setdefault(keyspace, {})[table] = {
+                    'partitions': partitions, 'rows': rows, 'nodes': nodes, 'bytes': size,
+                    'index_entries': sum(len(keys) for i in list(indexes.values()) for keys in list(i.entries.values())),
+                    'expiring': len(times.deadlines) if times is not None else 0,
+                    'tombstones': times.tombstone_count if times is not None else 0}
+        return out
+    
+    def metrics(self, reset=False):
+        """ the Metrics of the cluster as a dict, see Metrics.as_dict(), with reset they start over """
+        metrics = self.data.get('metrics')
+        if metrics is None:
+            raise ValueError('the cluster collects no metrics, set Session.DEFAULTS[\'METRICS\'] before creating it')
+        out = metrics.as_dict()
+        if reset:
+            metrics.reset()
+        return out
+    
+    def freeze(self, keyspace, filename):
+        """
+        writes the tables of keyspace to an sstable file, which clusters can mount read only. The cells
+        written with a TTL expire in the mounting clusters at the same time
+        """
+        if any(meta.counters for meta in self.data['schema'].get(keyspace, {}).values()):
+            raise ValueError('keyspace {} has counters, which cannot be frozen'.format(keyspace))
+        with self.locks.all():
+            write_sstable(filename, keyspace, self.data['data'][keyspace], self.data['index'][keyspace],
+                          self.data['schema'].get(keyspace, {}), self.data['indexes'].get(keyspace, {}),
+                          self.data['views'].get(keyspace, {}), self.data.get('times', {}).get(keyspace, {}))
+    
+    def snapshot(self):
+        """ saves the tables in a new snapshot, which replaces the commit log written so far """
+        if self.storage is None:
+            raise ValueError('snapshots need a durable cluster, created with a path')
+        return self.storage.snapshot(self.data, self.locks)
+    
+    def shutdown(self):
+        if self.session is not None:
+            self.session.shutdown()
+        self.compactor.stop()
+        
+        # the worker processes of the parallel scans, started by the first one
+        scan_pool = self.data.get('scan_pool')
+        if scan_pool is not None:
+            scan_pool.shutdown()
+        
+        # the commit log is synced and closed, the next Cluster on the path replays it
+        if self.flusher is not None:
+            self.flusher.stop()
+            self.flusher = None
+            self.storage.close()
@@ -0,0 +1,92 @@
+# counters.py
+#
+# counter columns. The rows of a counter table hold no values: the increments of UPDATE ... SET
+# c = c + n are summed in a TableCounters, in stripes, one per thread up to the counter stripes of
+# the cluster's Locks:
+#
+#   stripes      {stripe: {primary key: {column: sum of the increments}}}
+#
+# an increment locks the stripe of its thread only, so that threads incrementing the same hot row
+# do not wait for each other, nor for the lock of its partition. Reads sum the stripes of each row
+# they return, without locks. Deletes drop the increments of the deleted rows from every stripe
+#
+from itertools import count
+import threading
+
+_thread = threading.local()
+_threads = count()
+
+
+def thread_stripe(stripes):
+    """ the stripe of the calling thread, threads take the stripes in turn """
+    i = getattr(_thread, 'stripe', None)
+    if i is None:
+        i = _thread.stripe = next(_threads)
+    return i % stripes
+
+
+class TableCounters:
+    """ the increments of the counter columns of a table, see above """
+    
+    def __init__(self):
+        self.stripes = {}
+    
+    def add(self, stripe, key, deltas):
+        """ adds deltas {column: n} to the row key, the caller holds the lock of the stripe """
+        rows = self.stripes.get(stripe)
+        if rows is None:
+            rows = self.stripes.setdefault(stripe, {})
+        
+        row = rows.get(key)
+        if row is None:
+            rows[key] = dict(deltas)
+            return
+        for k, n in deltas.items():
+            row[k] = row.get(k, 0) + n
+    
+    def merged(self, key, cells):
+        """ the cells of the row key with the sums of its increments """
+        out = None
+        for rows in list(self.stripes.values()):
+            row = rows.get(key)
+            if row:
+                if out is None:
+                    out = dict(cells)
+                
+                # copied at once, the thread of the stripe may be adding a column
+                for k, n in list(row.items()):
+                    out[k] = out.get(k, 0) + n
+        return cells if out is None else out
+    
+    def merged_rows(self, leaves):
+        """ the (primary key, cells) of a scan, with the sums of the increments """
+        for key, cells in leaves:
+            yield key, self.merged(key, cells)
+    
+    def drop(self, stripe, key, levels, bounds=None, columns=None):
+        """
+        drops the increments of the rows under the key path, or within bounds on the next key column,
+        or of the columns of the row key. levels is the length of the primary key, the caller holds
+        the lock of the stripe
+        """
+        from .cluster import in_range
+        
+        rows = self.stripes.get(stripe)
+        if not rows:
+            return
+        
+        if len(key) == levels:
+            keys = [key] if key in rows else []
+        else:
+            keys = [k for k in rows if k[:len(key)] == key and (bounds is None or in_range(k[len(key)], bounds))]
+        for k in keys:
+            if columns is None:
+                del rows[k]
+                continue
+            for c in columns:
+                rows[k].pop(c, None)
+            if not rows[k]:
+                del rows[k]
+    
+    def __repr__(self):
+        return '<TableCounters rows={}>'.format(sum(len(rows) for rows in self.stripes.values()))
@@ -0,0 +1,255 @@
+# expiry.py
+#
+# write timestamps, TTLs and tombstones. Rows keep values only: the metadata of a table is in a
+# TableTimes, created by its first DELETE or USING statement, and only for the cells which need it:
+#
+#   stamps       {primary key: {column: timestamp}}   cells written USING TIMESTAMP
+#   deadlines    {primary key: {column: expiry}}      cells written USING TTL, the column None is the row
+#   heap         [(expiry, primary key)]              the rows to purge, in expiry order
+#   tombstones   {partition key: [(clustering prefix, range, timestamp, deletion time)]}
+#                                                     deletes of partitions, prefixes and ranges
+#   deleted_rows {primary key: (timestamp, deletion time)}
+#                                                     deletes of single rows, looked up by key
+#
+# cells written without USING TIMESTAMP have no timestamp of their own: they are as old as the last
+# such write to the table, the watermark. Every delete leaves a tombstone, at the time of the delete
+# without USING TIMESTAMP, which shadows the older writes; the plain writes newer than all of them
+# are not checked. Reads skip the expired cells by looking up the deadlines of each row, the
+# Compactor thread pops the due rows from the heap and removes their expired cells
+#
+import heapq
+import threading
+import time
+
+
+def micros(t):
+    """ the write timestamp of the time t, in microseconds as in cassandra """
+    return int(t * 1000000)
+
+
+class TableTimes:
+    """ the write timestamps, the expiry of the cells and the tombstones of a table, see above """
+    
+    def __init__(self, now):
+        self.watermark = micros(now)
+        self.stamps = {}
+        self.deadlines = {}
+        self.heap = []
+        self.tombstones = {}
+        self.deleted_rows = {}
+        
+        # the timestamp of the newest tombstone: the plain writes after it are not checked against them
+        self.newest_tombstone = None
+        
+        # writes of different partitions push to the heap at the same time
+        self.lock = threading.Lock()
+    
+    def tracked(self, timestamp):
+        """ whether a write of the table at timestamp must be checked against timestamps, TTLs or tombstones """
+        return bool(self.stamps or self.deadlines) or (self.newest_tombstone is not None and
+                                                       self.newest_tombstone >= timestamp)
+    
+    def deleted(self, key, size):
+        """ the timestamp of the newest tombstone over the row key, None """
+        from .cluster import in_range
+        
+        row = self.deleted_rows.get(key)
+        out = row[0] if row is not None else None
+        
+        # the tombstones of the partition over ranges of rows
+        ckey = key[size:]
+        for prefix, bounds, timestamp, at in self.tombstones.get(key[:size], ()):
+            if ckey[:len(prefix)] != prefix or (bounds is not None and not in_range(ckey[len(prefix)], bounds)):
+                continue
+            if out is None or timestamp > out:
+                out = timestamp
+        return out
+    
+    def write(self, key, size, cells, row, timestamp=None, expires=None, now=None, insert=False):
+        """
+        the cells of a write to the row key which win over its current cells, row, or None when a tombstone shadows
+        the write. timestamp is the one of USING TIMESTAMP, expires the expiry time of USING TTL. Records them
+        for the cells written, an insert also sets the expiry of the row
+        """
+        explicit = timestamp is not None
+        if not explicit:
+            timestamp = micros(now if now is not None else time.time())
+        
+        floor = self.deleted(key, size) if self.tombstones or self.deleted_rows else None
+        if floor is not None and floor >= timestamp:
+            return None
+        
+        stamps = self.stamps.get(key)
+        out = {}
+        for k, v in cells.items():
+            old = stamps.get(k) if stamps else None
+            if old is None and explicit and row is not None and k in row:
+                old = self.watermark
+            if old is None or old <= timestamp:
+                out[k] = v
+        
+        if explicit and out:
+            self.stamps.setdefault(key, {}).update((k, timestamp) for k in out)
+        else:
+            self.watermark = max(self.watermark, timestamp)
+            if stamps:
+                for k in out:
+                    stamps.pop(k, None)
+                if not stamps:
+                    self.stamps.pop(key, None)
+        
+        # a row created by a write with a TTL expires with it, unless written again
+        deadlines = self.deadlines.get(key)
+        if expires is not None:
+            deadlines = self.deadlines.setdefault(key, {})
+            deadlines.update((k, expires) for k in out)
+            if insert or row is None:
+                deadlines[None] = expires
+            with self.lock:
+                heapq.heappush(self.heap, (expires, key))
+        elif deadlines:
+            for k in out:
+                deadlines.pop(k, None)
+            if insert:
+                deadlines.pop(None, None)
+            if not deadlines:
+                self.deadlines.pop(key, None)
+        return out
+    
+    def newer(self, key, column, timestamp):
+        """ whether the cell was written after timestamp """
+        stamp = self.stamps.get(key, {}).get(column)
+        return (stamp if stamp is not None else self.watermark) > timestamp
+    
+    def delete(self, key, size, levels, bounds, timestamp, now):
+        """
+        records the tombstone of a delete of the rows under the key path, within bounds on the next clustering key.
+        levels is the length of the primary key: the tombstone of a single row is looked up by its key
+        """
+        key = tuple(key)
+        if self.newest_tombstone is None or timestamp > self.newest_tombstone:
+            self.newest_tombstone = timestamp
+        if len(key) == levels and bounds is None:
+            old = self.deleted_rows.get(key)
+            self.deleted_rows[key] = (max(timestamp, old[0]) if old is not None else timestamp, now)
+            return
+        self.tombstones.setdefault(key[:size], []).append((key[size:], bounds, timestamp, now))
+    
+    def discard(self, key, columns=None):
+        """ forgets the timestamps and the expiry of the deleted cells of a row, or of the whole row """
+        for d in (self.stamps, self.deadlines):
+            cells = d.get(key)
+            if cells is None:
+                continue
+            if columns is None:
+                del d[key]
+                continue
+            for k in columns:
+                cells.pop(k, None)
+            if not cells:
+                del d[key]
+    
+    def live(self, key, cells, now):
+        """ the cells of a row without the expired ones, None when the row expired """
+        deadlines = self.deadlines.get(key)
+        if deadlines is None or min(deadlines.values()) > now:
+            return cells
+        
+        out = dict((k, v) for k, v in cells.items() if deadlines.get(k, now + 1) > now)
+        if not out and deadlines.get(None, now + 1) <= now:
+            return None
+        return out
+    
+    def live_rows(self, leaves, now):
+        """ filters the (primary key, cells) of a scan: expired cells are left out, expired rows are skipped """
+        for key, cells in leaves:
+            if key in self.deadlines:
+                cells = self.live(key, cells, now)
+                if cells is None:
+                    continue
+            yield key, cells
+    
+    def due(self, now):
+        """ pops the keys of the rows with cells which expired by now """
+        keys = set()
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                keys.add(heapq.heappop(self.heap)[1])
+        return keys
+    
+    def expired(self, key, now):
+        """ forgets the expiry of the cells of a row which expired by now """
+        deadlines = self.deadlines.get(key)
+        if deadlines is not None:
+            for k in [k for k, t in deadlines.items() if t <= now]:
+                del deadlines[k]
+            if not deadlines:
+                del self.deadlines[key]
+    
+    def gc(self, before):
+        """ drops the tombstones of the deletes made before the time before """
+        for pkey, tombstones in list(self.tombstones.items()):
+            kept = [i for i in tombstones if i[3] >= before]
+            if kept:
+                self.tombstones[pkey] = kept
+            else:
+                self.tombstones.pop(pkey, None)
+        for key, (timestamp, at) in list(self.deleted_rows.items()):
+            if at < before:
+                self.deleted_rows.pop(key, None)
+        self._newest()
+    
+    # the lock is not pickled with the snapshots
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('deleted_rows', {})
+        self.lock = threading.Lock()
+        if 'newest_tombstone' not in state:
+            self._newest()
+    
+    def _newest(self):
+        self.newest_tombstone = max([i[2] for tombstones in self.tombstones.values() for i in tombstones] +
+                                    [i[0] for i in self.deleted_rows.values()], default=None)
+    
+    @property
+    def tombstone_count(self):
+        return len(self.deleted_rows) + sum(len(i) for i in list(self.tombstones.values()))
+    
+    def __repr__(self):
+        return '<TableTimes stamped={} expiring={} tombstones={}>'.format(
+            len(self.stamps), len(self.deadlines), self.tombstone_count)
+
+
+class Compactor(threading.Thread):
+    """
+    purges the expired cells and rows every period seconds, and drops the tombstones older than grace
+    seconds, so that memory stays bounded under a steady load of writes with a TTL
+    """
+    
+    def __init__(self, session, period=1.0, grace=60):
+        threading.Thread.__init__(self, name='cassandra_mock-compactor', daemon=True)
+        self.session = session
+        self.period = period
+        self.grace = grace
+        self.stopped = threading.Event()
+        self._starting = threading.Lock()
+    
+    def ensure_started(self):
+        with self._starting:
+            if not self.is_alive() and not self.stopped.is_set():
+                self.start()
+    
+    def run(self):
+        while not self.stopped.wait(self.period):
+            self.session._compact(time.time(), self.grace)
+    
+    def stop(self):
+        self.stopped.set()
+        with self._starting:
+            if self.is_alive():
+                self.join()
@@ -0,0 +1,706 @@
+# fastparser.py
+#
+# hand-written, single pass tokenizer and recursive descent parser for the
+# same CQL subset as the pyparsing grammar in parser.py. It produces the same
+# nested result structure: lists of tokens with named results, so that
+# p['table'], p['where'], p['set'], p['columns_def'] ... work for both parsers.
+#
+import re
+
+
+class ParseError(ValueError):
+    pass
+
+
+class Tokens(list):
+    """A list of tokens with named results, a minimal stand-in for pyparsing's ParseResults."""
+
+    def __init__(self, items=(), **names):
+        list.__init__(self, items)
+        self.names = names
+
+    def __getitem__(self, i):
+        if isinstance(i, str):
+            return self.names[i]
+        return list.__getitem__(self, i)
+
+    # as in ParseResults, 'in' looks up the named results
+    def __contains__(self, k):
+        return k in self.names
+
+    def get(self, k, default=None):
+        return self.names.get(k, default)
+
+    def keys(self):
+        return self.names.keys()
+
+    def items(self):
+        return self.names.items()
+
+    def asList(self):
+        return [i.asList() if isinstance(i, Tokens) else i for i in self]
+
+
+# one regex for all tokens, the last alternative catches any unexpected character
+_token = re.compile(r"""\s*(?:
+    (?P<real>[+-]?(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<int>[+-]?\d+(?:[eE]\+?\d+)?)
+  | (?P<quoted>'(?:[^'\n\r\\]|''|\\(?:[^x]|x[0-9a-fA-F]+))*'|"(?:[^"\n\r\\]|""|\\(?:[^x]|x[0-9a-fA-F]+))*")
+  | (?P<ident>[A-Za-z][A-Za-z0-9_$]*)
+  | (?P<bind>\?|:[A-Za-z][A-Za-z0-9_$]*)
+  | (?P<op>!=|<=|>=|[=<>(),.;*+\-\[\]{}:])
+  | (?P<error>\S)
+)""", re.VERBOSE)
+
+_binops = {'=', '!=', '<', '>', '<=', '>=', 'eq', 'ne', 'lt', 'le', 'gt', 'ge'}
+_where_ops = _binops | {'in'}
+_values = {'real', 'int', 'quoted', 'bind'}
+_constants = {'real', 'int', 'quoted'}
+_collections = {'list', 'set', 'map'}
+_aggregates = {'count', 'sum', 'min', 'max', 'avg'}
+
+
+def tokenize(s):
+    """returns a list of (kind, value), identifiers and keywords are lower cased"""
+    out = []
+    for m in _token.finditer(s):
+        kind = m.lastgroup
+        v = m.group(kind)
+        if kind == 'ident' or kind == 'bind':
+            v = v.lower()
+        elif (kind == 'real' or kind == 'int') and 'e' in v:
+            v = v.replace('e', 'E')
+        out.append((kind, v))
+    out.append(('end', ''))
+    return out
+
+
+class _Parser:
+
+    def __init__(self, s):
+        self.tokens = tokenize(s)
+        self.pos = 0
+
+    def error(self, expected):
+        kind, v = self.tokens[self.pos]
+        raise ParseError('Expected {} (at token {}: {!r})'.format(expected, self.pos, v or kind))
+
+    def accept(self, v):
+        # consume the next token if it is v
+        if self.tokens[self.pos][1] == v and self.tokens[self.pos][0] != 'quoted':
+            self.pos += 1
+            return v
+        return None
+
+    def expect(self, v):
+        if self.accept(v) is None:
+            self.error('"{}"'.format(v))
+        return v
+
+    def ident(self):
+        kind, v = self.tokens[self.pos]
+        if kind != 'ident':
+            self.error('identifier')
+        self.pos += 1
+        return v
+
+    def ident_list(self):
+        out = [self.ident()]
+        while self.accept(','):
+            out.append(self.ident())
+        return Tokens(out)
+
+    def selector(self, aggregates=True):
+        # a column, the token of the partition key columns, or an aggregate
+        kind, v = self.tokens[self.pos]
+        if kind == 'ident' and self.tokens[self.pos + 1] == ('op', '('):
+            if v == 'token':
+                self.pos += 2
+                cols = self.ident_list()
+                self.expect(')')
+                return Tokens(['token', cols])
+            if aggregates and v in _aggregates:
+                self.pos += 2
+                column = self.accept('*') or self.ident()
+                self.expect(')')
+                return Tokens([v, column])
+        if aggregates and kind == 'ident' and self.tokens[self.pos + 1] == ('op', '['):
+            # an element of a collection
+            self.pos += 2
+            out = Tokens([v, '[', self.rval(), ']'])
+            self.expect(']')
+            return out
+        return self.ident()
+
+    def selector_list(self):
+        out = [self.selector()]
+        while self.accept(','):
+            out.append(self.selector())
+        return Tokens(out)
+
+    def rval(self):
+        kind, v = self.tokens[self.pos]
+        if kind not in _values:
+            self.error('value')
+        self.pos += 1
+        return v
+
+    def constant(self):
+        kind, v = self.tokens[self.pos]
+        if kind not in _constants:
+            self.error('constant')
+        self.pos += 1
+        return v
+
+    def value(self):
+        # a value, or the literal of a collection: [list], {set}, {key: value}
+        if self.accept('['):
+            out = ['[']
+            if not self.accept(']'):
+                out.append(self.constant())
+                while self.accept(','):
+                    out.append(self.constant())
+                self.expect(']')
+            return Tokens(out)
+        if not self.accept('{'):
+            return self.rval()
+        out = ['{']
+        if self.accept('}'):
+            return Tokens(out)
+        first = self.constant()
+        if self.accept(':'):
+            out.append(Tokens([first, self.constant()]))
+            while self.accept(','):
+                key = self.constant()
+                self.expect(':')
+                out.append(Tokens([key, self.constant()]))
+        else:
+            out.append(first)
+            while self.accept(','):
+                out.append(self.constant())
+        self.expect('}')
+        return Tokens(out)
+
+    def table(self):
+        name = self.ident()
+        if self.accept('.'):
+            return Tokens([name, '.', self.ident()])
+        return Tokens([name])
+
+    def condition(self, ops):
+        col = self.selector(False)
+        kind, op = self.tokens[self.pos]
+        if op == 'in' and kind == 'ident' and op in ops and isinstance(col, str):
+            self.pos += 1
+            return Tokens([col, op, self.in_values()])
+        if op not in ops or op == 'in' or kind == 'quoted':
+            self.error('operator')
+        self.pos += 1
+        return Tokens([col, op, self.rval()])
+
+    def in_values(self):
+        # a list of values, or the bind marker of a list
+        if self.accept('('):
+            out = [self.rval()]
+            while self.accept(','):
+                out.append(self.rval())
+            self.expect(')')
+            return Tokens(out)
+        kind, v = self.tokens[self.pos]
+        if kind != 'bind':
+            self.error('( or bind marker')
+        self.pos += 1
+        return v
+
+    def assignment(self):
+        # col = value, the increment of a counter col = col + value, col = col - value,
+        # or the update of a collection col = col + [...], col = [...] + col, col[key] = value
+        col = self.ident()
+        if self.accept('['):
+            key = self.rval()
+            self.expect(']')
+            self.expect('=')
+            return Tokens([col, '[', key, ']', '=', self.rval()])
+        self.expect('=')
+        kind, v = self.tokens[self.pos]
+        if v in ('[', '{') and kind == 'op':
+            value = self.value()
+            if self.accept('+'):
+                return Tokens([col, '=', value, '+', self.ident()])
+            return Tokens([col, '=', value])
+        if kind != 'ident':
+            return Tokens([col, '=', self.rval()])
+        self.pos += 1
+        kind, op = self.tokens[self.pos]
+        if kind == 'op' and op in ('+', '-'):
+            self.pos += 1
+            return Tokens([col, '=', v, op, self.value()])
+        if kind in ('int', 'real') and op[0] in '+-':
+            # col+1 is lexed as col, +1
+            self.pos += 1
+            return Tokens([col, '=', v, op[0], op[1:]])
+        self.error('+ or -')
+
+    def conditions(self, head, ops, sep):
+        out = [head, self.condition(ops)]
+        while self.accept(sep):
+            out += [sep, self.condition(ops)]
+        return Tokens(out)
+
+    def where(self, toks, names):
+        if self.accept('where'):
+            toks.append(self.conditions('where', _where_ops, 'and'))
+            names['where'] = toks[-1]
+
+    def using(self, toks, names, options=('ttl', 'timestamp')):
+        if self.accept('using'):
+            out = ['using']
+            while True:
+                kind, v = self.tokens[self.pos]
+                if v not in options or kind != 'ident':
+                    self.error(' or '.join(options))
+                kind, value = self.tokens[self.pos + 1]
+                if kind not in ('int', 'bind'):
+                    self.pos += 1
+                    self.error('integer')
+                self.pos += 2
+                out.append(Tokens([v, value]))
+                if len(options) == 1 or not self.accept('and'):
+                    break
+                out.append('and')
+            toks.append(Tokens(out))
+            names['using'] = toks[-1]
+
+    def if_clause(self, toks, names):
+        if self.accept('if'):
+            if self.accept('not'):
+                toks.append(Tokens(['if', 'not', self.expect('exists')]))
+            elif self.accept('exists'):
+                toks.append(Tokens(['if', 'exists']))
+            else:
+                toks.append(self.conditions('if', _binops, 'and'))
+            names['if'] = toks[-1]
+
+    def statement(self):
+        kind, v = self.tokens[self.pos]
+        method = getattr(self, 'stmt_' + v, None) if kind == 'ident' else None
+        if method is None:
+            self.error('statement')
+        toks, names = method()
+        self.expect(';')
+        toks.append(';')
+        return Tokens(toks, **names)
+
+    def stmt_select(self):
+        toks, names = [self.expect('select')], {}
+
+        cols = self.accept('*') or self.selector_list()
+        toks.append(cols)
+        names['columns'] = cols
+
+        toks.append(self.expect('from'))
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.where(toks, names)
+
+        if self.accept('group'):
+            toks.append(Tokens(['group', self.expect('by'), self.ident_list()]))
+            names['group'] = toks[-1]
+
+        if self.accept('order'):
+            order = ['order', self.expect('by')]
+            while True:
+                column = [self.ident()]
+                direction = self.accept('asc') or self.accept('desc')
+                if direction:
+                    column.append(direction)
+                order.append(Tokens(column))
+                if not self.accept(','):
+                    break
+            toks.append(Tokens(order))
+            names['order'] = toks[-1]
+
+        if self.accept('limit'):
+            kind, v = self.tokens[self.pos]
+            if kind != 'int':
+                self.error('integer')
+            self.pos += 1
+            toks.append(Tokens(['limit', v]))
+            names['limit'] = toks[-1]
+
+        if self.accept('allow'):
+            toks.append(Tokens(['allow', self.expect('filtering')]))
+            names['allow'] = toks[-1]
+
+        return toks, names
+
+    def stmt_insert(self):
+        toks, names = [self.expect('insert'), self.expect('into')], {}
+
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.expect('(')
+        cols = self.ident_list()
+        self.expect(')')
+        toks.append(Tokens(['(', cols, ')'], list=cols))
+        names['columns'] = toks[-1]
+
+        toks.append(self.expect('values'))
+
+        self.expect('(')
+        values = [self.value()]
+        while self.accept(','):
+            values.append(self.value())
+        values = Tokens(values)
+        self.expect(')')
+        toks.append(Tokens(['(', values, ')'], list=values))
+        names['values'] = toks[-1]
+
+        self.if_not_exists(toks, names)
+        self.using(toks, names)
+        return toks, names
+
+    def stmt_update(self):
+        toks, names = [self.expect('update')], {}
+
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.using(toks, names)
+        toks.append(self.expect('set'))
+        out = [self.assignment()]
+        while self.accept(','):
+            out += [',', self.assignment()]
+        toks.append(Tokens(out))
+        names['set'] = toks[-1]
+
+        self.where(toks, names)
+        self.if_clause(toks, names)
+        return toks, names
+
+    def stmt_delete(self):
+        toks, names = [self.expect('delete')], {}
+        if self.tokens[self.pos] != ('ident', 'from'):
+            toks.append(self.ident_list())
+            names['columns'] = toks[-1]
+        toks.append(self.expect('from'))
+
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.using(toks, names, ('timestamp',))
+
+        self.where(toks, names)
+        self.if_clause(toks, names)
+        return toks, names
+
+    def stmt_begin(self):
+        toks = [self.expect('begin')]
+        kind = self.accept('unlogged') or self.accept('logged')
+        if kind:
+            toks.append(kind)
+        toks.append(self.expect('batch'))
+
+        statements = []
+        while not self.accept('apply'):
+            kind, v = self.tokens[self.pos]
+            if v not in ('insert', 'update', 'delete') or kind != 'ident':
+                self.error('insert, update, delete or apply')
+            statement, names = getattr(self, 'stmt_' + v)()
+            statements.append(Tokens(statement, **names))
+            self.accept(';')
+        if not statements:
+            self.error('insert, update or delete')
+
+        toks.append(Tokens(statements))
+        toks += ['apply', self.expect('batch')]
+        return toks, {'statements': toks[-3]}
+
+    def stmt_use(self):
+        return [self.expect('use'), self.ident()], {}
+
+    def if_not_exists(self, toks, names):
+        if self.accept('if'):
+            toks.append(Tokens(['if', self.expect('not'), self.expect('exists')]))
+            names['if'] = toks[-1]
+
+    def stmt_create(self):
+        if self.tokens[self.pos + 1] == ('ident', 'index'):
+            return self.create_index()
+        if self.tokens[self.pos + 1] == ('ident', 'materialized'):
+            return self.create_view()
+
+        toks, names = [self.expect('create'), self.expect('table')], {}
+        self.if_not_exists(toks, names)
+
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.expect('(')
+        columns = [self.column_definition()]
+        while self.accept(','):
+            columns += [',', self.column_definition()]
+        self.expect(')')
+
+        # as in the pyparsing grammar, 'column' names the last column definition
+        columns = Tokens(columns, column=columns[-1])
+        toks.append(Tokens(['('] + columns + [')'], columns=columns, column=columns[-1]))
+        names['columns_def'] = toks[-1]
+
+        return toks, names
+
+    def create_index(self):
+        toks, names = [self.expect('create'), self.expect('index')], {}
+        self.if_not_exists(toks, names)
+
+        if self.tokens[self.pos] != ('ident', 'on'):
+            toks.append(self.ident())
+            names['name'] = toks[-1]
+
+        toks.append(self.expect('on'))
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        self.expect('(')
+        toks.append(self.ident())
+        names['column'] = toks[-1]
+        self.expect(')')
+
+        return toks, names
+
+    def create_view(self):
+        toks, names = [self.expect('create'), self.expect('materialized'), self.expect('view')], {}
+        self.if_not_exists(toks, names)
+
+        toks.append(self.table())
+        names['view'] = toks[-1]
+
+        toks += [self.expect('as'), self.expect('select')]
+        toks.append(self.accept('*') or self.ident_list())
+        names['columns'] = toks[-1]
+
+        toks.append(self.expect('from'))
+        toks.append(self.table())
+        names['table'] = toks[-1]
+
+        where = [self.expect('where')]
+        while True:
+            where.append(Tokens([self.ident(), self.expect('is'), self.expect('not'), self.expect('null')]))
+            if not self.accept('and'):
+                break
+            where.append('and')
+        toks.append(Tokens(where))
+        names['where'] = toks[-1]
+
+        self.expect('primary')
+        self.expect('key')
+        toks.append(Tokens(['primary', 'key', self.composite_key()]))
+        names['primary_key'] = toks[-1]
+
+        return toks, names
+
+    def column_definition(self):
+        if self.accept('primary'):
+            self.expect('key')
+            primary_key = Tokens(['primary', 'key', self.composite_key()])
+            return Tokens([primary_key], primary_key=primary_key)
+
+        column = [self.ident(), self.cql_type()]
+        if self.accept('primary'):
+            column += ['primary', self.expect('key')]
+        return Tokens(column)
+
+    def cql_type(self):
+        # collection types are joined in one string: map<text, int>
+        name = self.ident()
+        if name not in _collections or not self.accept('<'):
+            return name
+        types = [self.ident()]
+        while self.accept(','):
+            types.append(self.ident())
+        self.expect('>')
+        return '{}<{}>'.format(name, ', '.join(types))
+
+    def composite_key(self):
+        if not self.accept('('):
+            return Tokens([self.ident()])
+
+        if not self.accept('('):
+            out = Tokens([self.ident_list()])
+            self.expect(')')
+            return out
+
+        partition = self.ident_list()
+        self.expect(')')
+        self.expect(',')
+        clustering = self.ident_list()
+        self.expect(')')
+        return Tokens([partition, ',', clustering])
+
+
+def parseString(s):
+    return _Parser(s).statement()
+
+
+# differential corpus: both parsers must agree on these statements, see tests/test_fastparser.py
+CORPUS = [
+    "select * from xyzzy;",
+    "select * from SYS.XYZZY;",
+    "Select A from Sys.dual;",
+    "Select A,B,C from Sys.dual;",
+    "Select A from Sys.dual where a='3';",
+    "Select A, B , aaks from Sys.dual where a='3' and b=22 limit 99;",
+    "Select A from Sys.dual where a eq '3';",
+    "select a from t where a != 1.5 and b < -2 and c > +3E5 and d <= .5 and e >= 1.e-3 and f ne 'x';",
+    "select a from t where a lt 1 and b le 2 and c gt 3 and d ge 4;",
+    "select * from t where a = \"double quoted\" and b = 'it''s';",
+    "select * from t where a = ? and b = :Name limit 10;",
+    "select * from t where a = 1 and b > 2 and b <= 5 order by b desc limit 10;",
+    "select * from t where a = 1 ORDER BY b, c ASC;",
+    "select token(a), a, b from t;",
+    "select token(a, b) from t where token(a, b) > ? and token(a, b) <= 10;",
+    "select token from t where token = 1;",
+    "select * from t where v > 1 and w != 'x' allow filtering;",
+    "select count(*), COUNT(v), sum(v), min(v), max(v), avg(v) from t;",
+    "select a, b, count(*), max(v) from k.t where a = ? group by a, b order by b desc limit 10;",
+    "select count, counter from t group by count;",
+    "select a from t where a = 1 and v <= ? order by b desc limit 5 ALLOW FILTERING;",
+    "Insert into Sys.dual (ds,sd) values (1,'33') ;",
+    "insert into mybook.posts (user_id, month, id, title, body) values ('nat','june','1','first', 'it is me, mario');",
+    "insert into t (a, b, c) values (?, ?, :c);",
+    "update dual SET ds=1, ss='3232' where a='3' and b=22 IF a='3' and b=22;",
+    "update t set a=1 where b=2 if exists;",
+    "update t set a=1 where b=2 if not exists;",
+    "update t set a=?, b=:b where c=?;",
+    "delete from dual where a='3' and b=22 IF EXISTS;",
+    "delete from t where a = 1 and b = 2 if v != 3 and w >= ?;",
+    "insert into t (a, b) values (1, 2) if not exists;",
+    "insert into t (a, b) values (?, ?) IF NOT EXISTS USING TTL 10;",
+    "update t set v = ? where a = ? if v = ? and w < 3;",
+    "delete from t;",
+    "delete v, w from t using timestamp 10 where a = 1 and b = 2;",
+    "delete from t where a = ? and b > 1 and b <= ?;",
+    "insert into t (a, b) values (1, 2) using ttl 10;",
+    "insert into t (a, b) values (1, 2) USING TIMESTAMP ? AND TTL :ttl;",
+    "update t using ttl 5 set v = 1 where a = 1;",
+    "select ttl, timestamp from t where ttl = 1;",
+    "select * from t where a in (1, 'x', ?) and b IN :b and c In (2.5);",
+    "select * from t where a = 1 and b in ? and c >= 3;",
+    "select in from t where in = 1;",
+    "delete from t where a in (1, 2);",
+    "update t set hits = hits + 1, misses = misses - ? where a = 1;",
+    "update t set c=c+1, d=d-2.5, e = e - -1 where a = 1;",
+    "create table t (a int primary key, l list<int>, s SET<text>, m map<text, double>, list text, set int);",
+    "insert into t (a, l, s, m) values (1, [1, 2, -3], {'x', 'y'}, {'k': 1.5, 'j': 2});",
+    "insert into t (a, l, s, m) values (1, [], {}, ?);",
+    "update t set l = l + [4], s = s - {'x'}, m = m + {'z': 3}, l = [0] + l where a = 1;",
+    "update t set m['k'] = 2.5, l[0] = ?, m = m - {'j'} where a = ?;",
+    "select a, m['k'], l[:i], m from t where a = 1;",
+    "use akaksakhd;",
+    "USE MyKeyspace ;",
+    """
+        CREATE TABLE sblocks (
+            id uuid,
+            block_id uuid,
+            sub_block_id uuid,
+            data blob,
+            PRIMARY KEY ( (id, block_id), sub_block_id )
+        );
+    """,
+    "create table if not exists k.t (a text, c int, primary key (a));",
+    "create table t (a text primary key, c int);",
+    "create table t (a text, b text, c int, primary key (a, b));",
+    "create index on t (c);",
+    "CREATE INDEX IF NOT EXISTS t_c ON k.t ( C );",
+    """
+        CREATE MATERIALIZED VIEW k.by_c AS
+            SELECT * FROM k.t
+            WHERE c IS NOT NULL AND a IS NOT NULL and b is not null
+            PRIMARY KEY (c, a, b);
+    """,
+    "create materialized view if not exists v as select a, b from t where a is not null primary key ((b, a), c);",
+    "select * from t; trailing text is ignored",
+    "begin batch insert into t (a, b) values (1, 2); apply batch;",
+    """
+        BEGIN UNLOGGED BATCH
+            insert into t (a, b) values (1, ?);
+            update k.t set b=2 where a=1
+            delete from t where a=3;
+        APPLY BATCH;
+    """,
+]
+
+CORPUS_ERRORS = [
+    "select * from t",
+    "Select A, B, C from Sys.dual, Table2;",
+    "Xelect A, B, C from Sys.dual;",
+    "Select A, B, C frox Sys.dual;",
+    "Select",
+    "Select * from",
+    "Select &&& frox Sys.dual;",
+    "select * from t limit 1.5;",
+    "update t set a > 1;",
+    "select * from t order by;",
+    "begin batch apply batch;",
+    "begin batch select * from t; apply batch;",
+    "select token() from t;",
+    "select * from t where token(a) in 1;",
+    "select * from t where v > 1 allow;",
+    "select * from t allow filtering limit 1;",
+    "select count() from t;",
+    "select sum(a, b) from t;",
+    "select * from t group by;",
+    "select * from t order by a group by a;",
+    "select * from t where count(a) = 1;",
+    "insert into t (a) values (1) using ttl;",
+    "insert into t (a) values (1) using ttl 1.5;",
+    "update t set v = 1 using ttl 1 where a = 1;",
+    "delete from t using ttl 1 where a = 1;",
+    "delete v, from t;",
+    "insert into t (a) values (1) if exists;",
+    "insert into t (a) values (1) using ttl 1 if not exists;",
+    "update t set v = 1 where a = 1 if;",
+    "delete from t where a = 1 if v;",
+    "select * from t where a in 1;",
+    "select * from t where a in ();",
+    "select * from t where a in (1,);",
+    "select * from t where token(a) in (1);",
+    "update t set v = 1 where a = 1 if v in (1);",
+    "update t set c = c * 2 where a = 1;",
+    "update t set c = c + where a = 1;",
+    "update t set c = d + 1 + 1 where a = 1;",
+    "select * from t where a = + 1;",
+    "create table t (a int primary key, l list<>);",
+    "create table t (a int primary key, l list<int);",
+    "insert into t (a, l) values (1, [1, ?]);",
+    "insert into t (a, m) values (1, {'k': 1, 'j'});",
+    "insert into t (a, m) values (1, {'k', 'j': 1});",
+    "update t set l = [1] - l where a = 1;",
+    "update t set m['k'] = [1] where a = 1;",
+    "select m[] from t;",
+    "select * from t where m['k'] = 1;",
+    "create index t (c);",
+    "create index on t c;",
+    "create index on on t (c);",
+    "create materialized view v as select * from t primary key (a);",
+    "create materialized view v as select * from t where a = 1 primary key (a);",
+]
+
+
+if __name__ == "__main__":
+    import time
+
+    t0 = time.time()
+    from cassandra_mock.parser import simpleSQL
+    print('import pyparsing grammar: {:.1f} ms'.format((time.time() - t0) * 1000))
+
+    # statements per second
+    n = 20
+    for name, parse in (('pyparsing', simpleSQL.parseString), ('fastparser', parseString)):
+        t0 = time.time()
+        for i in range(n):
+            for s in CORPUS:
+                parse(s)
+        print('{:>10}: {:9.0f} statements/s'.format(name, n * len(CORPUS) / (time.time() - t0)))
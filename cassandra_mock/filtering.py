@@ -0,0 +1,42 @@
+# filtering.py
+#
+# ALLOW FILTERING: the conditions of a query which are not answered by the primary key or by
+# an index are compiled once, when the statement is planned, into the source of a single python
+# function. Scans call it on each row, without interpreting the conditions again:
+#
+#   def bind(_v0, _v1):
+#       def predicate(key, cells):
+#           v = cells.get(_c0)
+#           if v is None or not v > _v0:
+#               return False
+#           ...
+#           return True
+#       return predicate
+#
+
+_operators = {'=': '==', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', 'in': 'in'}
+
+
+def compile_filter(conditions, keys):
+    """
+    conditions is a list of (column, operator), keys the primary key columns. Returns bind(*values),
+    which returns the predicate(primary key, cells) of the rows which match all the conditions for
+    their values. A missing or null cell matches no condition
+    """
+    names = {}
+    lines = ['def bind({}):'.format(', '.join('_v{}'.format(i) for i in range(len(conditions)))),
+             '    def predicate(key, cells):']
+    for i, (k, op) in enumerate(conditions):
+        if k in keys:
+            lines.append('        v = key[{}]'.format(keys.index(k)))
+        else:
+            # column names are not pasted in the source
+            names['_c{}'.format(i)] = k
+            lines.append('        v = cells.get(_c{})'.format(i))
+        lines.append('        if v is None or not v {} _v{}:'.format(_operators[op], i))
+        lines.append('            return False')
+    lines += ['        return True',
+              '    return predicate']
+    
+    exec(compile('\n'.join(lines), '<filter>', 'exec'), names)
+    return names['bind']
@@ -0,0 +1,136 @@
+# handle.py
+#
+# direct access to the rows of a table, without CQL: session.table('ks.t') resolves the table
+# once, its key columns, the casts of its schema and the root of its tree, so that get, put
+# and scan skip the parser, the plan and the checks of each statement. The schema epoch of the
+# cluster is bumped by CREATE TABLE, INDEX and MATERIALIZED VIEW: the handle resolves the table
+# again on its next call
+#
+import time
+
+from .cluster import Row, lookup, walk
+
+
+class TableHandle:
+    """
+    A table of a session, resolved once. get and scan return Row views as SELECT * does,
+    put writes as INSERT does: indexes, views, counts and the commit log are maintained
+    """
+    
+    def __init__(self, session, keyspace, table):
+        self.session = session
+        self.keyspace = keyspace
+        self.table = table
+        self._epoch = None
+        self._resolve()
+    
+    def _resolve(self):
+        session = self.session
+        self._epoch = session.epoch[0]
+        
+        root = session.db.get(self.keyspace, {}).get(self.table)
+        if root is None:
+            raise ValueError('unknown table {}.{}'.format(self.keyspace, self.table))
+        
+        pkeys_keys, ckeys_keys = session._key_names(self.keyspace, self.table)
+        keys = pkeys_keys + ckeys_keys
+        self._root = root
+        self._meta = session._metadata(self.keyspace, self.table)
+        self._keys = keys
+        self._positions = dict((k, i) for i, k in enumerate(keys))
+        self._partition_size = len(pkeys_keys)
+        self._view = self.table in session.views.get(self.keyspace, {})
+        
+        # the layout of the rows under a key prefix of each length, as made by SELECT
+        self._layouts = [(self._positions, tuple(keys[:i]), tuple(reversed(keys[i:]))) for i in range(len(keys) + 1)]
+    
+    def _key(self, key):
+        # the values of the primary key, checked and typed
+        return tuple(self._meta.key(key)) if self._meta is not None else tuple(key)
+    
+    def _times(self):
+        """ the TableTimes of the table when some of its cells expire """
+        times = self.session.times.get(self.keyspace, {}).get(self.table)
+        return times if times is not None and times.deadlines else None
+    
+    def _counters(self):
+        """ the TableCounters of the table once its counters were incremented """
+        return self.session.counters.get(self.keyspace, {}).get(self.table)
+    
+    def get(self, *key):
+        """ the row of the primary key values, None when there is none """
+        if self._epoch != self.session.epoch[0]:
+            self._resolve()
+        if len(key) != len(self._keys):
+            raise ValueError('{}.{} has {} primary key columns, {} values were given'.format(
+                self.keyspace, self.table, len(self._keys), len(key)))
+        key = self._key(key)
+        
+        cells = lookup(self._root, key)
+        if cells is None:
+            return None
+        
+        times = self._times()
+        if times is not None and key in times.deadlines:
+            cells = times.live(key, cells, time.time())
+            if cells is None:
+                return None
+        counters = self._counters()
+        if counters is not None:
+            cells = counters.merged(key, cells)
+        return Row(self._layouts[-1], key, cells)
+    
+    def put(self, row):
+        """ writes a row, a mapping of columns to values which has all the primary key columns """
+        if self._epoch != self.session.epoch[0]:
+            self._resolve()
+        missing = [k for k in self._keys if k not in row]
+        if missing:
+            raise ValueError('missing primary key columns of {}.{}: {}'.format(self.keyspace, self.table,
+                                                                                ', '.join(missing)))
+        key = self._key([row[k] for k in self._keys])
+        if self._view:
+            raise ValueError('cannot directly modify the materialized view {}.{}'.format(self.keyspace, self.table))
+        
+        cells = dict((k, v) for k, v in row.items() if k not in self._positions)
+        if self._meta is not None:
+            cells = self._meta.cells(cells)
+        size = self._partition_size
+        self.session._put(self.keyspace, self.table, key[:size], key[size:], cells, self._meta)
+    
+    def scan(self, *prefix):
+        """
+        lazily yields the rows under the values of the partition key and of a clustering prefix, in
+        clustering order. Without values, the rows of the whole table, in the order of SELECT
+        """
+        if self._epoch != self.session.epoch[0]:
+            self._resolve()
+        if len(prefix) > len(self._keys):
+            raise ValueError('{}.{} has {} primary key columns, {} values were given'.format(
+                self.keyspace, self.table, len(self._keys), len(prefix)))
+        prefix = self._key(prefix)
+        if not prefix:
+            for key, row in self.session._rows(self.keyspace, self.table, limit=float('inf')):
+                yield row
+            return
+        if len(prefix) < self._partition_size:
+            raise ValueError('scans of {}.{} need all the partition key columns {}'.format(
+                self.keyspace, self.table, ', '.join(self._keys[:self._partition_size])))
+        
+        d = lookup(self._root, prefix)
+        if d is None:
+            return
+        
+        layout = self._layouts[len(prefix)]
+        leaves = walk(d, len(self._keys) - len(prefix), None, prefix)
+        counters = self._counters()
+        if counters is not None:
+            leaves = counters.merged_rows(leaves)
+        times = self._times()
+        if times is not None:
+            leaves = times.live_rows(leaves, time.time())
+        for key, cells in leaves:
+            yield Row(layout, key, cells)
+    
+    def __repr__(self):
+        return '<TableHandle {}.{} primary_key={}>'.format(self.keyspace, self.table, self._keys)
@@ -0,0 +1,73 @@
+class SecondaryIndex:
+    """
+    CREATE INDEX: the inverted index of a regular column of a table, which maps each value of the column
+    to the primary keys of the rows with that value. It is written under the shared lock, along with the
+    rows, and read without locks
+    """
+    
+    def __init__(self, name, keyspace, table, column):
+        self.name = name
+        self.keyspace = keyspace
+        self.table = table
+        self.column = column
+        self.entries = {}
+    
+    def add(self, value, key):
+        self.entries.setdefault(value, set()).add(key)
+    
+    def discard(self, value, key):
+        keys = self.entries.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.entries[value]
+    
+    def keys(self, value):
+        """ the primary keys of the rows with value, as a copy """
+        return tuple(self.entries.get(value, ()))
+    
+    def __repr__(self):
+        return '<SecondaryIndex {} on {}.{} ({}) values={}>'.format(self.name, self.keyspace, self.table, self.column,
+                                                                   len(self.entries))
+
+
+class MaterializedView:
+    """
+    CREATE MATERIALIZED VIEW: a table holding the rows of a base table under another primary key, which has
+    all the primary key columns of the base table, and at most one of its regular columns, so that each base
+    row is one view row. The view is updated by the writes of the base table, and cannot be written directly
+    """
+    
+    def __init__(self, keyspace, name, base, columns, index, base_index):
+        self.keyspace = keyspace
+        self.name = name
+        self.base = base
+        
+        # the selected columns, None for all of them
+        self.columns = None if columns is None else list(columns)
+        self.index = index
+        self.keys = list(index[0]) + list(index[1:])
+        
+        base_keys = list(base_index[0]) + list(base_index[1:])
+        missing = [k for k in base_keys if k not in self.keys]
+        if missing:
+            raise ValueError('the primary key of view {} must include the primary key columns of {}: {}'.format(
+                name, base, ', '.join(missing)))
+        if len(self.keys) > len(base_keys) + 1:
+            raise ValueError('the primary key of view {} may include at most one regular column of {}'.format(name, base))
+        if self.columns is not None:
+            self.columns = [k for k in self.columns if k not in self.keys]
+    
+    def key(self, row):
+        """ the primary key of the view row of a base row, a dict of its columns, or None """
+        key = tuple(row.get(k) for k in self.keys)
+        return None if None in key else key
+    
+    def cells(self, row):
+        """ the cells of the view row of a base row """
+        if self.columns is None:
+            return dict((k, v) for k, v in row.items() if k not in self.keys)
+        return dict((k, row[k]) for k in self.columns if k in row)
+    
+    def __repr__(self):
+        return '<MaterializedView {}.{} of {} primary_key={}>'.format(self.keyspace, self.name, self.base, self.index)
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+import threading
+
+
+class Locks:
+    """
+    The locks of a cluster, shared by its sessions. A write locks the stripe of its
+    partition, so that writes to partitions on different stripes run concurrently.
+    Reads take no lock. Increments of counters lock the counter stripe of their thread instead,
+    see counters.py
+    """
+    
+    def __init__(self, stripes=64, counters=16):
+        self.stripes = [threading.RLock() for i in range(stripes)]
+        self.counters = [threading.Lock() for i in range(counters)]
+        
+        # guards what all partitions share: the tables, the token indexes
+        self.shared = threading.RLock()
+    
+    def _stripe(self, keyspace, table, pkey):
+        # the partitions of a composite key share parent nodes below their first column:
+        # they are on the same stripe
+        return hash((keyspace, table, pkey[0])) % len(self.stripes)
+    
+    def partition(self, keyspace, table, pkey):
+        """ the lock of a partition """
+        return self.stripes[self._stripe(keyspace, table, pkey)]
+    
+    @contextmanager
+    def partitions(self, keys):
+        """ holds the locks of the partitions (keyspace, table, pkey) """
+        with self._hold(set(self._stripe(*key) for key in keys)):
+            yield
+    
+    @contextmanager
+    def _hold(self, stripes):
+        # locks are always taken in stripe order, so that holders never deadlock
+        locks = [self.stripes[i] for i in sorted(stripes)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    
+    @contextmanager
+    def all(self):
+        """ holds every lock: no write goes on meanwhile. Stripes first, as writers do """
+        with self._hold(range(len(self.stripes))), self.shared:
+            for lock in self.counters:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock in reversed(self.counters):
+                    lock.release()
@@ -0,0 +1,216 @@
+# metrics.py
+#
+# query traces and the metrics of a cluster. Session.execute(query, trace=True) times the stages of
+# the statement in a QueryTrace, returned by ResultSet.get_query_trace(): the parse and the plan of
+# the statements missing from the plan cache, the binding of the values, the run of the writes and
+# the scan of the rows, with the rows walked and the rows returned. With Session.DEFAULTS['METRICS'],
+# every statement is traced and the cluster sums the traces in its Metrics: latency histograms per
+# statement and table, rows scanned and returned per table, hits of the plan caches.
+# Untraced statements of a cluster without metrics take none of these timings
+#
+import math
+import threading
+import time
+
+
+def table_name(keyspace, table):
+    return '{}.{}'.format(keyspace, table) if table else ''
+
+
+class Histogram:
+    """
+    values in microseconds, counted in log-linear buckets as in HdrHistogram: each power of 2 is split
+    in 2 ** precision buckets, so that the percentiles are within 2 ** -precision of the values
+    """
+    
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+    
+    def record(self, value):
+        value = int(value)
+        
+        # the values below 2 ** (precision + 1) have a bucket each, the low bits of the others are dropped
+        shift = max(value.bit_length() - self.precision - 1, 0)
+        bucket = (shift, value >> shift)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def merge(self, other):
+        """ adds the values of another histogram of the same precision """
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def percentile(self, p):
+        """ the highest value of the bucket of the p-th percentile, p from 0 to 100 """
+        if not self.count:
+            return 0
+        
+        # buckets sort by shift, then by the high bits: in the order of their values
+        rank = max(int(math.ceil(p * self.count / 100.0)), 1)
+        seen = 0
+        for shift, high in sorted(self.counts):
+            seen += self.counts[(shift, high)]
+            if seen >= rank:
+                return min(((high + 1) << shift) - 1, self.max)
+        return self.max
+    
+    def as_dict(self):
+        return {'count': self.count, 'min': self.min or 0, 'max': self.max,
+                'mean': self.total / self.count if self.count else 0,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'p999': self.percentile(99.9)}
+
+
+class Metrics:
+    """ the sums of the traces of the statements of a cluster, shared by its sessions """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            # {(statement, keyspace, table): Histogram} of the latencies of execute()
+            self.latency = {}
+            
+            # {(keyspace, table): [rows scanned, rows returned]} of the SELECT statements
+            self.rows = {}
+            
+            # lookups of the plan caches of the sessions: [hits, misses]
+            self.plan_cache = [0, 0]
+    
+    def record(self, trace):
+        """ adds the latency and the plan cache lookups of a statement """
+        key = (trace.statement, trace.keyspace, trace.table)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.record(trace.duration * 1000000)
+            
+            self.plan_cache[0] += trace.plan_cache[0]
+            self.plan_cache[1] += trace.plan_cache[1]
+    
+    def record_rows(self, trace):
+        """ adds the rows of a SELECT, once its scan is over """
+        key = (trace.keyspace, trace.table)
+        with self._lock:
+            rows = self.rows.get(key)
+            if rows is None:
+                rows = self.rows[key] = [0, 0]
+            rows[0] += trace.rows_scanned
+            rows[1] += trace.rows_returned
+    
+    def as_dict(self):
+        """
+        {'latency': {statement: {'keyspace.table': histogram}}, 'rows': {'keyspace.table': {'scanned', 'returned'}},
+        'plan_cache': {'hits', 'misses', 'hit_rate'}}, latencies in microseconds
+        """
+        with self._lock:
+            latency = {}
+            for (statement, keyspace, table), histogram in self.latency.items():
+                latency.setdefault(statement, {})[table_name(keyspace, table)] = histogram.as_dict()
+            
+            rows = dict((table_name(keyspace, table), {'scanned': scanned, 'returned': returned})
+                        for (keyspace, table), (scanned, returned) in self.rows.items())
+            
+            (hits, misses) = self.plan_cache
+            return {'latency': latency, 'rows': rows,
+                    'plan_cache': {'hits': hits, 'misses': misses,
+                                   'hit_rate': hits / (hits + misses) if hits + misses else None}}
+
+
+class QueryTrace:
+    """
+    The stages of a statement, events are (stage, seconds, rows) where rows is None for the stages
+    which do not produce rows. The scan of a SELECT goes on while its pages are fetched: its event
+    and its rows grow with each page, duration is the time of execute(), up to the first page
+    """
+    
+    def __init__(self, query, metrics=None):
+        self.query = query if isinstance(query, str) else repr(query)
+        self.statement = None
+        self.keyspace = None
+        self.table = None
+        
+        self.started_at = time.time()
+        self.duration = None
+        self.events = []
+        
+        # [hits, misses] of the plan cache, for the statement or the statements of a batch
+        self.plan_cache = [0, 0]
+        
+        # the rows walked in the table, before the filters, and the rows or groups returned
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.scan_seconds = None
+        
+        self._metrics = metrics
+        self._start = time.perf_counter()
+    
+    def timed(self, stage, fn, *args):
+        """ runs fn(*args) as the stage """
+        started = time.perf_counter()
+        result = fn(*args)
+        self.events.append((stage, time.perf_counter() - started, None))
+        return result
+    
+    def cached(self, hit):
+        self.plan_cache[0 if hit else 1] += 1
+    
+    def scanned(self, leaves):
+        """ counts the (primary key, cells) walked """
+        for leaf in leaves:
+            self.rows_scanned += 1
+            yield leaf
+    
+    def fetched(self, rows):
+        """ counts the (primary key, row) returned and times the scan, which runs while they are pulled """
+        clock = time.perf_counter
+        self.scan_seconds = 0.0
+        rows = iter(rows)
+        try:
+            while True:
+                started = clock()
+                row = next(rows, None)
+                self.scan_seconds += clock() - started
+                if row is None:
+                    return
+                
+                self.rows_returned += 1
+                yield row
+        finally:
+            if self._metrics is not None:
+                self._metrics.record_rows(self)
+    
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+        if self._metrics is not None:
+            self._metrics.record(self)
+    
+    def as_dict(self):
+        events = [{'stage': stage, 'seconds': seconds, 'rows': rows} for stage, seconds, rows in self.events]
+        if self.scan_seconds is not None:
+            events.append({'stage': 'scan', 'seconds': self.scan_seconds, 'rows': self.rows_returned})
+        
+        return {'query': self.query, 'statement': self.statement, 'table': table_name(self.keyspace, self.table),
+                'started_at': self.started_at, 'duration': self.duration, 'events': events,
+                'rows_scanned': self.rows_scanned, 'rows_returned': self.rows_returned,
+                'plan_cache': {'hits': self.plan_cache[0], 'misses': self.plan_cache[1]}}
+    
+    def __repr__(self):
+        return '<QueryTrace {} duration={}>'.format(self.query, self.duration)
@@ -7,7 +7,7 @@
 #
 from pyparsing import Literal, CaselessLiteral, Word, delimitedList, Optional, \
     Combine, Group, alphas, nums, alphanums, ParseException, Forward, oneOf, quotedString, \
-    ZeroOrMore, restOfLine, Keyword, downcaseTokens
+    ZeroOrMore, OneOrMore, restOfLine, Keyword, downcaseTokens
 
 # numbers
 E = CaselessLiteral("E")
@@ -44,11 +44,43 @@ CREATE = Keyword("create", caseless=True)
 TABLE = Keyword("table", caseless=True)
 PRIMARY = Keyword("primary", caseless=True)
 KEY = Keyword("key", caseless=True)
+BEGIN = Keyword("begin", caseless=True)
+UNLOGGED = Keyword("unlogged", caseless=True)
+LOGGED = Keyword("logged", caseless=True)
+BATCH = Keyword("batch", caseless=True)
+APPLY = Keyword("apply", caseless=True)
+ORDER = Keyword("order", caseless=True)
+BY = Keyword("by", caseless=True)
+ASC = Keyword("asc", caseless=True)
+DESC = Keyword("desc", caseless=True)
+TOKEN = Keyword("token", caseless=True)
+INDEX = Keyword("index", caseless=True)
+ON = Keyword("on", caseless=True)
+MATERIALIZED = Keyword("materialized", caseless=True)
+VIEW = Keyword("view", caseless=True)
+AS = Keyword("as", caseless=True)
+IS = Keyword("is", caseless=True)
+NULL = Keyword("null", caseless=True)
+ALLOW = Keyword("allow", caseless=True)
+FILTERING = Keyword("filtering", caseless=True)
+GROUP = Keyword("group", caseless=True)
+USING = Keyword("using", caseless=True)
+TTL = Keyword("ttl", caseless=True)
+TIMESTAMP = Keyword("timestamp", caseless=True)
+IN = Keyword("in", caseless=True)
 
 # column names
 columnName = ident.setName("column").addParseAction(downcaseTokens)
 columnNameList = Group(delimitedList(columnName))
 
+# token of the partition key columns
+lparen = Literal('(').suppress()
+rparen = Literal(')').suppress()
+tokenCall = Group(TOKEN + lparen + columnNameList + rparen)
+
+# aggregate functions of a column, count also of *
+aggregateCall = Group(oneOf("count sum min max avg", caseless=True) + lparen + ('*' | columnName) + rparen)
+
 # table name
 keyspaceName = ident.addParseAction(downcaseTokens).setName("keyspace")
 tableName = Group(Optional(keyspaceName + ".") + ident.addParseAction(downcaseTokens)).setName("table")
@@ -56,41 +88,75 @@ tableName = Group(Optional(keyspaceName + ".") + ident.addParseAction(downcaseTo
 # where clause
 and_ = Keyword("and", caseless=True)
 binop = oneOf("= eq != < > >= <= eq ne lt le gt ge", caseless=True)
-Rval = realNum('real') | intNum('int') | quotedString('quoted')  # need to add support for alg expressions
-RvalList = Group(delimitedList(Rval))
+# bind markers, positional (?) or named (:name)
+bindMarker = Literal('?') | Combine(':' + ident)
+
+Rval = realNum('real') | intNum('int') | quotedString('quoted') | bindMarker('bind')  # need to add support for alg expressions
+
+# collection literals of constants: [list], {set}, {key: value}
+constant = realNum | intNum | quotedString
+listLiteral = Group(Literal('[') + Optional(delimitedList(constant)) + Literal(']').suppress())
+mapLiteral = Group(Literal('{') + delimitedList(Group(constant + Literal(':').suppress() + constant)) +
+                   Literal('}').suppress())
+setLiteral = Group(Literal('{') + Optional(delimitedList(constant)) + Literal('}').suppress())
+collectionLiteral = listLiteral | mapLiteral | setLiteral
+Value = Rval | collectionLiteral
+RvalList = Group(delimitedList(Value))
+
+# an element of a collection, by key or by index
+elementSelector = Group(columnName + "[" + Rval + "]")
+selectorList = Group(delimitedList(tokenCall | aggregateCall | elementSelector | columnName))
+
+# values of IN, a list or the bind marker of a list
+inValues = Group(lparen + delimitedList(Rval) + rparen) | bindMarker
 
 # where expression
 whereExpression = Forward()
-whereCondition = Group((columnName() + binop + Rval))
+whereCondition = Group(((tokenCall | columnName()) + binop + Rval) | (columnName() + IN + inValues))
 whereExpression <<= whereCondition + ZeroOrMore(and_ + whereExpression)
 
-# set expression
+# set expression, a value, an increment of a counter: col = col + n, col = col - n, or an update of a
+# collection: col = col + [...], col = col - {...}, col = [...] + col, col[key] = value
 setExpression = Forward()
-setAssignment = Group((columnName() + "=" + Rval))
+setAssignment = Group((columnName() + "=" + collectionLiteral + "+" + columnName()) |
+                      (columnName() + "=" + Value) |
+                      (columnName() + "=" + columnName() + oneOf("+ -") + Value) |
+                      (columnName() + "[" + Rval + "]" + "=" + Rval))
 setExpression <<= setAssignment + ZeroOrMore("," + setExpression)
 
 # if expression
 ifConditionList = Forward()
-ifCondition = Group((columnName() + "=" + Rval))
+ifCondition = Group((columnName() + binop + Rval))
 ifConditionList <<= ifCondition + ZeroOrMore(and_ + ifConditionList)
 
 ifExpression = ((NOT + EXISTS) | EXISTS | ifConditionList)
 
+# using clause, the ttl and the write timestamp
+usingOption = Group((TTL | TIMESTAMP) + (intNum | bindMarker))
+usingExpr = (USING + usingOption + ZeroOrMore(and_ + usingOption))
+
+# order by clause
+orderByExpr = (ORDER + BY + delimitedList(Group(columnName + Optional(ASC | DESC))))
+
+# group by clause
+groupByExpr = (GROUP + BY + columnNameList)
+
 # limit clause
 limitExpr = (LIMIT + intNum)
 
 # compositeKeyDefinition
-lparen = Literal('(').suppress()
-rparen = Literal(')').suppress()
-
 compositeKeyDefinition = Group(columnName) | \
                          Group(lparen + columnNameList + rparen) | \
                          Group(lparen + lparen + columnNameList + rparen + ',' + columnNameList + rparen)
 # primary key
 primaryKeyDefinition = Group(PRIMARY + KEY + compositeKeyDefinition)('primary_key')
 
-# column type
-typeIdentifier = ident.addParseAction(downcaseTokens).setName("cql_type")
+# column type, collection types are joined in one string: map<text, int>
+cqlType = ident.copy().addParseAction(downcaseTokens)
+collectionType = ((Keyword("list", caseless=True) | Keyword("set", caseless=True) | Keyword("map", caseless=True)) +
+                  Literal('<').suppress() + delimitedList(cqlType) + Literal('>').suppress())
+collectionType.setParseAction(lambda t: '{}<{}>'.format(t[0].lower(), ', '.join(t[1:])))
+typeIdentifier = (collectionType | cqlType).setName("cql_type")
 
 # column definition
 oneColumnDefinition = (Group(primaryKeyDefinition | (columnName + typeIdentifier + Optional(PRIMARY + KEY))))('column')
@@ -102,33 +168,61 @@ columnsDefinition <<= oneColumnDefinition + ZeroOrMore(',' + columnsDefinition)
 # define the grammar
 
 # select
-selectStmt = (SELECT + ('*' | columnNameList)("columns") +
+selectStmt = (SELECT + ('*' | selectorList)("columns") +
               FROM + tableName("table") +
               Optional(Group(WHERE + whereExpression)("where")) +
-              Optional(Group(limitExpr)("limit")))
+              Optional(Group(groupByExpr)("group")) +
+              Optional(Group(orderByExpr)("order")) +
+              Optional(Group(limitExpr)("limit")) +
+              Optional(Group(ALLOW + FILTERING)("allow")))
 
 insertStmt = (INSERT + INTO + tableName("table") +
               Group('(' + columnNameList("list") + ')')('columns') +
-              VALUES + Group('(' + RvalList("list") + ')')('values'))
+              VALUES + Group('(' + RvalList("list") + ')')('values') +
+              Optional(Group(IF + NOT + EXISTS)("if")) +
+              Optional(Group(usingExpr)("using")))
 
-updateStmt = (UPDATE + tableName("table") + SET +
+updateStmt = (UPDATE + tableName("table") +
+              Optional(Group(usingExpr)("using")) + SET +
               Group(setExpression)('set') +
               Optional(Group(WHERE + whereExpression)("where")) +
               Optional(Group(IF + ifExpression)("if")))
 
-deleteStmt = (DELETE +
+deleteStmt = (DELETE + Optional(~FROM + columnNameList("columns")) +
               FROM + tableName("table") +
+              Optional(Group(USING + Group(TIMESTAMP + (intNum | bindMarker)))("using")) +
               Optional(Group(WHERE + whereExpression)("where")) +
-              Optional(Group(IF + EXISTS)("if")))
+              Optional(Group(IF + ifExpression)("if")))
 
 createTableStmt = (CREATE + TABLE +
                    Optional(Group(IF + NOT + EXISTS)('if')) +
                    tableName("table") +
                    Group('(' + columnsDefinition("columns") + ')')('columns_def'))
 
+createIndexStmt = (CREATE + INDEX +
+                   Optional(Group(IF + NOT + EXISTS)('if')) +
+                   Optional(~ON + ident("name")) +
+                   ON + tableName("table") + lparen + columnName("column") + rparen)
+
+# the rows of the view must have all the columns of its primary key
+viewCondition = Group(columnName + IS + NOT + NULL)
+
+createViewStmt = (CREATE + MATERIALIZED + VIEW +
+                  Optional(Group(IF + NOT + EXISTS)('if')) +
+                  tableName("view") + AS +
+                  SELECT + ('*' | columnNameList)("columns") +
+                  FROM + tableName("table") +
+                  Group(WHERE + viewCondition + ZeroOrMore(and_ + viewCondition))("where") +
+                  primaryKeyDefinition)
+
 useStatement = (USE + keyspaceName)
 
-sqlStmt = (createTableStmt | selectStmt | insertStmt | updateStmt | deleteStmt | useStatement) + ";"
+# batch of modification statements, the ; between them is optional
+batchStmt = (BEGIN + Optional(UNLOGGED | LOGGED) + BATCH +
+             Group(OneOrMore(Group(insertStmt | updateStmt | deleteStmt) + Optional(Literal(';').suppress())))('statements') +
+             APPLY + BATCH)
+
+sqlStmt = (createTableStmt | createIndexStmt | createViewStmt | selectStmt | insertStmt | updateStmt | deleteStmt | useStatement | batchStmt) + ";"
 simpleSQL = sqlStmt
 
 if __name__ == "__main__":
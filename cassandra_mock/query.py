@@ -0,0 +1,59 @@
+class PreparedStatement:
+    """
+    A statement parsed and planned once by Session.prepare(),
+    it can be executed many times with different bound values.
+    It is planned again when the schema changed since, see epoch.
+    """
+
+    def __init__(self, query_string, keyspace, plan, epoch=None):
+        self.query_string = query_string
+        self.keyspace = keyspace
+        self.plan = plan
+
+        # the schema epoch of the cluster the plan was made in
+        self.epoch = epoch
+
+    def bind(self, values):
+        return BoundStatement(self, values)
+
+    def __repr__(self):
+        return '<PreparedStatement query="{}">'.format(self.query_string)
+
+
+class BoundStatement:
+    """A prepared statement together with the values for its bind markers."""
+
+    def __init__(self, prepared_statement, values=None):
+        self.prepared_statement = prepared_statement
+        self.values = values
+
+    def __repr__(self):
+        return '<BoundStatement query="{}", values={}>'.format(self.prepared_statement.query_string, self.values)
+
+
+class BatchStatement:
+    """
+    A group of INSERT, UPDATE and DELETE statements, executed by Session.execute()
+    as a single atomic mutation: either all statements are applied or none is.
+    """
+
+    def __init__(self, statements_and_parameters=None):
+        self.statements = list(statements_and_parameters or [])
+
+    def add(self, statement, parameters=None):
+        self.statements.append((statement, parameters))
+        return self
+
+    def add_all(self, statements, parameters):
+        for statement, values in zip(statements, parameters):
+            self.add(statement, values)
+        return self
+
+    def clear(self):
+        del self.statements[:]
+
+    def __len__(self):
+        return len(self.statements)
+
+    def __repr__(self):
+        return '<BatchStatement statements={}>'.format(len(self.statements))
@@ -0,0 +1,129 @@
+import struct
+import uuid
+
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+_M = 0xFFFFFFFFFFFFFFFF
+_C1 = 0x87c37b91114253d5
+_C2 = 0x4cf5ad432745937f
+
+
+def _rotl(x, r):
+    return ((x << r) | (x >> (64 - r))) & _M
+
+
+def _fmix(k):
+    k ^= k >> 33
+    k = (k * 0xff51afd7ed558ccd) & _M
+    k ^= k >> 33
+    k = (k * 0xc4ceb9fe1a85ec53) & _M
+    k ^= k >> 33
+    return k
+
+
+def murmur3(data):
+    """
+    the first 64 bits of MurmurHash3_x64_128 as a signed integer, as computed by cassandra's
+    Murmur3Partitioner, including the sign extension of the tail bytes done by the java code
+    """
+    length = len(data)
+    nblocks = length // 16
+    h1 = h2 = 0
+
+    for i in range(nblocks):
+        k1, k2 = struct.unpack_from('<QQ', data, i * 16)
+
+        k1 = _rotl((k1 * _C1) & _M, 31)
+        h1 ^= (k1 * _C2) & _M
+        h1 = (_rotl(h1, 27) + h2) & _M
+        h1 = (h1 * 5 + 0x52dce729) & _M
+
+        k2 = _rotl((k2 * _C2) & _M, 33)
+        h2 ^= (k2 * _C1) & _M
+        h2 = (_rotl(h2, 31) + h1) & _M
+        h2 = (h2 * 5 + 0x38495ab5) & _M
+
+    tail = struct.unpack_from('{}b'.format(length - nblocks * 16), data, nblocks * 16)
+    k1 = k2 = 0
+    for i in range(len(tail) - 1, 7, -1):
+        k2 ^= (tail[i] << ((i - 8) * 8)) & _M
+    if len(tail) > 8:
+        k2 = _rotl((k2 * _C2) & _M, 33)
+        h2 ^= (k2 * _C1) & _M
+    for i in range(min(len(tail), 8) - 1, -1, -1):
+        k1 ^= (tail[i] << (i * 8)) & _M
+    if tail:
+        k1 = _rotl((k1 * _C1) & _M, 31)
+        h1 ^= (k1 * _C2) & _M
+
+    h1 ^= length
+    h2 ^= length
+    h1 = (h1 + h2) & _M
+    h2 = (h2 + h1) & _M
+    h1 = _fmix(h1)
+    h2 = _fmix(h2)
+    h1 = (h1 + h2) & _M
+
+    return h1 - 2 ** 64 if h1 > MAX_TOKEN else h1
+
+
+def serialize(v):
+    """
+    the bytes of a key value as sent by the driver, guessed from the python type:
+    int is a 32 bit int when it fits, else a 64 bit bigint
+    """
+    if isinstance(v, bytes):
+        return v
+    if isinstance(v, str):
+        return v.encode('utf-8')
+    if isinstance(v, bool):
+        return b'\x01' if v else b'\x00'
+    if isinstance(v, int):
+        return struct.pack('>i', v) if -2 ** 31 <= v < 2 ** 31 else struct.pack('>q', v)
+    if isinstance(v, float):
+        return struct.pack('>d', v)
+    if isinstance(v, uuid.UUID):
+        return v.bytes
+    return str(v).encode('utf-8')
+
+
+def token(pkeys):
+    """ the token of a partition key, given as the list of the values of its columns """
+    if len(pkeys) == 1:
+        key = serialize(pkeys[0])
+    else:
+        # composite keys: each component is length prefixed and followed by a 0 byte
+        key = b''.join(struct.pack('>H', len(b)) + b + b'\x00' for b in map(serialize, pkeys))
+
+    t = murmur3(key)
+    return MAX_TOKEN if t == MIN_TOKEN else t
+
+
+class TokenRing:
+    """
+    N virtual nodes splitting the token range evenly, node i owns the tokens
+    in (end of node i-1, end of node i], the first node starts after MIN_TOKEN
+    """
+
+    def __init__(self, nodes=1):
+        step = 2 ** 64 // nodes
+        self.tokens = [MIN_TOKEN + step * (i + 1) for i in range(nodes - 1)] + [MAX_TOKEN]
+        self.nodes = ['node{}'.format(i) for i in range(nodes)]
+
+    def ranges(self):
+        """ (node, start, end) for each node, a node owns the tokens start < token <= end """
+        return list(zip(self.nodes, [MIN_TOKEN] + self.tokens[:-1], self.tokens))
+
+    def node(self, t):
+        """ the node owning a token """
+        for node, end in zip(self.nodes, self.tokens):
+            if t <= end:
+                return node
+
+    def replica(self, pkeys):
+        """ the node owning a partition key, for token aware routing """
+        return self.node(token(pkeys))
+
+    def __repr__(self):
+        return '<TokenRing nodes={}>'.format(len(self.nodes))
@@ -0,0 +1,135 @@
+# scan.py
+#
+# parallel full table scans: the partitions are split in chunks, walked by the worker pool of the
+# cluster and merged back in scan order. The pool is created by the first parallel scan and reused
+# by the next ones. Worker processes are forked while the tables of the cluster are published in
+# _tables, so they inherit the data instead of unpickling it, and they keep the version of the tables
+# they were forked with: the first scan after a write forks them again. A fork copies the locks held
+# by the other threads, which the workers would then wait on forever, so processes are only forked
+# while no other thread runs, else the scan is serial
+#
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import threading
+
+_tables = None
+
+
+def _scan_chunk(d, keyspace, table, pkeys, levels, reverse, limit, predicate=None, make_row=None):
+    """
+    the (primary key, row) under the partitions pkeys of the table d, or of the inherited table.
+    Without make_row, the rows are copies of the cells, which the caller filters and makes rows of
+    """
+    from .cluster import lookup, walk
+    
+    if d is None:
+        d = _tables[keyspace][table]
+    out = []
+    for pkey in pkeys:
+        node = lookup(d, pkey)
+        if node is None:
+            continue
+        
+        for key, cells in walk(node, levels - len(pkey), None, pkey, None, reverse):
+            if predicate is not None and not predicate(key, cells):
+                continue
+            out.append((key, make_row(key, cells) if make_row is not None else dict(cells)))
+            
+            # no chunk returns more rows than the whole query
+            if len(out) == limit:
+                return out
+    return out
+
+
+class ScanPool:
+    """ the worker pool of the parallel scans of a cluster, shared by its sessions, see above """
+    
+    def __init__(self):
+        self.executor = None
+        self.kind = None
+        self.version = None
+        self.lock = threading.Lock()
+    
+    def get(self, pool, workers, tables, version):
+        """
+        the executor of workers threads or processes, for the version of the tables of the cluster.
+        None when the processes would have to be forked while other threads run
+        """
+        global _tables
+        
+        # processes need fork to inherit the tables, else the scan falls back to threads
+        if pool == 'process' and 'fork' not in multiprocessing.get_all_start_methods():
+            pool = 'thread'
+        
+        with self.lock:
+            if self.executor is not None and self.kind == (pool, workers) and (pool == 'thread' or
+                                                                             self.version == version):
+                return self.executor
+            self._shutdown()
+            
+            if pool == 'thread':
+                self.executor = ThreadPoolExecutor(workers, 'cassandra_mock-scan')
+            else:
+                if threading.active_count() > 1:
+                    return None
+                _tables = tables
+                try:
+                    self.executor = ProcessPoolExecutor(workers, multiprocessing.get_context('fork'))
+                    
+                    # all the workers are forked by the first submit, after that the tables can go
+                    self.executor.submit(int).result()
+                finally:
+                    _tables = None
+            self.kind = (pool, workers)
+            self.version = version
+            return self.executor
+    
+    def _shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+    
+    def shutdown(self):
+        with self.lock:
+            self._shutdown()
+
+
+def parallel_scan(scan_pool, tables, version, keyspace, table, pkeys, levels, make_row, limit, reverse=False,
+                  workers=4, pool='process', predicate=None):
+    """
+    the (primary key, row) for the rows under the partition keys pkeys of a table, in the order of pkeys,
+    lazily, or None when the pool cannot scan them now. pkeys are split in chunks which are walked by the
+    threads or the processes of the scan pool of the cluster, make_row(key, cells) makes the rows. Rows
+    made from processes are views of copies of the stored cells. The rows for which predicate(key, cells)
+    is false are skipped, by the threads, or as the rows of the processes are merged
+    """
+    executor = scan_pool.get(pool, workers, tables, version)
+    if executor is None:
+        return None
+    
+    size = max(1, -(-len(pkeys) // (workers * 4)))
+    chunks = [pkeys[i:i + size] for i in range(0, len(pkeys), size)]
+    if isinstance(executor, ThreadPoolExecutor):
+        d = tables[keyspace][table]
+        futures = [executor.submit(_scan_chunk, d, keyspace, table, chunk, levels, reverse, limit, predicate, make_row)
+                   for chunk in chunks]
+        return _merged(futures)
+    
+    # the closures of the query are not sent to the processes, whose rows are filtered and made here
+    futures = [executor.submit(_scan_chunk, None, keyspace, table, chunk, levels, reverse,
+                               limit if predicate is None else None) for chunk in chunks]
+    return _merged(futures, predicate, make_row)
+
+
+def _merged(futures, predicate=None, make_row=None):
+    try:
+        for f in futures:
+            for key, row in f.result():
+                if make_row is None:
+                    yield key, row
+                elif predicate is None or predicate(key, row):
+                    yield key, make_row(key, row)
+    finally:
+        # a query stopped by its limit does not wait for the remaining chunks
+        for f in futures:
+            f.cancel()
@@ -0,0 +1,368 @@
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping, MutableMapping
+from sys import intern
+import re
+
+
+class _Unset:
+    """ the value of the cells of a compact row which were never written """
+    
+    def __repr__(self):
+        return '_UNSET'
+    
+    # pickled by name, so that there is only one
+    def __reduce__(self):
+        return '_UNSET'
+
+
+_UNSET = _Unset()
+
+
+# values of the cql types, which are checked and converted when written. None is null
+
+def _integer(bits):
+    (lo, hi) = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if bits else (None, None)
+    
+    def cast(v):
+        if v is not None:
+            if isinstance(v, bool) or not isinstance(v, int) or (bits and not lo <= v <= hi):
+                raise ValueError
+        return v
+    
+    return cast
+
+
+def _real(v):
+    if v is not None:
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            raise ValueError
+        return float(v)
+    return v
+
+
+def _text(v):
+    # repeated values share one string
+    if v is not None:
+        if not isinstance(v, str):
+            raise ValueError
+        return intern(str(v))
+    return v
+
+
+def _boolean(v):
+    if v is not None and not isinstance(v, bool):
+        raise ValueError
+    return v
+
+
+def _any(v):
+    return v
+
+
+TYPES = dict(tinyint=_integer(8), smallint=_integer(16), int=_integer(32), bigint=_integer(64),
+             counter=_integer(64), varint=_integer(None), float=_real, double=_real,
+             ascii=_text, text=_text, varchar=_text, boolean=_boolean)
+
+# collections of the types above: list<t>, set<t>, map<k, v>. Written values are copied in new
+# lists, sets and dicts, which the updates of the column then change in place. As in cassandra,
+# an empty collection is null
+_collection_type = re.compile(r'^(list|set|map)<\s*(\w+)\s*(?:,\s*(\w+)\s*)?>$')
+
+
+def collection_type(t):
+    """ (kind, cast of the elements or keys, cast of the values of a map) of a collection type, None for the others """
+    m = _collection_type.match(t)
+    if m is None:
+        return None
+    (kind, a, b) = m.groups()
+    if (kind == 'map') != (b is not None) or a not in TYPES or (b is not None and b not in TYPES):
+        raise ValueError('invalid collection type {}'.format(t))
+    return kind, TYPES[a], TYPES[b] if b is not None else None
+
+
+def _collection(kind, element, value):
+    def cast(v):
+        if v is None:
+            return None
+        if isinstance(v, (str, bytes)) or not isinstance(v, Iterable):
+            raise ValueError
+        if not v:
+            return None
+        
+        if kind == 'map':
+            if not isinstance(v, Mapping):
+                raise ValueError
+            out = dict((element(k), value(x)) for k, x in v.items())
+            if None in out or None in out.values():
+                raise ValueError
+            return out
+        
+        if isinstance(v, Mapping) or (kind == 'list' and not isinstance(v, (list, tuple))):
+            raise ValueError
+        out = [element(i) for i in v] if kind == 'list' else set(element(i) for i in v)
+        if None in out:
+            raise ValueError
+        return out
+    
+    return cast
+
+
+class CompactRow(MutableMapping):
+    """
+    Base of the rows of the tables with a schema: the cells are kept in one slot per regular column,
+    instead of a dict per row. Cells which were never written are missing from the mapping
+    """
+    
+    __slots__ = ()
+    
+    # set by row_class(): the regular columns, and the slot of each column
+    columns = ()
+    _slots = {}
+    
+    def __init__(self, cells=()):
+        for member in self._slots.values():
+            member.__set__(self, _UNSET)
+        self.update(cells)
+    
+    def __getitem__(self, k):
+        member = self._slots.get(k)
+        v = _UNSET if member is None else member.__get__(self)
+        if v is _UNSET:
+            raise KeyError(k)
+        return v
+    
+    def __setitem__(self, k, v):
+        member = self._slots.get(k)
+        if member is None:
+            raise ValueError('undefined column name {}'.format(k))
+        member.__set__(self, v)
+    
+    def __delitem__(self, k):
+        self[k]
+        self._slots[k].__set__(self, _UNSET)
+    
+    # faster than the MutableMapping get, which catches the KeyError of __getitem__
+    def get(self, k, default=None):
+        member = self._slots.get(k)
+        v = _UNSET if member is None else member.__get__(self)
+        return default if v is _UNSET else v
+    
+    def __contains__(self, k):
+        member = self._slots.get(k)
+        return member is not None and member.__get__(self) is not _UNSET
+    
+    def __iter__(self):
+        for k, member in self._slots.items():
+            if member.__get__(self) is not _UNSET:
+                yield k
+    
+    def __len__(self):
+        return sum(1 for member in self._slots.values() if member.__get__(self) is not _UNSET)
+    
+    def __repr__(self):
+        return repr(dict(self))
+    
+    # the class is rebuilt from the columns, it is shared by the rows of a pickle
+    def __reduce__(self):
+        return _row, (self.columns, tuple(member.__get__(self) for member in self._slots.values()))
+
+
+_row_classes = {}
+
+
+def row_class(columns):
+    """ the CompactRow class of the regular columns (name, type), shared by the tables with the same columns """
+    columns = tuple((name, t) for name, t in columns)
+    cls = _row_classes.get(columns)
+    if cls is None:
+        slots = tuple('_{}'.format(i) for i in range(len(columns)))
+        cls = type('CompactRow', (CompactRow,), {'__slots__': slots, 'columns': columns})
+        cls._slots = OrderedDict((name, getattr(cls, slot)) for (name, t), slot in zip(columns, slots))
+        cls = _row_classes.setdefault(columns, cls)
+    return cls
+
+
+def _row(columns, values):
+    cls = row_class(columns)
+    row = cls.__new__(cls)
+    for member, v in zip(row._slots.values(), values):
+        member.__set__(row, v)
+    return row
+
+
+class TableMetadata:
+    """
+    The schema of a table, from its CREATE TABLE: the columns in definition order with their cql types,
+    and the primary key. The cells of its rows are CompactRows, written values are checked against the
+    types of the columns, numbers are converted and text is interned
+    """
+    
+    def __init__(self, keyspace, name, columns, partition_key, clustering_key=()):
+        self.keyspace = keyspace
+        self.name = name
+        self.columns = OrderedDict(columns)
+        self.partition_key = list(partition_key)
+        self.clustering_key = list(clustering_key)
+        
+        # counter tables have counter columns only, outside of the primary key
+        self.counters = set(k for k, t in self.columns.items() if t == 'counter')
+        
+        for k in self.partition_key + self.clustering_key:
+            if k not in self.columns:
+                raise ValueError('unknown primary key column {} of {}.{}'.format(k, keyspace, name))
+            if k in self.counters:
+                raise ValueError('counter column {} cannot be part of the primary key of {}.{}'.format(k, keyspace,
+                                                                                                     name))
+        if self.counters and len(self.counters) + len(self.partition_key + self.clustering_key) != len(self.columns):
+            raise ValueError('cannot mix counter and non counter columns in {}.{}'.format(keyspace, name))
+        
+        self._casts = dict((k, TYPES.get(t, _any)) for k, t in self.columns.items())
+        
+        # the collection columns {column: (kind, cast of the elements or keys, cast of the values)}
+        self.collections = {}
+        for k, t in self.columns.items():
+            kind = collection_type(t)
+            if kind is None:
+                continue
+            if k in self.partition_key + self.clustering_key:
+                raise ValueError('collection column {} cannot be part of the primary key of {}.{}'.format(
+                    k, keyspace, name))
+            self.collections[k] = kind
+            self._casts[k] = _collection(*kind)
+        self.row_class = row_class((k, t) for k, t in self.columns.items()
+                                   if k not in self.partition_key + self.clustering_key)
+    
+    @property
+    def index(self):
+        """ the primary key, as stored in the index of the tables """
+        return [list(self.partition_key)] + list(self.clustering_key)
+    
+    def cast(self, k, v):
+        try:
+            return self._casts[k](v)
+        except KeyError:
+            raise ValueError('undefined column name {}'.format(k))
+        except ValueError:
+            raise ValueError('invalid value {!r} for column {} of type {}'.format(v, k, self.columns[k]))
+    
+    def operand(self, k, op, v):
+        """ the operand v of the update op of the collection column k, checked and converted, see modified() """
+        if k not in self.collections:
+            raise ValueError('{} is not a collection column of {}.{}'.format(k, self.keyspace, self.name))
+        (kind, element, value) = self.collections[k]
+        try:
+            if op == '[]':
+                (i, x) = v
+                if kind == 'set':
+                    raise ValueError('elements of the set {} cannot be set by index'.format(k))
+                i = element(i) if kind == 'map' else TYPES['int'](i)
+                if i is None:
+                    raise ValueError('invalid null key of {}'.format(k))
+                return i, (value if kind == 'map' else element)(x)
+            if op == 'prepend' and kind != 'list':
+                raise ValueError('only lists can be prepended to, {} is a {}'.format(k, kind))
+            if op == '-' and kind == 'map':
+                # the keys to remove
+                return _collection('set', element, None)(v)
+            return self._casts[k](v)
+        except (TypeError, ValueError) as e:
+            if e.args:
+                raise ValueError(*e.args)
+            raise ValueError('invalid operand {!r} of the update of column {} of type {}'.format(v, k, self.columns[k]))
+    
+    def modified(self, k, current, op, v):
+        """
+        the value of the collection column k after an update: op '+' adds the elements of v, '-' removes them,
+        or the keys v of a map, 'prepend' inserts the elements of v at the head of a list, '[]' sets the element
+        v[1] at the key or index v[0], or removes it when None. current is updated in place, None when empty
+        """
+        kind = self.collections[k][0]
+        if op == '[]':
+            (i, x) = v
+            if kind == 'map':
+                current = current if current is not None else {}
+                if x is None:
+                    current.pop(i, None)
+                else:
+                    current[i] = x
+            elif current is not None and 0 <= i < len(current):
+                # the index was checked with the write, see index_error()
+                if x is None:
+                    del current[i]
+                else:
+                    current[i] = x
+        elif v is None or (current is None and op == '-'):
+            pass
+        elif current is None:
+            current = v
+        elif op == '+':
+            if kind == 'list':
+                current.extend(v)
+            else:
+                current.update(v)
+        elif op == 'prepend':
+            current[:0] = v
+        elif kind == 'list':
+            current[:] = [i for i in current if i not in v]
+        elif kind == 'set':
+            current -= v
+        else:
+            for i in v:
+                current.pop(i, None)
+        return current or None
+    
+    def element_key(self, k, v):
+        """ the key of a map, the index of a list or the element of a set which selects an element of column k """
+        (kind, element, value) = self.collections[k]
+        try:
+            if v is None:
+                raise ValueError
+            return element(v) if kind != 'list' else TYPES['int'](v)
+        except ValueError:
+            raise ValueError('invalid element {!r} of column {} of type {}'.format(v, k, self.columns[k]))
+    
+    def element(self, k, current, key):
+        """ the value at the key of a map, the element at the index of a list, the element of a set, None """
+        kind = self.collections[k][0]
+        if current is None:
+            return None
+        if kind == 'map':
+            return current.get(key)
+        if kind == 'list':
+            return current[key] if 0 <= key < len(current) else None
+        return key if key in current else None
+    
+    def index_error(self, k, current, op, v):
+        """ the error of an update of an element of the list k by an index out of its bounds, None """
+        if op == '[]' and self.collections[k][0] == 'list' and not 0 <= v[0] < len(current or ()):
+            return ValueError('list index {} out of bound, list {} has size {}'.format(v[0], k, len(current or ())))
+        return None
+    
+    def key(self, values, start=0):
+        """ the values of the primary key columns from position start on, checked and converted """
+        names = self.partition_key + self.clustering_key
+        out = []
+        for i, v in enumerate(values, start):
+            if v is None:
+                raise ValueError('invalid null value for primary key column {}'.format(names[i]))
+            out.append(self.cast(names[i], v))
+        return out
+    
+    def cells(self, update_dict):
+        """ a copy of the written cells, checked and converted """
+        out = {}
+        for k, v in update_dict.items():
+            if k in self.columns and k not in self.row_class._slots:
+                raise ValueError('primary key column {} cannot be updated'.format(k))
+            if k in self.counters:
+                raise ValueError('counter column {0} can only be incremented, {0} = {0} + 1'.format(k))
+            out[k] = self.cast(k, v)
+        return out
+    
+    def __reduce__(self):
+        return type(self), (self.keyspace, self.name, list(self.columns.items()), self.partition_key,
+                            self.clustering_key)
+    
+    def __repr__(self):
+        return '<TableMetadata {}.{} columns={} primary_key={}>'.format(self.keyspace, self.name,
+                                                                       dict(self.columns), self.index)
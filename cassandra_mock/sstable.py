@@ -0,0 +1,241 @@
+# sstable.py
+#
+# frozen keyspaces: the tables of a keyspace written once to an immutable file, and queried
+# through mmap. Each table stores the subtrees of its top level keys (the partitions, for a one
+# column partition key) as pickles sorted by the pickled key, followed by an offset table of
+# fixed size entries, so that a key is found by binary search without reading the rest of the
+# file. A subtree is only unpickled when it is read, straight from the mapped pages, so
+# processes opening the same file share one page cached image.
+#
+#   magic
+#   for each table: key and subtree pickles, offset table of (key offset, key size, subtree offset, subtree size)
+#   catalog: pickled {'keyspace': ..., 'tables': {table: (index, offset table position, entries)}, 'schema': ...,
+#            'indexes': ..., 'views': ..., 'times': ...}
+#   footer: catalog position, magic
+#
+from collections import OrderedDict
+import mmap
+import pickle
+import struct
+import threading
+
+from .tree import Tree
+
+SSTABLE_MAGIC = b'CMSST1\n\0'
+
+_entry = struct.Struct('<QIQQ')
+_footer = struct.Struct('<Q8s')
+
+
+def _key(k):
+    # pickles of equal keys are equal, they are compared as bytes
+    return pickle.dumps(k, pickle.HIGHEST_PROTOCOL)
+
+
+def write_sstable(filename, keyspace, tables, index, schema=None, indexes=None, views=None, times=None):
+    """
+    freezes the tables {name: root} of keyspace, with their primary key definitions index,
+    the TableMetadata of the tables which have one, their secondary indexes, the
+    materialized views and the TableTimes of the tables with timestamps, TTLs or tombstones,
+    into filename. The indexes and the times are loaded whole when the file is mounted
+    """
+    catalog = {'keyspace': keyspace, 'tables': {}, 'schema': dict(schema or {}), 'indexes': dict(indexes or {}),
+               'views': dict(views or {}), 'times': dict(times or {})}
+    with open(filename, 'wb') as f:
+        f.write(SSTABLE_MAGIC)
+        for table, root in tables.items():
+            entries = []
+            for k, subtree in sorted(((_key(k), v) for k, v in root.items()), key=lambda i: i[0]):
+                blob = pickle.dumps(subtree, pickle.HIGHEST_PROTOCOL)
+                entries.append((f.tell(), len(k), f.tell() + len(k), len(blob)))
+                f.write(k)
+                f.write(blob)
+            
+            catalog['tables'][table] = (index[table], f.tell(), len(entries))
+            for entry in entries:
+                f.write(_entry.pack(*entry))
+        
+        position = f.tell()
+        pickle.dump(catalog, f, pickle.HIGHEST_PROTOCOL)
+        f.write(_footer.pack(position, SSTABLE_MAGIC))
+
+
+class SSTable:
+    """ A frozen keyspace file, mapped read only """
+    
+    def __init__(self, filename, cache_size=256):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        (position, magic) = _footer.unpack_from(self.mm, len(self.mm) - _footer.size)
+        if magic != SSTABLE_MAGIC or self.mm[:len(SSTABLE_MAGIC)] != SSTABLE_MAGIC:
+            raise ValueError('{} is not an sstable'.format(filename))
+        
+        catalog = pickle.loads(self.mm[position:len(self.mm) - _footer.size])
+        self.keyspace = catalog['keyspace']
+        self.tables = catalog['tables']
+        self.index = dict((table, index) for table, (index, offsets, n) in self.tables.items())
+        self.schema = catalog['schema']
+        self.indexes = catalog['indexes']
+        self.views = catalog['views']
+        self.times = catalog.get('times', {})
+        
+        # most recently read subtrees, which readers share and never modify
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+    
+    def _entry(self, table, i):
+        return _entry.unpack_from(self.mm, self.tables[table][1] + i * _entry.size)
+    
+    def _find(self, table, k):
+        """ the position of the entry of key k, or None """
+        (index, offsets, n) = self.tables[table]
+        key = _key(k)
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (key_offset, key_size, offset, size) = self._entry(table, mid)
+            if self.mm[key_offset:key_offset + key_size] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < n:
+            (key_offset, key_size, offset, size) = self._entry(table, lo)
+            if self.mm[key_offset:key_offset + key_size] == key:
+                return lo
+        return None
+    
+    def _load(self, table, i):
+        # unpickled from the mapped pages, without copying them
+        (key_offset, key_size, offset, size) = self._entry(table, i)
+        with memoryview(self.mm) as view:
+            return pickle.loads(view[offset:offset + size])
+    
+    def contains(self, table, k):
+        return self._find(table, k) is not None
+    
+    def get(self, table, k, copy=False):
+        """ the subtree of the top level key k, or None. Only a copy may be modified """
+        if not copy:
+            with self._lock:
+                subtree = self._cache.pop((table, k), None)
+                if subtree is not None:
+                    self._cache[(table, k)] = subtree
+                    return subtree
+        
+        i = self._find(table, k)
+        if i is None:
+            return None
+        subtree = self._load(table, i)
+        
+        if not copy:
+            with self._lock:
+                self._cache[(table, k)] = subtree
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return subtree
+    
+    def keys(self, table):
+        """ the top level keys of a table, in file order """
+        for i in range(self.tables[table][2]):
+            (key_offset, key_size, offset, size) = self._entry(table, i)
+            yield pickle.loads(self.mm[key_offset:key_offset + key_size])
+    
+    def __len__(self):
+        return sum(n for index, offsets, n in self.tables.values())
+    
+    def __repr__(self):
+        return '<SSTable {} keyspace={}>'.format(self.filename, self.keyspace)
+
+
+class Overlay(Tree):
+    """
+    The root of a table of a frozen keyspace: a memtable of the top level keys written since
+    the file was mounted, over the file. get() reads the other keys from the file, writes
+    copy the subtree of their key into the memtable first (cow), deletes leave a tombstone
+    """
+    
+    def __init__(self, sstable, table):
+        dict.__init__(self)
+        self.sstable = sstable
+        self.table = table
+        self.deleted = set()
+    
+    def get(self, k, default=None):
+        v = dict.get(self, k)
+        if v is None and k not in self.deleted:
+            v = self.sstable.get(self.table, k)
+        return default if v is None else v
+    
+    def cow(self, k):
+        """ the subtree of k in the memtable, copied from the file if needed, or None """
+        v = dict.get(self, k)
+        if v is None and k not in self.deleted:
+            v = self.sstable.get(self.table, k, copy=True)
+            if v is not None:
+                dict.__setitem__(self, k, v)
+        return v
+    
+    def __missing__(self, k):
+        v = self.cow(k)
+        if v is None:
+            raise KeyError(k)
+        return v
+    
+    def __setitem__(self, k, v):
+        self.deleted.discard(k)
+        dict.__setitem__(self, k, v)
+    
+    def __delitem__(self, k):
+        if k not in self:
+            raise KeyError(k)
+        dict.pop(self, k, None)
+        if self.sstable.contains(self.table, k):
+            self.deleted.add(k)
+    
+    def pop(self, k, *default):
+        if k in self:
+            v = self.get(k)
+            del self[k]
+            return v
+        if default:
+            return default[0]
+        raise KeyError(k)
+    
+    def __contains__(self, k):
+        return dict.__contains__(self, k) or (k not in self.deleted and self.sstable.contains(self.table, k))
+    
+    def __iter__(self):
+        for k in dict.__iter__(self):
+            yield k
+        for k in self.sstable.keys(self.table):
+            if k not in self.deleted and not dict.__contains__(self, k):
+                yield k
+    
+    def __len__(self):
+        return sum(1 for k in self)
+    
+    def __bool__(self):
+        for k in self:
+            return True
+        return False
+    
+    # reading through the views does not copy into the memtable
+    def keys(self):
+        return list(self)
+    
+    def items(self):
+        return [(k, self.get(k)) for k in self]
+    
+    def values(self):
+        return [self.get(k) for k in self]
+    
+    def __repr__(self):
+        return '<Overlay {} table={} memtable={} deleted={}>'.format(self.sstable.filename, self.table,
+                                                                   dict.__len__(self), len(self.deleted))
+    
+    # pickled as the merged Tree, e.g. in the snapshots of a durable cluster
+    def __reduce__(self):
+        return Tree, (), None, None, iter(self.items())
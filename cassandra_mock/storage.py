@@ -0,0 +1,188 @@
+# storage.py
+#
+# durable mode: the tables are saved in a snapshot file, and every write is appended to
+# a commit log before it is applied. The log is split in segments, a snapshot records the
+# segment started when it was taken, so recovery loads the snapshot and replays the segments
+# from that one on. Both are pickled, the fastest way to rebuild nested dicts in python.
+#
+#   <path>/snapshot.bin          magic, segment number, pickled {'data': ..., 'index': ..., 'schema': ..., ...}
+#   <path>/commitlog-<n>.log     records: length, crc32, pickled record
+#
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import zlib
+
+SNAPSHOT_MAGIC = b'CMSNAP1\n'
+
+_frame = struct.Struct('<II')
+_segment_name = re.compile(r'^commitlog-(\d+)\.log$')
+
+
+def frame(record):
+    """ the bytes of a record in a log: length, crc32, pickled record """
+    body = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+    return _frame.pack(len(body), zlib.crc32(body)) + body
+
+
+def read_log(filename):
+    """ yields the records of a log, a commit log segment, up to a torn or corrupt record left by a crash """
+    with open(filename, 'rb') as f:
+        while True:
+            header = f.read(_frame.size)
+            if len(header) < _frame.size:
+                return
+            (size, crc) = _frame.unpack(header)
+            body = f.read(size)
+            if len(body) < size or zlib.crc32(body) != crc:
+                return
+            yield pickle.loads(body)
+
+
+class CommitLog:
+    """
+    Append-only log of records, fsynced once sync_batch records are pending,
+    or every sync_period seconds by the Flusher thread
+    """
+    
+    def __init__(self, path, segment, sync_batch=1000):
+        self.path = path
+        self.sync_batch = sync_batch
+        self.lock = threading.Lock()
+        self._open(segment)
+    
+    def _open(self, segment):
+        self.segment = segment
+        self.file = open(os.path.join(self.path, 'commitlog-{}.log'.format(segment)), 'ab')
+        self.pending = 0
+        self.size = 0
+    
+    def append(self, record):
+        data = frame(record)
+        with self.lock:
+            self.file.write(data)
+            self.size += len(data)
+            self.pending += 1
+            if self.pending >= self.sync_batch:
+                self._sync()
+    
+    def _sync(self):
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+    
+    def sync(self):
+        with self.lock:
+            self._sync()
+    
+    def rotate(self):
+        """ syncs and closes the current segment, and starts the next one """
+        with self.lock:
+            self._sync()
+            self.file.close()
+            self._open(self.segment + 1)
+        return self.segment
+    
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+
+class Storage:
+    """ the snapshot and the commit log segments of a cluster, in the directory path """
+    
+    def __init__(self, path, sync_batch=1000):
+        self.path = path
+        self.sync_batch = sync_batch
+        self.log = None
+        os.makedirs(path, exist_ok=True)
+    
+    def segments(self):
+        return sorted(int(m.group(1)) for m in map(_segment_name.match, os.listdir(self.path)) if m)
+    
+    def load(self):
+        """ returns the data of the snapshot, or None, and the first segment to replay """
+        try:
+            f = open(os.path.join(self.path, 'snapshot.bin'), 'rb')
+        except FileNotFoundError:
+            return None, 0
+        
+        with f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError('{} is not a snapshot'.format(f.name))
+            (segment,) = struct.unpack('<Q', f.read(8))
+            return pickle.load(f), segment
+    
+    def records(self, since=0):
+        """ yields the records of the commit log segments from since on, in order """
+        for segment in self.segments():
+            if segment >= since:
+                for record in read_log(os.path.join(self.path, 'commitlog-{}.log'.format(segment))):
+                    yield record
+    
+    def open(self):
+        """ appends to a new segment, the last one may end with a torn record """
+        self.log = CommitLog(self.path, (self.segments() or [-1])[-1] + 1, self.sync_batch)
+        return self.log
+    
+    def snapshot(self, data, locks):
+        """
+        writes the tables in a new snapshot, then deletes the segments it contains.
+        Writes wait while the tables are pickled
+        """
+        tmp = os.path.join(self.path, 'snapshot.tmp')
+        with locks.all(), open(tmp, 'wb') as f:
+            segment = self.log.rotate()
+            f.write(SNAPSHOT_MAGIC + struct.pack('<Q', segment))
+            keys = ('data', 'index', 'schema', 'indexes', 'views', 'times', 'counters')
+            pickle.dump(dict((k, data[k]) for k in keys), f, pickle.HIGHEST_PROTOCOL)
+        
+        with open(tmp, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, 'snapshot.bin'))
+        
+        for old in self.segments():
+            if old < segment:
+                os.remove(os.path.join(self.path, 'commitlog-{}.log'.format(old)))
+        return segment
+    
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+class Flusher(threading.Thread):
+    """ fsyncs the commit log every sync_period seconds, and takes a snapshot when it is due """
+    
+    def __init__(self, cluster, sync_period=1.0, snapshot_period=None, snapshot_log_size=None):
+        threading.Thread.__init__(self, name='cassandra_mock-flusher', daemon=True)
+        self.cluster = cluster
+        self.sync_period = sync_period
+        self.snapshot_period = snapshot_period
+        self.snapshot_log_size = snapshot_log_size
+        self.stopped = threading.Event()
+    
+    def run(self):
+        last = time.time()
+        while not self.stopped.wait(self.sync_period):
+            log = self.cluster.storage.log
+            if log is None:
+                return
+            log.sync()
+            
+            # a snapshot compacts the log, once it grew big enough or old enough
+            grown = self.snapshot_log_size and log.size >= self.snapshot_log_size
+            aged = self.snapshot_period and log.size and time.time() - last >= self.snapshot_period
+            if grown or aged:
+                self.cluster.snapshot()
+                last = time.time()
+    
+    def stop(self):
+        self.stopped.set()
+        self.join()
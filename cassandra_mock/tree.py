@@ -1,9 +1,13 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import KeysView, ValuesView, ItemsView
+
+
 class Tree(dict):
-    """A tree implementation using python's autovivification feature."""
-    
-    def __missing__(self, key):
-        value = self[key] = type(self)()
-        return value
+    """
+    The nodes of the hash levels of a table, and of the keyspace and table levels of the metadata.
+    Missing keys are not created: a read of a missing key never allocates a node. Writes create
+    their nodes explicitly, with dive() for the rows and setdefault() for the metadata
+    """
     
     # cast a (nested) dict to a (nested) Tree class
     def __init__(self, data={}):
@@ -12,3 +16,113 @@ class Tree(dict):
                 self[k] = type(self)(data)
             else:
                 self[k] = data
+
+
+class SortedTree(dict):
+    """
+    A dict which keeps its keys sorted, used for the clustering levels of a table:
+    iterating goes through the keys in order, and irange() slices a range of keys
+    with bisect. Missing keys are not created.
+    """
+    
+    def __init__(self, data={}):
+        dict.__init__(self, data)
+        self._keys = sorted(dict.keys(self))
+    
+    def __setitem__(self, key, value):
+        if key not in self:
+            insort(self._keys, key)
+        dict.__setitem__(self, key, value)
+    
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        del self._keys[bisect_left(self._keys, key)]
+    
+    def pop(self, key, *default):
+        if key in self:
+            value = dict.__getitem__(self, key)
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+    
+    def popitem(self):
+        if not self._keys:
+            raise KeyError('popitem(): dictionary is empty')
+        key = self._keys[-1]
+        return key, self.pop(key)
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def clear(self):
+        dict.clear(self)
+        del self._keys[:]
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __reversed__(self):
+        return reversed(self._keys)
+    
+    def keys(self):
+        return KeysView(self)
+    
+    def values(self):
+        return ValuesView(self)
+    
+    def items(self):
+        return ItemsView(self)
+    
+    def irange(self, lo=None, hi=None, inclusive=(True, True), reverse=False, batch=256):
+        """
+        iterates the keys between lo and hi, None is unbounded. The keys are copied a batch at a time,
+        each batch is located by the value of the last key, so that keys inserted or deleted
+        meanwhile by other threads do not derail the iteration
+        """
+        keys = self._keys
+        (lo_inclusive, hi_inclusive) = inclusive
+        while True:
+            if reverse:
+                j = len(keys) if hi is None else (bisect_right if hi_inclusive else bisect_left)(keys, hi)
+                # one key of margin for the keys deleted since the bisect, the batch is trimmed by value
+                start = max(j - batch, 0)
+                chunk = keys[start:j + 1]
+            else:
+                i = 0 if lo is None else (bisect_left if lo_inclusive else bisect_right)(keys, lo)
+                start = max(i - 1, 0)
+                chunk = keys[start:i + batch]
+            
+            a = 0 if lo is None else (bisect_left if lo_inclusive else bisect_right)(chunk, lo)
+            b = len(chunk) if hi is None else (bisect_right if hi_inclusive else bisect_left)(chunk, hi)
+            if a >= b:
+                return
+            
+            if reverse:
+                for x in range(b - 1, a - 1, -1):
+                    yield chunk[x]
+                # stop at lo, or at the first key
+                if a > 0 or start == 0:
+                    return
+                (hi, hi_inclusive) = (chunk[a], False)
+            else:
+                for x in range(a, b):
+                    yield chunk[x]
+                # stop at hi, or at the last key
+                if b < len(chunk) or len(chunk) < i + batch - start:
+                    return
+                (lo, lo_inclusive) = (chunk[b - 1], False)
+    
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self.items()))
+    
+    # rebuild from the items, the sorted keys are not part of the state
+    def __reduce__(self):
+        return type(self), (dict(self),)
@@ -0,0 +1,267 @@
+# workload.py
+#
+# capture and replay of workloads. A Recorder attached to a session logs the statements the session
+# executes to a file, in framed records as those of the commit log:
+#
+#   (offset, keyspace, statement, query, values, prepared, duration)
+#
+# offset is the start of the statement in seconds, keyspace the keyspace of the session, statement
+# (statement, keyspace, table) as in the traces, query the string of the statement, or of its prepared
+# statement when prepared, with its bound values, or the list of the (query, values, prepared) of a
+# batch. duration is the time execute() took, in seconds. replay() executes a log at full speed or at
+# the recorded rate, across threads, processes or asyncio tasks, and reports its throughput and its
+# latency percentiles. synthetic() writes logs of workloads in the style of cassandra-stress, on the
+# posts table of demo.py
+#
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import multiprocessing
+import random
+import threading
+import time
+
+from .cluster import Cluster
+from .metrics import Histogram
+from .query import PreparedStatement, BoundStatement, BatchStatement
+from .storage import frame, read_log
+
+_forked = None
+_lock = threading.Lock()
+
+
+def captured(query, parameters):
+    """ the (query, values, prepared) of a statement executed with parameters """
+    if isinstance(query, BoundStatement):
+        return query.prepared_statement.query_string, query.values, True
+    if isinstance(query, PreparedStatement):
+        return query.query_string, parameters, True
+    if isinstance(query, BatchStatement):
+        return [captured(q, v) for q, v in query.statements], None, False
+    return query, parameters, False
+
+
+class Recorder:
+    """
+    Logs the statements executed by a session to filename, until close(). Recorded statements
+    are timed as traced ones, see metrics.py: a session only pays for it while it is recorded
+    """
+    
+    def __init__(self, session, filename):
+        self.session = session
+        self._file = open(filename, 'wb')
+        self._lock = threading.Lock()
+        session.recorder = self
+    
+    def record(self, query, parameters, keyspace, trace):
+        (query, values, prepared) = captured(query, parameters)
+        record = (trace.started_at, keyspace, (trace.statement, trace.keyspace, trace.table), query, values, prepared,
+                  trace.duration)
+        with self._lock:
+            self._file.write(frame(record))
+    
+    def close(self):
+        if self.session.recorder is self:
+            self.session.recorder = None
+        with self._lock:
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _bind(session, prepared, query, values, is_prepared):
+    """ the statement and the parameters to execute a recorded statement, prepared statements are prepared once """
+    if isinstance(query, list):
+        return BatchStatement([_bind(session, prepared, *i) for i in query]), None
+    if not is_prepared:
+        return query, values
+    
+    key = (session.use_keyspace, query)
+    statement = prepared.get(key)
+    if statement is None:
+        statement = prepared[key] = session.prepare(query)
+    return statement, values
+
+
+def _steps(session, records, start, speed):
+    """ yields (delay, statement, parameters) to execute the records, delay is the wait for their offset """
+    prepared = {}
+    for offset, keyspace, statement, query, values, is_prepared, duration in records:
+        if session.use_keyspace != keyspace:
+            session.set_keyspace(keyspace)
+        delay = start + offset / speed - time.perf_counter() if speed else 0
+        yield (delay,) + _bind(session, prepared, query, values, is_prepared)
+
+
+def _replay_share(cluster, records, start, speed):
+    """ executes the records in a session of its own, returns the Histogram of their latencies """
+    session = cluster.connect()
+    histogram = Histogram()
+    clock = time.perf_counter
+    for delay, statement, parameters in _steps(session, records, start, speed):
+        if delay > 0:
+            time.sleep(delay)
+        started = clock()
+        session.execute(statement, parameters)
+        histogram.record((clock() - started) * 1000000)
+    return histogram
+
+
+def _replay_forked(i):
+    (cluster, shares, start, speed) = _forked
+    return _replay_share(cluster, shares[i], start, speed)
+
+
+async def _replay_task(session, records, start, speed):
+    histogram = Histogram()
+    clock = time.perf_counter
+    for delay, statement, parameters in _steps(session, records, start, speed):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        started = clock()
+        await session.aexecute(statement, parameters)
+        histogram.record((clock() - started) * 1000000)
+    return histogram
+
+
+async def _replay_tasks(cluster, shares, start, speed):
+    sessions = [cluster.connect() for share in shares]
+    try:
+        return await asyncio.gather(*[_replay_task(s, share, start, speed) for s, share in zip(sessions, shares)])
+    finally:
+        for session in sessions:
+            session.shutdown()
+
+
+def replay(filename, cluster=None, workers=4, mode='thread', speed=None):
+    """
+    executes the statements of a log on cluster, or on a new cluster with the keyspaces of the log.
+    The CREATE statements run first, in order, the others are dealt to workers threads, processes
+    or asyncio tasks (mode). Without speed they run at full speed, else at speed times the recorded
+    rate. Processes need fork: each replays its share on its copy of the cluster, forked while no other
+    thread runs, as a fork copies the locks the other threads hold.
+    Returns {'statements', 'seconds', 'throughput', 'latency', 'recorded_latency'}, latencies in microseconds
+    """
+    global _forked
+    
+    records = sorted(read_log(filename), key=lambda record: record[0])
+    if not records:
+        raise ValueError('{} has no statements'.format(filename))
+    
+    # offsets from the first statement
+    first = records[0][0]
+    records = [(r[0] - first,) + tuple(r[1:]) for r in records]
+    
+    if cluster is None:
+        keyspaces = set(r[1] for r in records) | set(r[2][1] for r in records)
+        keyspaces.discard(None)
+        cluster = Cluster([':memory:'], {'data': dict((k, {}) for k in keyspaces),
+                                         'index': dict((k, {}) for k in keyspaces)})
+    
+    schema = [r for r in records if (r[2][0] or '').startswith('create')]
+    if schema:
+        _replay_share(cluster, schema, 0, None)
+    
+    records = [r for r in records if not (r[2][0] or '').startswith('create')]
+    shares = [records[i::workers] for i in range(workers)]
+    
+    start = time.perf_counter()
+    if mode == 'thread':
+        with ThreadPoolExecutor(workers) as executor:
+            histograms = list(executor.map(_replay_share, [cluster] * workers, shares, [start] * workers,
+                                           [speed] * workers))
+    elif mode == 'process':
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError('replays in processes need the fork start method')
+        with _lock:
+            if threading.active_count() > 1:
+                raise ValueError('replays in processes cannot fork while {} other threads run, use threads or '
+                                 'stop them first'.format(threading.active_count() - 1))
+            _forked = (cluster, shares, start, speed)
+            executor = ProcessPoolExecutor(workers, multiprocessing.get_context('fork'))
+            
+            # all the workers are forked by the first submit, after that the shares can go
+            futures = [executor.submit(_replay_forked, i) for i in range(workers)]
+            _forked = None
+        with executor:
+            histograms = [f.result() for f in futures]
+    elif mode == 'asyncio':
+        histograms = asyncio.run(_replay_tasks(cluster, shares, start, speed))
+    else:
+        raise ValueError('unknown replay mode {}, use thread, process or asyncio'.format(mode))
+    seconds = time.perf_counter() - start
+    
+    latency = Histogram()
+    for histogram in histograms:
+        latency.merge(histogram)
+    
+    recorded = Histogram()
+    for r in records:
+        if r[6] is not None:
+            recorded.record(r[6] * 1000000)
+    
+    return {'statements': len(records), 'seconds': seconds, 'throughput': len(records) / seconds if seconds else None,
+            'latency': latency.as_dict(), 'recorded_latency': recorded.as_dict()}
+
+
+# the posts table of demo.py
+POSTS = """
+    CREATE TABLE posts (
+        user_id text,
+        month text,
+        id text,
+        title text,
+        body text,
+        PRIMARY KEY ( (user_id, month), id)
+    );
+"""
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december']
+INSERT = "insert into posts (user_id, month, id, title, body) values (?, ?, ?, ?, ?);"
+SELECT_POST = "select * from posts where user_id = ? and month = ? and id = ?;"
+SELECT_LAST = "select * from posts where user_id = ? and month = ? order by id desc limit 10;"
+
+# partitions None writes each post in a partition of its own, reads is the share of the reads
+PROFILES = OrderedDict([
+    ('wide_partitions', dict(partitions=10, reads=0.5)),
+    ('small_partitions', dict(partitions=None, reads=0.5)),
+    ('read_heavy', dict(partitions=1000, reads=0.9)),
+    ('write_heavy', dict(partitions=1000, reads=0.1)),
+])
+
+
+def synthetic(filename, profile='read_heavy', operations=100000, rate=10000, seed=0):
+    """
+    writes a log of operations on the posts table, in the keyspace mybook, one every 1 / rate seconds:
+    writes of new posts and reads of written ones, a post or the last 10 posts of its partition.
+    The profile is one of PROFILES, or a dict of partitions and reads
+    """
+    options = PROFILES[profile] if isinstance(profile, str) else profile
+    (partitions, reads) = (options['partitions'], options['reads'])
+    rng = random.Random(seed)
+    
+    def partition(k):
+        return 'user{}'.format(k // len(MONTHS)), MONTHS[k % len(MONTHS)]
+    
+    written = []
+    with open(filename, 'wb') as f:
+        f.write(frame((0.0, 'mybook', ('create table', 'mybook', 'posts'), POSTS, None, False, None)))
+        for i in range(operations):
+            offset = (i + 1) / float(rate)
+            if written and rng.random() < reads:
+                (user_id, month, id) = written[rng.randrange(len(written))]
+                if rng.random() < 0.8:
+                    record = ('select', SELECT_POST, [user_id, month, id])
+                else:
+                    record = ('select', SELECT_LAST, [user_id, month])
+            else:
+                (user_id, month) = partition(len(written) if partitions is None else rng.randrange(partitions))
+                id = 'post{:08d}'.format(i)
+                written.append((user_id, month, id))
+                record = ('insert', INSERT, [user_id, month, id, 'title {}'.format(i), 'body ' * rng.randint(1, 20)])
+            
+            f.write(frame((offset, 'mybook', (record[0], 'mybook', 'posts'), record[1], record[2], True, None)))
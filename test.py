@@ -125,8 +125,8 @@ stmts = [
 {'from_type': 'ideas', 'from_id': '0', 'to_type': 'projects', 'oh': 'my', 'to_id': '0'}
 {'from_type': 'ideas', 'from_id': '0', 'to_type': 'projects', 'to_id': '1'}
 ----
-{'from_type': 'ideas', 'from_id': '0', 'to_id': '4', 'to_type': 'ideas'}
 {'from_type': 'ideas', 'from_id': '0', 'to_id': '2', 'to_type': 'ideas'}
+{'from_type': 'ideas', 'from_id': '0', 'to_id': '4', 'to_type': 'ideas'}
 {'from_type': 'ideas', 'from_id': '0', 'oh': 'my', 'to_id': '0', 'to_type': 'projects'}
 {'from_type': 'ideas', 'from_id': '0', 'to_id': '1', 'to_type': 'projects'}
 ----
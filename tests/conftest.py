@@ -0,0 +1,15 @@
+import pytest
+
+from cassandra_mock.cluster import Cluster
+
+
+@pytest.fixture
+def cluster():
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    yield cluster
+    cluster.shutdown()
+
+
+@pytest.fixture
+def session(cluster):
+    return cluster.connect('ks')
@@ -0,0 +1,62 @@
+from cassandra_mock.ring import token
+
+
+def setup(session, partitions=3, rows=4):
+    session.execute("create table m (p int, c int, d int, v int, f double, primary key (p, c, d));")
+    insert = session.prepare("insert into m (p, c, d, v, f) values (?, ?, ?, ?, ?);")
+    for p in range(partitions):
+        for c in range(rows):
+            for d in range(2):
+                session.execute(insert, (p, c, d, p * 10 + c, c / 2))
+
+
+def test_aggregates_of_a_table(session):
+    setup(session)
+    row = session.execute("select count(*), sum(v), min(v), max(v), avg(v), avg(f) from m;").one()
+    assert row == {'count': 24, 'system.sum(v)': 276, 'system.min(v)': 0, 'system.max(v)': 23,
+                   'system.avg(v)': 11, 'system.avg(f)': 0.75}
+
+
+def test_aggregates_of_a_slice(session):
+    setup(session)
+    row = session.execute("select count(*), sum(v) from m where p = 1 and c >= 2;").one()
+    assert row == {'count': 4, 'system.sum(v)': 50}
+    assert session.execute("select count(*) from m where p = 9;").one() == {'count': 0}
+
+
+def test_count_follows_the_writes(session):
+    setup(session)
+    assert session.execute("select count(*) from m where p = 1;").one() == {'count': 8}
+    session.execute("insert into m (p, c, d, v) values (1, 9, 0, 0);")
+    session.execute("delete from m where p = 1 and c = 0;")
+    assert session.execute("select count(*) from m where p = 1;").one() == {'count': 7}
+
+
+def test_group_by_partition(session):
+    setup(session)
+    rows = session.execute("select p, count(*), max(v) from m group by p;").all()
+    ordered = sorted(range(3), key=lambda p: token([p]))
+    assert rows == [{'p': p, 'count': 8, 'system.max(v)': p * 10 + 3} for p in ordered]
+
+
+def test_group_by_clustering_key_across_pages(session):
+    setup(session, partitions=5)
+    query = "select p, c, count(*), sum(v) from m group by p, c;"
+    expected = session.execute(query).all()
+    assert len(expected) == 20
+    
+    session.default_fetch_size = 3
+    rs = session.execute(query)
+    pages = [rs.current_rows]
+    while rs.has_more_pages:
+        rs = session.execute(query, paging_state=rs.paging_state)
+        pages.append(rs.current_rows)
+    assert [len(p) for p in pages] == [3] * 6 + [2]
+    assert sum(pages, []) == expected
+    assert all(r['count'] == 2 and r['system.sum(v)'] == 2 * (r['p'] * 10 + r['c']) for r in expected)
+
+
+def test_limit_counts_the_groups(session):
+    setup(session)
+    rows = session.execute("select p, c, count(*) from m where p = 2 group by p, c limit 3;").all()
+    assert [(r['c'], r['count']) for r in rows] == [(0, 2), (1, 2), (2, 2)]
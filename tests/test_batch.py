@@ -0,0 +1,70 @@
+import pytest
+
+from cassandra_mock.query import BatchStatement
+
+
+@pytest.fixture
+def items(session):
+    session.execute("create table items (p int, c int, v int, primary key ((p), c));")
+    session.execute("insert into items (p, c, v) values (1, 0, 0);")
+    session.execute("insert into items (p, c, v) values (1, 1, 1);")
+    return session
+
+
+def rows(session):
+    return [(row['p'], row['c'], row['v']) for row in session.execute("select * from items;")]
+
+
+def test_batch_applies_mixed_statements(items):
+    insert = items.prepare("insert into items (p, c, v) values (?, ?, ?);")
+    batch = BatchStatement()
+    batch.add(insert, (2, 0, 20))
+    batch.add("update items set v = 10 where p = 1 and c = 0;")
+    batch.add("delete from items where p = 1 and c = 1;")
+    batch.add_all([insert, insert], [(2, 1, 21), (3, 0, 30)])
+    items.execute(batch)
+    assert rows(items) == [(1, 0, 10), (2, 0, 20), (2, 1, 21), (3, 0, 30)]
+
+
+def test_begin_batch_shares_the_bind_markers(items):
+    items.execute("""
+        BEGIN BATCH
+            insert into items (p, c, v) values (?, ?, 5);
+            update items set v = ? where p = 1 and c = 1;
+        APPLY BATCH;
+    """, (4, 0, 11))
+    assert rows(items) == [(1, 0, 0), (1, 1, 11), (4, 0, 5)]
+
+
+@pytest.mark.parametrize('bad', [
+    "insert into items (p, c, v) values (5, 'x', 0);",
+    "update items set v = 1 where p = 5;",
+    "select * from items;",
+])
+def test_failed_batch_applies_nothing(items, bad):
+    insert = items.prepare("insert into items (p, c, v) values (?, ?, ?);")
+    batch = BatchStatement([(insert, (2, 0, 0)), ("delete from items where p = 1;", None), (bad, None)])
+    with pytest.raises(ValueError):
+        items.execute(batch)
+    assert rows(items) == [(1, 0, 0), (1, 1, 1)]
+
+    with pytest.raises(ValueError):
+        items.execute("BEGIN BATCH insert into items (p, c, v) values (2, 0, 0); "
+                      "delete from items where p = 1; {} APPLY BATCH;".format(bad))
+    assert rows(items) == [(1, 0, 0), (1, 1, 1)]
+
+
+def test_bulk_load(items):
+    assert items.bulk_load(None, 'items', ({'p': p, 'c': 2, 'v': p} for p in (1, 2))) == 2
+    assert items.bulk_load('ks', 'items', [(3, 0, 30), (3, 1, 31), (1, 0, 9)], columns=['p', 'c', 'v']) == 3
+    assert rows(items) == [(1, 0, 9), (1, 1, 1), (1, 2, 1), (2, 2, 2), (3, 0, 30), (3, 1, 31)]
+
+    # the rows read as the rows of inserts
+    items.execute("insert into items (p, c, v) values (4, 0, 30);")
+    items.execute("insert into items (p, c, v) values (4, 1, 31);")
+    loaded = items.execute("select c, v from items where p = 3;").all()
+    inserted = items.execute("select c, v from items where p = 4;").all()
+    assert loaded == inserted
+
+    with pytest.raises(ValueError):
+        items.bulk_load(None, 'items', [(5, 0, 0)])
@@ -0,0 +1,61 @@
+import pytest
+
+
+def setup(session):
+    session.execute("create table t (id int primary key, l list<int>, s set<text>, m map<text, int>);")
+
+
+def test_literals_and_bound_values(session):
+    setup(session)
+    session.execute("insert into t (id, l, s, m) values (1, [1, 2], {'a'}, {'k': 1});")
+    session.execute("insert into t (id, l, s, m) values (2, ?, ?, ?);", ([3], {'b'}, {'j': 2}))
+    assert session.execute("select * from t where id = 1;").one() == {'id': 1, 'l': [1, 2], 's': {'a'}, 'm': {'k': 1}}
+    assert session.execute("select l, s, m from t where id = 2;").one() == {'l': [3], 's': {'b'}, 'm': {'j': 2}}
+
+
+def test_updates_in_place(session):
+    setup(session)
+    session.execute("update t set l = l + [2], s = s + {'a', 'b'} where id = 1;")
+    session.execute("update t set l = [1] + l, m['k'] = 1, s = s - {'a'} where id = 1;")
+    session.execute("update t set l[1] = 5, m = m + {'j': 2} where id = 1;")
+    assert session.execute("select l, s, m from t where id = 1;").one() == {'l': [1, 5], 's': {'b'},
+                                                                           'm': {'k': 1, 'j': 2}}
+    session.execute("update t set l = l - [1], m = m - {'k'} where id = 1;")
+    assert session.execute("select l, m from t where id = 1;").one() == {'l': [5], 'm': {'j': 2}}
+
+
+def test_select_elements(session):
+    setup(session)
+    session.execute("insert into t (id, l, m) values (1, [7, 8], {'k': 1});")
+    assert session.execute("select l[1], m['k'], m['x'] from t where id = 1;").one() == {
+        'l[1]': 8, "m['k']": 1, "m['x']": None}
+    assert session.execute("select m[?] from t where id = 1;", ('k',)).one() == {'m[?]': 1}
+
+
+def test_empty_collection_is_null(session):
+    setup(session)
+    session.execute("insert into t (id, s) values (1, {'a'});")
+    session.execute("update t set s = s - {'a'} where id = 1;")
+    assert session.execute("select * from t where id = 1;").one() == {'id': 1}
+
+
+def test_set_index_out_of_range_writes_nothing(session):
+    setup(session)
+    session.execute("insert into t (id, l, m) values (1, [1], {'k': 1});")
+    with pytest.raises(ValueError):
+        session.execute("""
+            begin batch
+                update t set m['k'] = 2 where id = 1;
+                update t set l[3] = 1 where id = 1;
+            apply batch;
+        """)
+    assert session.execute("select l, m from t where id = 1;").one() == {'l': [1], 'm': {'k': 1}}
+
+
+def test_collections_rejected(session):
+    setup(session)
+    for s in ["create index on t (l);",
+              "update t using ttl 10 set l = l + [1] where id = 1;",
+              "create table u (l list<int> primary key, v int);"]:
+        with pytest.raises(ValueError):
+            session.execute(s)
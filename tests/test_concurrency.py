@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+
+def run_threads(target, n):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_writes_and_reads(session):
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    insert = session.prepare("insert into kv (p, c, v) values (?, ?, ?);")
+    errors = []
+    
+    def write(i):
+        try:
+            for c in range(300):
+                session.execute(insert, (c % 7, i * 1000 + c, c))
+                session.execute("select * from kv where p = ?;", (c % 7,)).all()
+        except Exception as e:
+            errors.append(e)
+    
+    run_threads(write, 8)
+    assert not errors
+    assert session.execute("select count(*) from kv;").one() == {'count': 2400}
+
+
+def test_count_kept_by_concurrent_writes(session):
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    session.execute("insert into kv (p, c, v) values (1, -1, 0);")
+    assert session.execute("select count(*) from kv where p = 1;").one() == {'count': 1}
+    
+    def write(i):
+        for c in range(200):
+            session.execute("insert into kv (p, c, v) values (1, ?, 0);", (i * 1000 + c,))
+    
+    run_threads(write, 4)
+    assert session.execute("select count(*) from kv where p = 1;").one() == {'count': 801}
+
+
+def test_execute_async(session):
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    futures = [session.execute_async("insert into kv (p, c, v) values (?, 0, ?);", (i, i)) for i in range(50)]
+    for f in futures:
+        f.result()
+    rows = session.execute_async("select * from kv;").result()
+    assert len(rows.all()) == 50
+    session.shutdown()
+
+
+def test_aexecute(session):
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    
+    async def main():
+        await asyncio.gather(*[session.aexecute("insert into kv (p, c, v) values (?, 0, ?);", (i, i))
+                               for i in range(20)])
+        return await session.aexecute("select * from kv;")
+    
+    assert len(asyncio.run(main()).all()) == 20
+    session.shutdown()
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from cassandra_mock.cluster import Cluster
+
+
+def setup(session):
+    session.execute("create table views (page text, day int, n counter, m counter, primary key (page, day));")
+
+
+def test_increments(session):
+    setup(session)
+    session.execute("update views set n = n + 1 where page = 'a' and day = 1;")
+    session.execute("update views set n = n - ?, m = m + 3 where page = 'a' and day = 1;", (3,))
+    assert session.execute("select n, m from views where page = 'a' and day = 1;").one() == {'n': -2, 'm': 3}
+
+
+def test_concurrent_increments_are_not_lost(session):
+    setup(session)
+    update = session.prepare("update views set n = n + 1 where page = 'hot' and day = 1;")
+    
+    def add():
+        for i in range(2000):
+            session.execute(update)
+    
+    threads = [threading.Thread(target=add) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert session.execute("select n from views where page = 'hot' and day = 1;").one() == {'n': 16000}
+
+
+def test_delete_drops_the_increments(session):
+    setup(session)
+    session.execute("update views set n = n + 5 where page = 'a' and day = 1;")
+    session.execute("update views set n = n + 5 where page = 'a' and day = 2;")
+    session.execute("delete from views where page = 'a' and day = 1;")
+    assert session.execute("select day, n from views where page = 'a';").all() == [{'day': 2, 'n': 5}]
+
+
+def test_recreated_table_starts_from_zero(session):
+    setup(session)
+    for i in range(5):
+        session.execute("update views set n = n + 1 where page = 'a' and day = 1;")
+    session.execute("create table views (page text, day int, n counter, m counter, primary key (page, day));")
+    session.execute("update views set n = n + 1 where page = 'a' and day = 1;")
+    assert session.execute("select n from views where page = 'a' and day = 1;").one() == {'n': 1}
+
+
+def test_counter_statements_rejected(session):
+    setup(session)
+    for s in ["insert into views (page, day, n) values ('a', 1, 1);",
+              "update views set n = 1 where page = 'a' and day = 1;",
+              "update views using ttl 10 set n = n + 1 where page = 'a' and day = 1;",
+              "update views set n = n + 1 where page = 'a' and day = 1 if n = 1;"]:
+        with pytest.raises(ValueError):
+            session.execute(s)
+
+
+def test_increments_survive_a_restart(tmp_path):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}}, path=str(tmp_path))
+    session = cluster.connect('ks')
+    setup(session)
+    for i in range(10):
+        session.execute("update views set n = n + 1 where page = 'a' and day = 1;")
+    cluster.snapshot()
+    session.execute("update views set n = n + 1 where page = 'a' and day = 1;")
+    cluster.shutdown()
+    
+    cluster = Cluster([':memory:'], None, path=str(tmp_path))
+    session = cluster.connect('ks')
+    assert session.execute("select n from views where page = 'a' and day = 1;").one() == {'n': 11}
+    cluster.shutdown()
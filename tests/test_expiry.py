@@ -0,0 +1,110 @@
+import time
+
+from cassandra_mock.expiry import micros
+
+# timestamps after those of the writes without USING TIMESTAMP
+T = micros(time.time()) + 10 ** 9
+
+
+def setup(session):
+    session.execute("create table events (p int, c int, v text, w text, primary key (p, c));")
+
+
+def test_ttl_expires_cells_and_rows(session):
+    setup(session)
+    session.execute("insert into events (p, c, v) values (1, 1, 'a') using ttl 1000;")
+    session.execute("insert into events (p, c, v) values (1, 2, 'b');")
+    times = session.times['ks']['events']
+    assert session.execute("select * from events where p = 1;").all() == [
+        {'p': 1, 'c': 1, 'v': 'a'}, {'p': 1, 'c': 2, 'v': 'b'}]
+    
+    # past the deadline, the row is skipped by reads and purged by the compactor
+    later = time.time() + 2000
+    assert list(times.live_rows([((1, 1), {'v': 'a'})], later)) == []
+    session._compact(later)
+    assert session.execute("select * from events where p = 1;").all() == [{'p': 1, 'c': 2, 'v': 'b'}]
+    assert not times.deadlines
+
+
+def test_update_ttl_expires_the_cell_only(session):
+    setup(session)
+    session.execute("insert into events (p, c, v, w) values (1, 1, 'a', 'b');")
+    session.execute("update events using ttl 1000 set v = 'x' where p = 1 and c = 1;")
+    session._compact(time.time() + 2000)
+    assert session.execute("select * from events where p = 1 and c = 1;").one() == {'p': 1, 'c': 1, 'w': 'b'}
+
+
+def test_older_timestamp_loses(session):
+    setup(session)
+    session.execute("insert into events (p, c, v) values (1, 1, 'new') using timestamp 2000;")
+    session.execute("update events using timestamp 1000 set v = 'old' where p = 1 and c = 1;")
+    assert session.execute("select v from events where p = 1 and c = 1;").one() == {'v': 'new'}
+
+
+def test_tombstone_shadows_older_writes(session):
+    setup(session)
+    session.execute("insert into events (p, c, v) values (1, 1, 'a');")
+    session.execute("delete from events using timestamp ? where p = 1 and c = 1;", (T + 5,))
+    session.execute("insert into events (p, c, v) values (1, 1, 'b') using timestamp ?;", (T + 4,))
+    assert session.execute("select * from events where p = 1 and c = 1;").one() is None
+    session.execute("insert into events (p, c, v) values (1, 1, 'c') using timestamp ?;", (T + 6,))
+    assert session.execute("select v from events where p = 1 and c = 1;").one() == {'v': 'c'}
+
+
+def test_range_tombstone(session):
+    setup(session)
+    for c in range(5):
+        session.execute("insert into events (p, c, v) values (1, ?, 'a');", (c,))
+    session.execute("delete from events using timestamp ? where p = 1 and c > 1;", (T + 5,))
+    assert [r['c'] for r in session.execute("select c from events where p = 1;")] == [0, 1]
+    session.execute("insert into events (p, c, v) values (1, 3, 'b') using timestamp ?;", (T + 4,))
+    session.execute("insert into events (p, c, v) values (1, 0, 'b') using timestamp ?;", (T + 4,))
+    assert session.execute("select c, v from events where p = 1;").all() == [{'c': 0, 'v': 'b'}, {'c': 1, 'v': 'a'}]
+
+
+def test_tombstones_dropped_after_grace(session):
+    setup(session)
+    session.execute("delete from events where p = 1 and c = 1;")
+    session.execute("delete from events where p = 1 and c > 5;")
+    times = session.times['ks']['events']
+    assert times.tombstone_count == 2
+    session._compact(time.time() + 1, grace=0)
+    assert times.tombstone_count == 0
+
+
+def test_plain_delete_shadows_older_writes(session):
+    setup(session)
+    session.execute("delete from events where p = 1 and c = 1;")
+    session.execute("insert into events (p, c, v) values (1, 1, 'old') using timestamp 1;")
+    assert session.execute("select * from events where p = 1 and c = 1;").all() == []
+    
+    session.execute("delete from events where p = 2;")
+    session.execute("insert into events (p, c, v) values (2, 1, 'old') using timestamp 1;")
+    assert session.execute("select * from events where p = 2;").all() == []
+    
+    # the writes after the delete are newer, and not checked against the tombstones
+    assert not session.times['ks']['events'].tracked(micros(time.time()))
+    session.execute("insert into events (p, c, v) values (1, 1, 'new');")
+    assert session.execute("select v from events where p = 1 and c = 1;").one() == {'v': 'new'}
+
+
+def test_row_tombstones_are_looked_up_by_key(session):
+    setup(session)
+    session.execute("insert into events (p, c, v) values (1, 0, 'a') using timestamp ?;", (T,))
+    for c in range(1, 1000):
+        session.execute("delete from events where p = 1 and c = ?;", (c,))
+    times = session.times['ks']['events']
+    assert len(times.deleted_rows) == 999 and not times.tombstones
+    
+    # a row tombstone shadows the older writes of its row only
+    session.execute("insert into events (p, c, v) values (1, 5, 'b') using timestamp 1;")
+    session.execute("insert into events (p, c, v) values (2, 5, 'b') using timestamp 1;")
+    assert session.execute("select * from events where p = 1 and c = 5;").one() is None
+    assert session.execute("select v from events where p = 2 and c = 5;").one() == {'v': 'b'}
+
+
+def test_delete_columns(session):
+    setup(session)
+    session.execute("insert into events (p, c, v, w) values (1, 1, 'a', 'b');")
+    session.execute("delete v from events where p = 1 and c = 1;")
+    assert session.execute("select * from events where p = 1 and c = 1;").one() == {'p': 1, 'c': 1, 'w': 'b'}
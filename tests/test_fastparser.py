@@ -0,0 +1,37 @@
+# the hand-written parser against the pyparsing grammar, on the corpus of fastparser.py
+import pytest
+
+from cassandra_mock.fastparser import CORPUS, CORPUS_ERRORS, parseString
+from cassandra_mock.parser import simpleSQL
+
+
+def compare(a, b):
+    assert a.asList() == b.asList()
+    for i, j in zip(a.get('statements', []), b.get('statements', [])):
+        compare(i, j)
+    for k in ('table', 'columns', 'values', 'set', 'where', 'order', 'limit', 'if', 'columns_def',
+              'name', 'column', 'view', 'primary_key', 'allow', 'group', 'using'):
+        va, vb = a.get(k), b.get(k)
+        va, vb = [v.asList() if hasattr(v, 'asList') else v for v in (va, vb)]
+        assert va == vb, k
+    if 'columns' in a and not isinstance(a['columns'], str) and 'list' in a['columns']:
+        assert a['columns']['list'].asList() == b['columns']['list'].asList()
+        assert a['values']['list'].asList() == b['values']['list'].asList()
+    if 'columns_def' in a:
+        ca, cb = a['columns_def']['columns']['column'], b['columns_def']['columns']['column']
+        assert ca.asList() == cb.asList()
+        assert ('primary_key' in ca) == ('primary_key' in cb)
+        if 'primary_key' in ca:
+            assert ca['primary_key'].asList() == cb['primary_key'].asList()
+
+
+@pytest.mark.parametrize('s', CORPUS)
+def test_parsers_agree(s):
+    compare(parseString(s), simpleSQL.parseString(s))
+
+
+@pytest.mark.parametrize('s', CORPUS_ERRORS)
+@pytest.mark.parametrize('parse', [parseString, simpleSQL.parseString], ids=['fastparser', 'pyparsing'])
+def test_parsers_reject(s, parse):
+    with pytest.raises(Exception):
+        parse(s)
@@ -0,0 +1,50 @@
+import pytest
+
+
+def setup(session):
+    session.execute("create table items (p int, c int, v int, s text, primary key (p, c));")
+    insert = session.prepare("insert into items (p, c, v, s) values (?, ?, ?, ?);")
+    for p in range(3):
+        for c in range(5):
+            session.execute(insert, (p, c, p * 10 + c, 'x' if c % 2 else 'y'))
+
+
+def values(session, query, parameters=None):
+    return sorted(r['v'] for r in session.execute(query, parameters))
+
+
+@pytest.mark.parametrize('where, expected', [
+    ("s != 'x'", lambda v: v % 2 == 0),
+    ("v in (1, 12, 24, 99)", lambda v: v in (1, 12, 24)),
+    ("v > 11 and v <= 22", lambda v: 11 < v <= 22),
+    ("v >= 20", lambda v: v >= 20),
+    ("c < 2 and s = 'y'", lambda v: v % 10 < 2 and v % 2 == 0),
+])
+def test_filters(session, where, expected):
+    setup(session)
+    rows = values(session, "select v from items where {} allow filtering;".format(where))
+    assert rows == [v for p in range(3) for v in range(p * 10, p * 10 + 5) if expected(v)]
+
+
+def test_filter_within_a_partition(session):
+    setup(session)
+    assert values(session, "select v from items where p = 1 and v != 12 allow filtering;") == [10, 11, 13, 14]
+
+
+def test_filter_with_bound_values(session):
+    setup(session)
+    select = session.prepare("select v from items where v > ? and s != ? allow filtering;")
+    assert values(session, select, (20, 'y')) == [21, 23]
+
+
+def test_limit_counts_the_matching_rows(session):
+    setup(session)
+    rows = session.execute("select v from items where s = 'x' limit 3 allow filtering;").all()
+    assert len(rows) == 3 and all(r['v'] % 2 for r in rows)
+
+
+@pytest.mark.parametrize('where', ["v = 1", "s != 'x'", "v > 1", "v in (1, 2)", "p = 1 and v > 1"])
+def test_rejected_without_allow_filtering(session, where):
+    setup(session)
+    with pytest.raises(ValueError):
+        session.execute("select * from items where {};".format(where))
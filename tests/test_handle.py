@@ -0,0 +1,37 @@
+import pytest
+
+
+def setup(session):
+    session.execute("create table kv (p int, c int, v text, primary key (p, c));")
+    return session.table('ks.kv')
+
+
+def test_get_put_scan(session):
+    kv = setup(session)
+    kv.put({'p': 1, 'c': 2, 'v': 'a'})
+    kv.put({'p': 1, 'c': 1, 'v': 'b'})
+    assert kv.get(1, 2) == {'p': 1, 'c': 2, 'v': 'a'}
+    assert kv.get(1, 3) is None
+    assert [dict(r) for r in kv.scan(1)] == [{'p': 1, 'c': 1, 'v': 'b'}, {'p': 1, 'c': 2, 'v': 'a'}]
+    assert session.execute("select v from kv where p = 1 and c = 1;").one() == {'v': 'b'}
+
+
+@pytest.mark.parametrize('key', [(1,), (1, 2, 3)])
+def test_get_needs_the_whole_primary_key(session, key):
+    kv = setup(session)
+    with pytest.raises(ValueError):
+        kv.get(*key)
+
+
+def test_scan_needs_a_key_prefix(session):
+    kv = setup(session)
+    with pytest.raises(ValueError):
+        list(kv.scan(1, 2, 3))
+
+
+def test_handle_follows_the_schema(session):
+    kv = setup(session)
+    kv.put({'p': 1, 'c': 2, 'v': 'a'})
+    session.execute("create table kv (p int primary key, v text);")
+    kv.put({'p': 1, 'v': 'b'})
+    assert kv.get(1) == {'p': 1, 'v': 'b'}
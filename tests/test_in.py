@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture
+def items(session):
+    session.execute("create table items (p int, c int, v int, primary key ((p), c));")
+    insert = session.prepare("insert into items (p, c, v) values (?, ?, ?);")
+    for p in range(10):
+        for c in range(5):
+            session.execute(insert, (p, c, p * 10 + c))
+    return session
+
+
+def keys(rows):
+    return [(row['p'], row['c']) for row in rows]
+
+
+def test_in_reads_each_key_once_in_key_order(items):
+    rows = items.execute("select * from items where p in (7, 1, 7, 3) and c in (4, 0, 4);")
+    assert keys(rows) == [(1, 0), (1, 4), (3, 0), (3, 4), (7, 0), (7, 4)]
+
+    # a bind marker for the whole list
+    rows = items.execute("select * from items where p in ? and c = 2;", ([3, 1, 3],))
+    assert keys(rows) == [(1, 2), (3, 2)]
+
+    # missing keys read nothing
+    assert keys(items.execute("select * from items where p in (1, 42) and c in (0, 42);")) == [(1, 0)]
+
+
+def test_in_matches_single_key_selects(items):
+    single = items.prepare("select * from items where p = ? and c = ?;")
+    expected = [row for p in (2, 5, 8) for c in (1, 3) for row in items.execute(single, (p, c))]
+
+    prepared = items.prepare("select * from items where p in ? and c in ?;")
+    assert items.execute(prepared, ([8, 2, 5], [3, 1])).all() == expected
+
+
+def test_in_with_order_and_limit(items):
+    rows = items.execute("select * from items where p in (3, 1) and c in (0, 2) order by c desc;")
+    assert keys(rows) == [(1, 2), (1, 0), (3, 2), (3, 0)]
+    assert keys(items.execute("select * from items where p in (3, 1) limit 3;")) == [(1, 0), (1, 1), (1, 2)]
+
+
+def test_in_pages(items):
+    query = "select * from items where p in (7, 1, 3) and c in (4, 0, 2);"
+    expected = items.execute(query).all()
+
+    items.default_fetch_size = 4
+    rs = items.execute(query)
+    chunks = [rs.current_rows]
+    while rs.has_more_pages:
+        rs = items.execute(query, paging_state=rs.paging_state)
+        chunks.append(rs.current_rows)
+    assert [len(i) for i in chunks] == [4, 4, 1]
+    assert sum(chunks, []) == expected
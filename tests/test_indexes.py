@@ -0,0 +1,91 @@
+import pytest
+
+from cassandra_mock.ring import token
+
+
+def setup(session):
+    session.execute("create table posts (user text, id int, title text, body text, primary key (user, id));")
+    insert = session.prepare("insert into posts (user, id, title, body) values (?, ?, ?, ?);")
+    for u in range(6):
+        for i in range(4):
+            session.execute(insert, ('u{}'.format(u), i, 't{}'.format(i % 2), 'b'))
+
+
+def test_index_lookup(session):
+    setup(session)
+    session.execute("create index on posts (title);")
+    rows = session.execute("select user, id from posts where title = 't1';", trace=True)
+    expected = [(u, i) for u in sorted(('u{}'.format(u) for u in range(6)), key=lambda u: token([u]))
+                for i in (1, 3)]
+    assert [(r['user'], r['id']) for r in rows] == expected
+    assert rows.get_query_trace().as_dict()['rows_scanned'] == 12
+
+
+def test_index_follows_the_writes(session):
+    setup(session)
+    session.execute("create index on posts (title);")
+    session.execute("update posts set title = 'new' where user = 'u0' and id = 1;")
+    session.execute("delete from posts where user = 'u1' and id = 1;")
+    assert [(r['user'], r['id']) for r in session.execute("select * from posts where title = 'new';")] == [('u0', 1)]
+    assert len(session.execute("select * from posts where title = 't1';").all()) == 10
+
+
+def test_paging_through_an_index(session):
+    setup(session)
+    session.execute("create index on posts (title);")
+    query = "select user, id from posts where title = 't0';"
+    expected = session.execute(query).all()
+    
+    session.default_fetch_size = 5
+    rs = session.execute(query)
+    pages = [rs.current_rows]
+    while rs.has_more_pages:
+        rs = session.execute(query, paging_state=rs.paging_state)
+        pages.append(rs.current_rows)
+    assert [len(p) for p in pages] == [5, 5, 2]
+    assert sum(pages, []) == expected
+
+
+def test_index_lookup_within_a_partition(session):
+    setup(session)
+    session.execute("create index on posts (title);")
+    rows = session.execute("select id from posts where user = 'u2' and title = 't0';").all()
+    assert rows == [{'id': 0}, {'id': 2}]
+
+
+VIEW = """
+    create materialized view posts_by_title as select * from posts
+    where title is not null and user is not null and id is not null
+    primary key ((title), user, id);
+"""
+
+
+def test_view_built_from_the_table(session):
+    setup(session)
+    session.execute(VIEW)
+    rows = session.execute("select user, id from posts_by_title where title = 't1' and user = 'u3';").all()
+    assert rows == [{'user': 'u3', 'id': 1}, {'user': 'u3', 'id': 3}]
+
+
+def test_view_kept_in_step(session):
+    setup(session)
+    session.execute(VIEW)
+    
+    # a new title moves the row to another partition of the view
+    session.execute("update posts set title = 't9', body = 'x' where user = 'u0' and id = 0;")
+    assert session.execute("select * from posts_by_title where title = 't9';").all() == [
+        {'title': 't9', 'user': 'u0', 'id': 0, 'body': 'x'}]
+    assert [r['id'] for r in session.execute("select id from posts_by_title where title = 't0' and user = 'u0';")] == [2]
+    
+    session.execute("delete from posts where user = 'u0' and id = 0;")
+    assert session.execute("select * from posts_by_title where title = 't9';").all() == []
+    
+    session.execute("delete from posts where user = 'u1';")
+    assert session.execute("select * from posts_by_title where title = 't1' and user = 'u1';").all() == []
+
+
+def test_view_cannot_be_written(session):
+    setup(session)
+    session.execute(VIEW)
+    with pytest.raises(ValueError):
+        session.execute("insert into posts_by_title (title, user, id) values ('t0', 'u9', 0);")
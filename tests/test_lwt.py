@@ -0,0 +1,71 @@
+import threading
+
+
+def setup(session):
+    session.execute("create table accounts (id int primary key, owner text, balance int);")
+
+
+def test_insert_if_not_exists(session):
+    setup(session)
+    r = session.execute("insert into accounts (id, owner, balance) values (1, 'amy', 10) if not exists;")
+    assert r.was_applied
+    r = session.execute("insert into accounts (id, owner, balance) values (1, 'bob', 20) if not exists;")
+    assert not r.was_applied
+    assert r.one() == {'[applied]': False, 'id': 1, 'owner': 'amy', 'balance': 10}
+
+
+def test_update_if_condition(session):
+    setup(session)
+    session.execute("insert into accounts (id, owner, balance) values (1, 'amy', 10);")
+    r = session.execute("update accounts set balance = 5 where id = 1 if balance = ?;", (20,))
+    assert r.one() == {'[applied]': False, 'balance': 10}
+    assert session.execute("update accounts set balance = 5 where id = 1 if balance = 10;").was_applied
+    assert session.execute("select balance from accounts where id = 1;").one() == {'balance': 5}
+
+
+def test_condition_on_a_missing_row(session):
+    setup(session)
+    r = session.execute("update accounts set balance = 5 where id = 1 if balance = 10;")
+    assert r.one() == {'[applied]': False}
+    assert session.execute("select * from accounts where id = 1;").one() is None
+
+
+def test_delete_if_exists(session):
+    setup(session)
+    assert not session.execute("delete from accounts where id = 1 if exists;").was_applied
+    session.execute("insert into accounts (id, owner, balance) values (1, 'amy', 10);")
+    assert session.execute("delete from accounts where id = 1 if exists;").was_applied
+    assert session.execute("select * from accounts where id = 1;").one() is None
+
+
+def test_batch_applied_as_a_whole(session):
+    setup(session)
+    session.execute("insert into accounts (id, owner, balance) values (1, 'amy', 10);")
+    r = session.execute("""
+        begin batch
+            update accounts set balance = 0 where id = 1 if balance = 10;
+            update accounts set owner = 'bob' where id = 1 if owner = 'joe';
+        apply batch;
+    """)
+    assert not r.was_applied
+    assert session.execute("select * from accounts where id = 1;").one() == {'id': 1, 'owner': 'amy', 'balance': 10}
+
+
+def test_compare_and_set_under_contention(session):
+    setup(session)
+    session.execute("insert into accounts (id, owner, balance) values (1, 'amy', 0);")
+    update = session.prepare("update accounts set balance = ? where id = 1 if balance = ?;")
+    
+    def add(n):
+        for i in range(n):
+            while True:
+                v = session.execute("select balance from accounts where id = 1;").one()['balance']
+                if session.execute(update, (v + 1, v)).was_applied:
+                    break
+    
+    threads = [threading.Thread(target=add, args=(200,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert session.execute("select balance from accounts where id = 1;").one() == {'balance': 800}
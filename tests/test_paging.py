@@ -0,0 +1,113 @@
+import pytest
+
+from cassandra_mock.cluster import Cluster
+
+
+def setup(session, partitions=5, rows=4):
+    session.execute("create table items (p int, c int, v int, primary key ((p), c));")
+    insert = session.prepare("insert into items (p, c, v) values (?, ?, ?);")
+    for p in range(partitions):
+        for c in range(rows):
+            session.execute(insert, (p, c, p * 10 + c))
+
+
+def pages(session, query, parameters=None, fetch_size=3):
+    session.default_fetch_size = fetch_size
+    rs = session.execute(query, parameters)
+    out = [rs.current_rows]
+    while rs.has_more_pages:
+        rs = session.execute(query, parameters, paging_state=rs.paging_state)
+        out.append(rs.current_rows)
+    return out
+
+
+def test_pages_cover_all_rows(session):
+    setup(session)
+    all_rows = session.execute("select * from items;").all()
+    chunks = pages(session, "select * from items;")
+    assert [len(i) for i in chunks] == [3] * 6 + [2]
+    assert sum(chunks, []) == all_rows
+
+
+def test_paging_counts_the_limit(session):
+    setup(session)
+    chunks = pages(session, "select * from items limit 7;")
+    assert [len(i) for i in chunks] == [3, 3, 1]
+
+
+def test_paging_a_partition(session):
+    setup(session)
+    chunks = pages(session, "select c from items where p = 1;", fetch_size=3)
+    assert chunks == [[{'c': 0}, {'c': 1}, {'c': 2}], [{'c': 3}]]
+
+
+def test_paging_reversed_slice(session):
+    setup(session)
+    chunks = pages(session, "select c from items where p = 1 and c > 0 order by c desc;", fetch_size=2)
+    assert sum(chunks, []) == [{'c': 3}, {'c': 2}, {'c': 1}]
+
+
+def test_paging_in_query(session):
+    setup(session)
+    chunks = pages(session, "select p, c from items where p in (3, 1) and c in (2, 0);")
+    assert sum(chunks, []) == [{'p': 1, 'c': 0}, {'p': 1, 'c': 2}, {'p': 3, 'c': 0}, {'p': 3, 'c': 2}]
+
+
+@pytest.mark.parametrize('nodes', [None, 4])
+def test_iterating_goes_through_the_pages(nodes):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}}, nodes=nodes)
+    session = cluster.connect('ks')
+    setup(session)
+    session.default_fetch_size = 4
+    rs = session.execute("select * from items;")
+    assert rs.has_more_pages
+    assert len(list(rs)) == 20
+    cluster.shutdown()
+
+
+@pytest.mark.parametrize('nodes', [None, 4])
+def test_resume_after_the_last_partition_was_deleted(nodes):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}}, nodes=nodes)
+    session = cluster.connect('ks')
+    setup(session)
+    expected = [(r['p'], r['c']) for r in session.execute("select * from items;")]
+    
+    session.default_fetch_size = 6
+    rs = session.execute("select * from items;")
+    first = [(r['p'], r['c']) for r in rs.current_rows]
+    last = first[-1][0]
+    session.execute("delete from items where p = ?;", (last,))
+    rest = [(r['p'], r['c']) for r in session.execute("select * from items;", paging_state=rs.paging_state)]
+    assert first + rest == [r for r in expected if r[0] != last or r in first]
+    cluster.shutdown()
+
+
+def test_resume_in_a_frozen_table(tmp_path):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    session = cluster.connect('ks')
+    setup(session)
+    cluster.freeze('ks', str(tmp_path / 'ks.sst'))
+    cluster.shutdown()
+    
+    cluster = Cluster([':memory:'], None, sstables=[str(tmp_path / 'ks.sst')])
+    session = cluster.connect('ks')
+    expected = session.execute("select * from items;").all()
+    
+    # the partitions written since the mount are in the memtable, the others in the file
+    session.default_fetch_size = 6
+    rs = session.execute("select * from items;")
+    for p in range(5):
+        session.execute("insert into items (p, c, v) values (?, 9, 0);", (p,))
+    rest = session.execute("select * from items;", paging_state=rs.paging_state).all()
+    assert [(r['p'], r['c']) for r in rs.current_rows + rest if r['c'] != 9] == [(r['p'], r['c']) for r in expected]
+    cluster.shutdown()
+
+
+def test_grouped_count_resumes_after_a_deleted_partition(session):
+    setup(session)
+    session.default_fetch_size = 2
+    expected = [r['p'] for r in session.execute("select p, count(*) from items group by p;")]
+    rs = session.execute("select p, count(*) from items group by p;")
+    session.execute("delete from items where p = ?;", (rs.current_rows[-1]['p'],))
+    rest = session.execute("select p, count(*) from items group by p;", paging_state=rs.paging_state).all()
+    assert [r['p'] for r in rest] == expected[2:]
@@ -0,0 +1,79 @@
+from cassandra_mock.cluster import Cluster, Session
+
+
+def test_plans_are_cached(session):
+    session.execute("create table kv (p int primary key, v int);")
+    session.execute("insert into kv (p, v) values (1, 1);")
+    session.execute("insert into kv (p, v) values (1, 1);")
+    assert len(session._plans) == 1
+
+
+def test_plan_cache_is_bounded(session, monkeypatch):
+    monkeypatch.setitem(Session.DEFAULTS, 'PLAN_CACHE_SIZE', 4)
+    session.execute("create table kv (p int primary key, v int);")
+    for i in range(10):
+        session.execute("insert into kv (p, v) values ({}, 1);".format(i))
+    assert len(session._plans) == 4
+
+
+def test_schema_change_by_another_session(cluster):
+    a = cluster.connect('ks')
+    b = cluster.connect('ks')
+    a.execute("create table kv (p int, c int, v int, primary key (p, c));")
+    a.execute("insert into kv (p, c, v) values (1, 2, 3);")
+    
+    # the plan cached by a has the previous primary key of the table
+    b.execute("create table kv (p int primary key, c int, v int);")
+    a.execute("insert into kv (p, c, v) values (1, 2, 3);")
+    assert b.execute("select * from kv;").all() == [{'p': 1, 'c': 2, 'v': 3}]
+
+
+def test_index_created_by_another_session(cluster):
+    a = cluster.connect('ks')
+    b = cluster.connect('ks')
+    a.execute("create table kv (p int primary key, v int);")
+    for i in range(5):
+        a.execute("insert into kv (p, v) values (?, ?);", (i, i))
+    a.execute("select * from kv where v = 1 allow filtering;")
+    b.execute("create index on kv (v);")
+    rs = a.execute("select * from kv where v = 1 allow filtering;", trace=True)
+    assert rs.all() == [{'p': 1, 'v': 1}]
+    assert rs.get_query_trace().as_dict()['rows_scanned'] == 1
+
+
+def test_prepared_statement_is_planned_again(session):
+    session.execute("create table t (pk int, ck int, v text, primary key ((pk), ck));")
+    select = session.prepare("select * from t where pk = ? and ck = ?;")
+    
+    # the new primary key swaps the partition and clustering keys
+    session.execute("create table t (pk int, ck int, v text, primary key ((ck), pk));")
+    session.execute("insert into t (pk, ck, v) values (1, 2, 'a');")
+    assert session.execute(select, (1, 2)).all() == [{'ck': 2, 'pk': 1, 'v': 'a'}]
+    assert list(session.execute(select.bind((1, 2))).one()) == ['ck', 'pk', 'v']
+
+
+def test_prepared_filtering_select_is_planned_again(session):
+    session.execute("create table t (p int, v int, primary key ((p), v));")
+    query = "select * from t where v = ? allow filtering;"
+    select = session.prepare(query)
+    
+    # v is now the partition key, and the rows have one more column
+    session.execute("create table t (v int, p int, w int, primary key ((v), p));")
+    session.execute("insert into t (p, v, w) values (1, 2, 3);")
+    row = session.execute(select, (2,)).one()
+    assert row == {'v': 2, 'p': 1, 'w': 3}
+    assert list(row) == list(session.execute(query, (2,)).one())
+
+
+def test_prepared_statement_keeps_its_keyspace():
+    cluster = Cluster([':memory:'], {'data': {'ks': {}, 'other': {}}})
+    session = cluster.connect('ks')
+    session.execute("create table t (p int, v int, primary key ((p), v));")
+    insert = session.prepare("insert into t (p, v) values (?, ?);")
+    
+    session.set_keyspace('other')
+    session.execute("create table t (p int, v int, primary key ((p), v));")
+    session.execute(insert, (1, 2))
+    assert session.execute("select * from t;").all() == []
+    assert session.execute("select * from ks.t;").all() == [{'p': 1, 'v': 2}]
+    cluster.shutdown()
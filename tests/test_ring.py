@@ -0,0 +1,56 @@
+import pytest
+
+from cassandra_mock.cluster import Cluster
+from cassandra_mock.ring import token
+
+
+def setup(session):
+    session.execute("create table items (p int, c int, v int, primary key (p, c));")
+    for p in range(30):
+        session.execute("insert into items (p, c, v) values (?, 0, ?);", (p, p))
+        session.execute("insert into items (p, c, v) values (?, 1, ?);", (p, p))
+
+
+def test_token_is_murmur3():
+    assert token([1]) == -4069959284402364209
+
+
+def test_select_token(session):
+    setup(session)
+    assert session.execute("select token(p), p from items where p = 1 limit 1;").one() == {
+        'system.token(p)': token([1]), 'p': 1}
+
+
+def test_token_restrictions(session):
+    setup(session)
+    ordered = sorted(range(30), key=lambda p: token([p]))
+    middle = token([ordered[10]])
+    
+    rows = session.execute("select p, c from items where token(p) > ?;", (middle,)).all()
+    assert [(r['p'], r['c']) for r in rows] == [(p, c) for p in ordered[11:] for c in range(2)]
+    rows = session.execute("select p, c from items where token(p) <= ?;", (middle,)).all()
+    assert [(r['p'], r['c']) for r in rows] == [(p, c) for p in ordered[:11] for c in range(2)]
+
+
+@pytest.mark.parametrize('nodes', [None, 4])
+def test_full_scan_in_token_order(nodes):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}}, nodes=nodes)
+    session = cluster.connect('ks')
+    setup(session)
+    rows = session.execute("select p, c from items;").all()
+    assert [(r['p'], r['c']) for r in rows] == [(p, c) for p in sorted(range(30), key=lambda p: token([p]))
+                                                for c in range(2)]
+    cluster.shutdown()
+
+
+def test_node_ranges_cover_the_ring():
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}}, nodes=4)
+    session = cluster.connect('ks')
+    setup(session)
+    scanned = []
+    for node, start, end in cluster.ring.ranges():
+        rows = session.execute("select p, c from items where token(p) > ? and token(p) <= ?;", (start, end)).all()
+        assert all(start < token([r['p']]) <= end for r in rows)
+        scanned += [(r['p'], r['c']) for r in rows]
+    assert sorted(scanned) == [(p, c) for p in range(30) for c in range(2)]
+    cluster.shutdown()
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from cassandra_mock.cluster import Session
+
+
+@pytest.fixture
+def events(session, monkeypatch):
+    monkeypatch.setitem(Session.DEFAULTS, 'SCAN_MIN_PARTITIONS', 10)
+    session.default_fetch_size = None
+    session.execute("create table events (source text, id int, value int, primary key ((source), id));")
+    session.bulk_load(None, 'events', (('s{}'.format(i % 20), i, i) for i in range(200)),
+                      columns=['source', 'id', 'value'])
+    return session
+
+
+def scan(session, query="select * from events;"):
+    return [(row['source'], row['id'], row['value']) for row in session.execute(query)]
+
+
+@pytest.mark.parametrize('pool', ['process', 'thread'])
+def test_parallel_scan_matches_serial(events, monkeypatch, pool):
+    monkeypatch.setitem(Session.DEFAULTS, 'SCAN_POOL', pool)
+    serial = scan(events)
+    filtered = scan(events, "select * from events where value > 150 allow filtering;")
+
+    events.scan_workers = 4
+    assert scan(events) == serial
+    assert scan(events, "select * from events limit 7;") == serial[:7]
+    assert scan(events, "select * from events where value > 150 allow filtering;") == filtered
+    assert sorted(filtered) == [row for row in sorted(serial) if row[2] > 150]
+
+
+def test_process_pool_is_reused_until_a_write(cluster, events):
+    events.scan_workers = 2
+    scan(events)
+    executor = events.scan_pool.executor
+    assert executor is not None
+
+    # the sessions of the cluster share the pool
+    other = cluster.connect('ks')
+    other.scan_workers = 2
+    other.default_fetch_size = None
+    assert scan(other) == scan(events)
+    assert events.scan_pool.executor is executor
+
+    # the workers hold the tables as they were forked, a write forks them again
+    events.execute("insert into events (source, id, value) values ('s0', 1000, 1000);")
+    assert ('s0', 1000, 1000) in scan(events)
+    assert events.scan_pool.executor is not executor
+
+
+def test_small_tables_are_scanned_serially(events, monkeypatch):
+    monkeypatch.setitem(Session.DEFAULTS, 'SCAN_MIN_PARTITIONS', 1000)
+    events.scan_workers = 4
+    assert len(scan(events)) == 200
+    assert events.scan_pool.executor is None
+
+
+def test_no_fork_while_other_threads_run(events):
+    serial = scan(events)
+    events.scan_workers = 4
+
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        assert scan(events) == serial
+        assert events.scan_pool.executor is None
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_writes_from_threads_fork_the_workers_again(events):
+    events.scan_workers = 2
+    scan(events)
+    executor = events.scan_pool.executor
+    
+    # concurrent writers may lose bumps of the write count, not all of them
+    def write(i):
+        for j in range(50):
+            events.execute("insert into events (source, id, value) values (?, ?, 0);", ('t{}'.format(i), j))
+    
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(scan(events)) == 400
+    assert events.scan_pool.executor is not executor
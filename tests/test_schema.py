@@ -0,0 +1,29 @@
+import pytest
+
+
+def test_rows_are_typed(session):
+    session.execute("create table kv (p int primary key, v text, n bigint);")
+    session.execute("insert into kv (p, v, n) values (1, 'a', 2);")
+    for s in ["insert into kv (p, v) values ('x', 'a');",
+              "insert into kv (p, w) values (1, 'a');",
+              "insert into kv (p, v) values (1, 2);"]:
+        with pytest.raises(ValueError):
+            session.execute(s)
+    assert session.execute("select * from kv;").all() == [{'p': 1, 'v': 'a', 'n': 2}]
+
+
+@pytest.mark.parametrize('definition', ["create table kv (p int primary key, v text);",
+                                        "create table kv (p int, c int, v text, primary key (p, c));"])
+def test_bulk_load_stores_the_rows_as_inserts(session, definition):
+    session.execute(definition)
+    keys = ['p', 'c'] if 'c int' in definition else ['p']
+    session.execute("insert into kv ({}, v) values ({}, 'a');".format(', '.join(keys), ', '.join(['1'] * len(keys))))
+    n = session.bulk_load('ks', 'kv', [tuple([2] * len(keys)) + ('b',)], columns=keys + ['v'])
+    assert n == 1
+    
+    inserted = session.db['ks']['kv'][1]
+    loaded = session.db['ks']['kv'][2]
+    if len(keys) > 1:
+        (inserted, loaded) = (inserted[1], loaded[2])
+    assert type(loaded) is type(inserted) is session.schema['ks']['kv'].row_class
+    assert session.execute("select v from kv where p = 2;").all() == [{'v': 'b'}]
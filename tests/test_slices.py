@@ -0,0 +1,50 @@
+import pytest
+
+
+def setup(session):
+    session.execute("create table events (p int, a int, b int, v int, primary key (p, a, b));")
+    insert = session.prepare("insert into events (p, a, b, v) values (?, ?, ?, ?);")
+    for a in range(5):
+        for b in range(3):
+            session.execute(insert, (1, a, b, a * 10 + b))
+    session.execute(insert, (2, 0, 0, 0))
+
+
+def keys(rows):
+    return [(r['a'], r['b']) for r in rows]
+
+
+def test_rows_in_clustering_order(session):
+    setup(session)
+    assert keys(session.execute("select a, b from events where p = 1;")) == [(a, b) for a in range(5)
+                                                                             for b in range(3)]
+
+
+@pytest.mark.parametrize('where, expected', [("a > 2", [3, 4]), ("a >= 2", [2, 3, 4]), ("a < 2", [0, 1]),
+                                             ("a <= 2", [0, 1, 2]), ("a > 1 and a <= 3", [2, 3]),
+                                             ("a >= 1 and a < 1", [])])
+def test_range_on_the_first_clustering_key(session, where, expected):
+    setup(session)
+    rows = session.execute("select a, b from events where p = 1 and {};".format(where)).all()
+    assert keys(rows) == [(a, b) for a in expected for b in range(3)]
+
+
+def test_range_after_a_clustering_prefix(session):
+    setup(session)
+    rows = session.execute("select a, b from events where p = 1 and a = 2 and b >= 1;").all()
+    assert keys(rows) == [(2, 1), (2, 2)]
+
+
+def test_order_by_desc_with_limit(session):
+    setup(session)
+    rows = session.execute("select a, b from events where p = 1 order by a desc limit 4;").all()
+    assert keys(rows) == [(4, 2), (4, 1), (4, 0), (3, 2)]
+    
+    rows = session.execute("select a, b from events where p = 1 and a < 3 order by a desc limit 2;").all()
+    assert keys(rows) == [(2, 2), (2, 1)]
+
+
+def test_range_without_the_previous_keys_is_rejected(session):
+    setup(session)
+    with pytest.raises(ValueError):
+        session.execute("select * from events where p = 1 and b > 1;")
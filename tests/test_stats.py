@@ -0,0 +1,31 @@
+def setup(session):
+    session.execute("create table posts (p int, c int, d int, v text, primary key (p, c, d));")
+    for p in range(2):
+        for c in range(2):
+            session.execute("insert into posts (p, c, d, v) values (?, ?, 0, 'x');", (p, c))
+
+
+def test_reads_do_not_autovivify(cluster, session):
+    setup(session)
+    before = cluster.stats()
+    for query in ["select * from posts where p = 9;",
+                  "select * from posts where p = 0 and c = 9;",
+                  "select * from posts where p = 0 and c = 9 and d = 9;",
+                  "select * from posts where p = 9 and c > 1;",
+                  "select count(*) from posts where p = 9;",
+                  "select * from posts where v = 'y' allow filtering;"]:
+        assert session.execute(query).all() in ([], [{'count': 0}])
+    assert session.table('posts').get(9, 9, 9) is None
+    assert cluster.stats() == before
+    assert cluster.data['data']['ks'].keys() == {'posts'}
+
+
+def test_stats(cluster, session):
+    setup(session)
+    session.execute("create index on posts (v);")
+    session.execute("insert into posts (p, c, d, v) values (5, 0, 0, 'y') using ttl 100;")
+    session.execute("delete from posts where p = 0 and c = 0 and d = 0;")
+    stats = cluster.stats()['ks']['posts']
+    assert {k: stats[k] for k in ('partitions', 'rows', 'index_entries', 'expiring', 'tombstones')} == {
+        'partitions': 3, 'rows': 4, 'index_entries': 4, 'expiring': 1, 'tombstones': 1}
+    assert stats['nodes'] > 3 and stats['bytes'] > 0
@@ -0,0 +1,121 @@
+import time
+
+from cassandra_mock.cluster import Cluster, Session
+
+
+def durable(path):
+    return Cluster([':memory:'], {'data': {'ks': {}}}, path=str(path))
+
+
+def test_recovery_replays_the_commit_log(tmp_path):
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int, c int, v text, primary key ((p), c));")
+    for c in range(10):
+        session.execute("insert into kv (p, c, v) values (1, ?, 'a');", (c,))
+    session.execute("delete from kv where p = 1 and c = 9;")
+    session.execute("update kv set v = 'b' where p = 1 and c = 0;")
+    cluster.shutdown()
+    
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    rows = session.execute("select c, v from kv where p = 1;").all()
+    assert [r['c'] for r in rows] == list(range(9))
+    assert rows[0] == {'c': 0, 'v': 'b'}
+    cluster.shutdown()
+
+
+def test_snapshot_then_log(tmp_path):
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    session.execute("insert into kv (p, c, v) values (1, 0, 1);")
+    cluster.snapshot()
+    session.execute("insert into kv (p, c, v) values (2, 0, 2);")
+    cluster.shutdown()
+    
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    assert session.execute("select p, v from kv;").all() == [{'p': 1, 'v': 1}, {'p': 2, 'v': 2}]
+    cluster.shutdown()
+
+
+def test_torn_record_is_dropped(tmp_path):
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    session.execute("insert into kv (p, c, v) values (1, 0, 1);")
+    session.execute("insert into kv (p, c, v) values (2, 0, 2);")
+    cluster.shutdown()
+    
+    # a crash in the middle of the last record
+    log = sorted(tmp_path.glob('commitlog-*.log'))[-1]
+    log.write_bytes(log.read_bytes()[:-3])
+    
+    cluster = durable(tmp_path)
+    session = cluster.connect('ks')
+    assert session.execute("select p, v from kv;").all() == [{'p': 1, 'v': 1}]
+    cluster.shutdown()
+
+
+def test_frozen_keyspace(tmp_path):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+    for p in range(3):
+        session.execute("insert into kv (p, c, v) values (?, 0, ?);", (p, p))
+    cluster.freeze('ks', str(tmp_path / 'ks.sst'))
+    cluster.shutdown()
+    
+    cluster = Cluster([':memory:'], None, sstables=[str(tmp_path / 'ks.sst')])
+    session = cluster.connect('ks')
+    session.execute("insert into kv (p, c, v) values (1, 1, 10);")
+    session.execute("delete from kv where p = 2;")
+    assert session.execute("select p, c from kv where p = 1;").all() == [{'p': 1, 'c': 0}, {'p': 1, 'c': 1}]
+    assert session.execute("select * from kv where p = 2;").one() is None
+    assert len(session.execute("select * from kv;").all()) == 3
+    cluster.shutdown()
+
+
+def test_frozen_cells_keep_their_ttl(tmp_path):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int primary key, v int, w int);")
+    session.execute("insert into kv (p, v) values (1, 1) using ttl 1000;")
+    session.execute("insert into kv (p, v, w) values (2, 2, 2);")
+    session.execute("update kv using ttl 1000 set v = 3 where p = 2;")
+    cluster.freeze('ks', str(tmp_path / 'ks.sst'))
+    cluster.shutdown()
+    
+    cluster = Cluster([':memory:'], None, sstables=[str(tmp_path / 'ks.sst')])
+    session = cluster.connect('ks')
+    assert cluster.stats()['ks']['kv']['expiring'] == 2
+    session._compact(time.time() + 2000)
+    assert session.execute("select * from kv;").all() == [{'p': 2, 'w': 2}]
+    cluster.shutdown()
+    
+    # the file is left as it was
+    cluster = Cluster([':memory:'], None, sstables=[str(tmp_path / 'ks.sst')])
+    session = cluster.connect('ks')
+    assert session.execute("select * from kv where p = 2;").one() == {'p': 2, 'v': 3, 'w': 2}
+    cluster.shutdown()
+
+
+def test_frozen_column_delete_goes_to_the_memtable(tmp_path, monkeypatch):
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    session = cluster.connect('ks')
+    session.execute("create table kv (p int primary key, v int, w int);")
+    session.execute("insert into kv (p, v, w) values (1, 1, 1);")
+    session.execute("insert into kv (p, v, w) values (2, 2, 2);")
+    cluster.freeze('ks', str(tmp_path / 'ks.sst'))
+    cluster.shutdown()
+    
+    monkeypatch.setitem(Session.DEFAULTS, 'SSTABLE_CACHE_SIZE', 1)
+    cluster = Cluster([':memory:'], None, sstables=[str(tmp_path / 'ks.sst')])
+    session = cluster.connect('ks')
+    session.execute("delete v from kv where p = 1;")
+    
+    # reading the other partition evicts the first one from the cache of the file
+    session.execute("select * from kv where p = 2;").all()
+    assert session.execute("select * from kv where p = 1;").one() == {'p': 1, 'w': 1}
+    cluster.shutdown()
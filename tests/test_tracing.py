@@ -0,0 +1,71 @@
+import pytest
+
+from cassandra_mock.cluster import Cluster, Session
+from cassandra_mock.metrics import Histogram
+
+
+def setup(session):
+    session.execute("create table m (p int, c int, v int, primary key (p, c));")
+    for c in range(5):
+        session.execute("insert into m (p, c, v) values (1, ?, ?);", (c, c))
+
+
+def test_trace_of_a_select(session):
+    setup(session)
+    query = "select * from m where p = 1 and v > 2 allow filtering;"
+    trace = session.execute(query, trace=True).get_query_trace().as_dict()
+    assert (trace['statement'], trace['table'], trace['query']) == ('select', 'ks.m', query)
+    assert [e['stage'] for e in trace['events']] == ['parse', 'plan', 'bind', 'scan']
+    assert trace['events'][-1]['rows'] == 2
+    assert (trace['rows_scanned'], trace['rows_returned']) == (5, 2)
+    assert trace['duration'] >= sum(e['seconds'] for e in trace['events'])
+    
+    # the plan is cached from then on
+    trace = session.execute(query, trace=True).get_query_trace().as_dict()
+    assert [e['stage'] for e in trace['events']] == ['bind', 'scan']
+
+
+def test_trace_of_a_write(session):
+    setup(session)
+    trace = session.execute("insert into m (p, c, v) values (1, 9, 9);", trace=True).get_query_trace().as_dict()
+    assert trace['statement'] == 'insert'
+    assert trace['events'][-1]['stage'] == 'execute'
+    assert (trace['rows_scanned'], trace['rows_returned']) == (0, 0)
+
+
+def test_untraced_statements_have_no_trace(session):
+    setup(session)
+    assert session.execute("select * from m;").get_query_trace() is None
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for i in range(1, 1001):
+        h.record(i)
+    out = h.as_dict()
+    assert (out['count'], out['min'], out['max'], out['mean']) == (1000, 1, 1000, 500.5)
+    for p, value in ((50, 500), (90, 900), (99, 990), (99.9, 999)):
+        assert value <= h.percentile(p) <= value * (1 + 2 ** -5)
+
+
+def test_cluster_metrics(monkeypatch):
+    monkeypatch.setitem(Session.DEFAULTS, 'METRICS', True)
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    session = cluster.connect('ks')
+    setup(session)
+    session.execute("select * from m where p = 1;").all()
+    session.execute("select * from m where p = 1;").all()
+    
+    metrics = cluster.metrics(reset=True)
+    assert metrics['latency']['insert']['ks.m']['count'] == 5
+    assert metrics['latency']['select']['ks.m']['count'] == 2
+    assert metrics['latency']['select']['ks.m']['p50'] > 0
+    assert metrics['rows']['ks.m'] == {'scanned': 10, 'returned': 10}
+    assert metrics['plan_cache']['hits'] >= 5
+    assert cluster.metrics()['latency'] == {}
+    cluster.shutdown()
+
+
+def test_metrics_need_the_setting(cluster):
+    with pytest.raises(ValueError):
+        cluster.metrics()
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from cassandra_mock.cluster import Cluster
+from cassandra_mock.query import BatchStatement
+from cassandra_mock.storage import read_log
+from cassandra_mock.workload import Recorder, replay
+
+
+def record(session, filename):
+    with Recorder(session, filename):
+        session.execute("create table kv (p int, c int, v int, primary key ((p), c));")
+        session.execute("insert into kv (p, c, v) values (1, 0, 1);")
+        insert = session.prepare("insert into kv (p, c, v) values (?, ?, ?);")
+        for c in range(1, 20):
+            session.execute(insert, (c % 3, c, c))
+        session.execute(BatchStatement([(insert, (5, 0, 0)), ("insert into kv (p, c, v) values (5, 1, 1);", None)]))
+        session.execute("select * from kv where p = 1;")
+
+
+def test_recorder_round_trip(session, tmp_path):
+    filename = str(tmp_path / 'workload.log')
+    record(session, filename)
+    records = list(read_log(filename))
+    assert len(records) == 23
+    assert [r[2][0] for r in records] == ['create table', 'insert'] + ['insert'] * 19 + ['batch', 'select']
+    
+    (offset, keyspace, statement, query, values, prepared, duration) = records[2]
+    assert (keyspace, statement, query, values, prepared) == (
+        'ks', ('insert', 'ks', 'kv'), "insert into kv (p, c, v) values (?, ?, ?);", (1, 1, 1), True)
+    assert offset >= records[1][0] and duration > 0
+    assert records[-2][3] == [("insert into kv (p, c, v) values (?, ?, ?);", (5, 0, 0), True),
+                              ("insert into kv (p, c, v) values (5, 1, 1);", None, False)]
+    
+    # the session is no longer recorded once the recorder is closed
+    session.execute("select * from kv;")
+    assert len(list(read_log(filename))) == 23
+
+
+@pytest.mark.parametrize('mode', ['thread', 'asyncio'])
+def test_replay_on_a_cluster(session, tmp_path, mode):
+    filename = str(tmp_path / 'workload.log')
+    record(session, filename)
+    expected = session.execute("select * from kv;").all()
+    
+    cluster = Cluster([':memory:'], {'data': {'ks': {}}})
+    out = replay(filename, cluster, workers=3, mode=mode)
+    assert out['statements'] == 22
+    assert out['latency']['count'] == 22 and out['recorded_latency']['count'] == 22
+    rows = cluster.connect('ks').execute("select * from kv;")
+    assert sorted((r['p'], r['c'], r['v']) for r in rows) == sorted((r['p'], r['c'], r['v']) for r in expected)
+    cluster.shutdown()
+
+
+def test_replay_in_processes(session, tmp_path):
+    filename = str(tmp_path / 'workload.log')
+    record(session, filename)
+    out = replay(filename, workers=2, mode='process')
+    assert out['statements'] == 22 and out['latency']['count'] == 22
+    assert out['throughput'] > 0
+
+
+def test_replay_at_the_recorded_rate(session, tmp_path):
+    filename = str(tmp_path / 'workload.log')
+    record(session, filename)
+    out = replay(filename, workers=2, speed=1000.0)
+    assert out['statements'] == 22
+
+
+def test_process_replay_refused_while_other_threads_run(session, tmp_path):
+    filename = str(tmp_path / 'workload.log')
+    record(session, filename)
+    
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        with pytest.raises(ValueError):
+            replay(filename, workers=2, mode='process')
+    finally:
+        stop.set()
+        thread.join()